@@ -4,40 +4,315 @@ TODOアプリ - Webアプリケーション版
 Flask を使用したWebインターフェース
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Blueprint, Flask, Response, g, render_template, request, jsonify, redirect, url_for
+import atexit
+import itertools
 import json
+import os
+import signal
+import sys
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from todo import TodoManager
+import codec
+from cache import ResponseCache
+from events import EventBroadcaster, event_stream
+from lists import ListRegistry, valid_list_id
+from metrics import Registry, StoreMetrics
+from todo import Todo, TodoManager, check_text_fields, normalize_due_date
 
 app = Flask(__name__)
 app.secret_key = 'todo_app_secret_key_2025'
 
-# TodoManagerのインスタンスを作成
-todo_manager = TodoManager()
+
+def create_todo_manager(name: str = None):
+    """環境変数に応じたストレージバックエンドでTODO管理クラスを作成
+
+    name（拡張子なしのパス）を指定すると、そのファイルに保存する（リストごとのファイル）。
+    TODO_BACKEND=sqlite でSQLite（TODO_DB でファイル名を指定、既定は todos.db）を使う。
+    TODO_JOURNAL=1 で追記型ジャーナルモード（大量のTODO向け）を有効にする。
+    TODO_DEBUG=1 で統計カウンタを毎回全件の数え直しと照合する。
+    TODO_COLUMNAR=1 でTODOを列ごとの配列に詰めて保持する（大量のTODOでメモリを減らす）。
+    TODO_BACKGROUND_LOAD=1 で起動時の読み込みをバックグラウンドで行い、読み込み中から応答する。
+    TODO_WRITE_BEHIND=<秒> で変更の保存をバックグラウンドに任せ、その秒数の間の変更をまとめて保存する。
+    TODO_ARCHIVE_DAYS=<日数> で、開くときに完了してからその日数以上たったTODOをアーカイブに移す。
+    """
+    if os.environ.get('TODO_BACKEND') == 'sqlite':
+        from sqlite_store import SqliteTodoManager
+        return SqliteTodoManager(name + '.db' if name else os.environ.get('TODO_DB', 'todos.db'))
+    write_behind = os.environ.get('TODO_WRITE_BEHIND')
+    manager = TodoManager(name + '.json' if name else 'todos.json',
+                          journal=os.environ.get('TODO_JOURNAL') == '1',
+                          debug=os.environ.get('TODO_DEBUG') == '1',
+                          columnar=os.environ.get('TODO_COLUMNAR') == '1',
+                          background_load=os.environ.get('TODO_BACKGROUND_LOAD') == '1',
+                          write_behind=float(write_behind) if write_behind else None)
+    archive_days = os.environ.get('TODO_ARCHIVE_DAYS')
+    if archive_days:
+        manager.archive_completed(int(archive_days))
+    return manager
+
+
+# TodoManagerのインスタンスを作成（/api/... で使う既定のリスト）
+todo_manager = create_todo_manager()
+
+# ハートビートの間隔（秒）。このときに他のプロセス（CLIなど）による変更も取り込む
+EVENTS_HEARTBEAT = 15.0
+
+# カレンダーの月ごとのレスポンス本文のキャッシュ（TODO_CALENDAR_CACHE_BYTES で上限のバイト数、0で無効）
+calendar_cache = ResponseCache(int(os.environ.get('TODO_CALENDAR_CACHE_BYTES', 8 * 1024 * 1024)))
+
+
+def invalidate_calendar_cache(event, list_id: str = None):
+    """変更イベントを受けて、リストの期限日（変更前・変更後）が含まれる月のキャッシュだけを捨てる"""
+    if event['type'] == 'resync':
+        calendar_cache.clear()
+        return
+    for month in event.get('months', ()):
+        year, month = month.split('-')
+        calendar_cache.invalidate((list_id, int(year), int(month)))
+
+
+# 変更を /api/events の購読者（開いている画面）に配る（リストID → 配信先。既定のリストは None）
+broadcasters = {None: EventBroadcaster()}
+
+
+def change_listener(list_id: str = None):
+    """リストの変更イベントを購読者に配り、カレンダーのキャッシュを捨てるコールバックを作成"""
+    def listener(event):
+        broadcaster = broadcasters.get(list_id)
+        if broadcaster is not None:
+            broadcaster.publish(event)
+        invalidate_calendar_cache(event, list_id)
+    return listener
+
+
+todo_manager.add_listener(change_listener())
+
+# メトリクス（TODO_METRICS=0 で計測をやめ、/metrics も404にする）
+registry = Registry(enabled=os.environ.get('TODO_METRICS', '1') != '0')
+store_metrics = StoreMetrics(registry)
+todo_manager.metrics = store_metrics
+request_seconds = registry.histogram(
+    'todo_http_request_seconds', 'ルートごとのリクエストの処理時間（ストリーミングの本文の送信は含まない）',
+    ['method', 'route', 'status'])
+registry.callback('todo_todos', 'TODOの件数（状態別）',
+                  lambda: {(key,): value for key, value in todo_manager.get_stats().items()}, ['state'])
+registry.callback('todo_event_subscribers', '/api/events の購読者数',
+                  lambda: sum(len(broadcaster) for broadcaster in list(broadcasters.values())))
+registry.callback('todo_calendar_cache_bytes', 'カレンダーのキャッシュのバイト数',
+                  lambda: calendar_cache.stats()['bytes'])
+registry.callback('todo_calendar_cache_total', 'カレンダーのキャッシュのヒット・ミス・追い出し・無効化の回数',
+                  lambda: {(key,): value for key, value in calendar_cache.stats().items()
+                           if key in ('hits', 'misses', 'evictions', 'invalidations')},
+                  ['result'], metric_type='counter')
+registry.callback('todo_lists_open', '開いているリストの数', lambda: list_registry.stats()['open'])
+registry.callback('todo_lists_bytes', '開いているリストの推定メモリ', lambda: list_registry.stats()['bytes'])
+registry.callback('todo_lists_total', 'リストを開いた・閉じた回数',
+                  lambda: {(key,): value for key, value in list_registry.stats().items()
+                           if key in ('opens', 'evictions')},
+                  ['event'], metric_type='counter')
+
+# リストごとのディレクトリ（/api/lists/<リストID>/... のTODOはリストごとのファイルに保存する）
+LISTS_DIR = os.environ.get('TODO_LISTS_DIR', 'lists')
+
+
+def open_list(list_id: str):
+    """リストの TodoManager を開く（最初に使われたときに ListRegistry から呼ばれる）"""
+    os.makedirs(LISTS_DIR, exist_ok=True)
+    manager = create_todo_manager(os.path.join(LISTS_DIR, list_id))
+    manager.metrics = store_metrics
+    manager.add_listener(change_listener(list_id))
+    return manager
+
+
+# 開いているリストの推定メモリが TODO_LISTS_MAX_BYTES（既定は256MB）を超えたら、使われていないものから閉じる
+list_registry = ListRegistry(open_list, int(os.environ.get('TODO_LISTS_MAX_BYTES', 256 * 1024 * 1024)))
+atexit.register(list_registry.close)
+
+# TODOのAPI。/api/... は既定のリスト、/api/lists/<リストID>/... はそのリストを操作する
+api = Blueprint('api', __name__)
+
+
+@api.url_value_preprocessor
+def pull_list_id(endpoint, values):
+    """URLのリストIDを取り出す（既定のリストは None）"""
+    g.list_id = values.pop('list_id', None) if values else None
+
+
+@api.before_request
+def acquire_list():
+    """リクエストの間、リストの TodoManager を使用中にする"""
+    if g.list_id is None:
+        return None
+    if not valid_list_id(g.list_id):
+        return jsonify({'error': 'リストIDは英数字・-・_ の64文字以内で指定してください'}), 400
+    g.todo_manager = list_registry.acquire(g.list_id)
+    return None
+
+
+@api.teardown_request
+def release_list(error):
+    """リストの使用を終える（上限を超えていれば、使われていないリストを閉じる）"""
+    if g.pop('todo_manager', None) is not None:
+        list_registry.release(g.list_id)
+
+
+def current_manager():
+    """リクエストのリストの TodoManager"""
+    return g.get('todo_manager', todo_manager)
+
+
+@contextmanager
+def using_list(list_id: str = None):
+    """リクエストの外（ストリーミング中など）でリストの TodoManager を使う"""
+    if list_id is None:
+        yield todo_manager
+        return
+    with list_registry.using(list_id) as manager:
+        yield manager
+
+
+if registry.enabled:
+    @app.before_request
+    def start_timer():
+        """リクエストの処理時間の計測を開始"""
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        """リクエストの処理時間をルート（URLのパターン）ごとに記録"""
+        start = g.pop('request_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            request_seconds.observe(time.perf_counter() - start, request.method, route, str(response.status_code))
+        return response
 
 
 @app.route('/')
 def index():
-    """メインページ"""
-    todos = todo_manager.get_todos()
-    return render_template('index.html', todos=todos)
+    """メインページ（TODOはページを開いた後に /api/todos からページ単位で読み込む）"""
+    return render_template('index.html')
+
+
+MAX_PAGE_SIZE = 1000
+MAX_SEARCH_RESULTS = 100
+MAX_CALENDAR_MONTHS = 12
+# POST /api/archive で older_than_days を省略したときの日数
+ARCHIVE_AFTER_DAYS = int(os.environ.get('TODO_ARCHIVE_DAYS') or 30)
+
+
+def data_etag(*parts) -> str:
+    """データのバージョンからETagを作成（他のワーカーによる変更も先に取り込む）"""
+    manager = current_manager()
+    manager.refresh()
+    # 差分同期（/api/changes）の起点としてクライアントに渡すバージョン
+    g.data_version = (manager.epoch, manager.version)
+    return '-'.join([manager.epoch] + [str(part) for part in parts])
+
+
+def not_modified(etag: str):
+    """本文を作らずに 304 Not Modified を返す"""
+    response = app.response_class(status=304)
+    return with_etag(response, etag)
+
+
+def with_etag(response, etag: str):
+    """レスポンスに強いETagを付け、毎回再検証させる"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    if 'data_version' in g:
+        epoch, version = g.data_version
+        response.headers['X-Data-Epoch'] = epoch
+        response.headers['X-Data-Version'] = str(version)
+    return response
 
 
-@app.route('/api/todos', methods=['GET'])
+def json_response(body: bytes, status: int = 200):
+    """エンコード済みのJSONをそのまま返す"""
+    return app.response_class(body, status=status, mimetype='application/json')
+
+
+def stream_todos(todos, fields=None):
+    """TODOのリストを、JSON配列として少しずつ（チャンク転送で）返す
+
+    辞書のリストを作ってから jsonify せず、TODOごとのエンコード済みJSONをつなげて送るので、
+    件数が多くてもすぐに送信が始まり、メモリも増えない。
+    """
+    return app.response_class(codec.iter_array(todo.to_json(fields) for todo in todos),
+                              mimetype='application/json')
+
+
+def parse_fields(args):
+    """fields パラメータ（カンマ区切り）を項目のリストに変換（未指定ならNone）"""
+    fields = args.get('fields')
+    if not fields:
+        return None
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in Todo.FIELDS]
+    if unknown:
+        raise ValueError(f"fieldsに指定できない項目です: {', '.join(unknown)}")
+    return fields
+
+
+@api.route('/todos', methods=['GET'])
 def get_todos():
-    """TODOリストをJSON形式で取得"""
+    """TODOリストをJSON形式で取得
+    
+    limit / cursor を指定するとページ単位で {"todos": [...], "next_cursor": ...} を返す。
+    sort で並び順（id / created_at / due_date、先頭に - で降順）、fields で返す項目を指定できる。
+    """
+    etag = data_etag(current_manager().version)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    
     show_completed = request.args.get('show_completed', 'true').lower() == 'true'
+    include_archived = request.args.get('include_archived', 'false').lower() == 'true'
     date = request.args.get('date')
+    paginated = 'limit' in request.args or 'cursor' in request.args
     
-    if date:
-        todos = todo_manager.get_todos_by_date(date, show_completed)
-    else:
-        todos = todo_manager.get_todos(show_completed)
+    try:
+        fields = parse_fields(request.args)
+        if include_archived and (paginated or 'sort' in request.args):
+            raise ValueError("include_archivedはlimit・cursor・sortと同時に指定できません")
+        if date:
+            todos = current_manager().get_todos_by_date(date, show_completed)
+        elif paginated or 'sort' in request.args:
+            limit = None
+            if paginated:
+                limit = request.args.get('limit', '100')
+                limit = int(limit) if limit.isdigit() else 0
+                if not 1 <= limit <= MAX_PAGE_SIZE:
+                    raise ValueError(f"limitは1から{MAX_PAGE_SIZE}の範囲で指定してください")
+            todos, next_cursor = current_manager().query_todos(
+                limit, request.args.get('cursor'), request.args.get('sort', 'id'), show_completed)
+            if paginated:
+                body = (b'{"todos":' + codec.encode_array(todo.to_json(fields) for todo in todos) +
+                        b',"next_cursor":' + codec.dumps(next_cursor) + b'}')
+                return with_etag(json_response(body), etag)
+        else:
+            todos = current_manager().get_todos(show_completed)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify([todo.to_dict() for todo in todos])
+    if include_archived and show_completed:
+        todos = with_archived(current_manager(), todos, date)
+    return with_etag(stream_todos(todos, fields), etag)
+
+
+def with_archived(manager, todos, date=None):
+    """TODOのリストの後に、アーカイブされたTODO（date を指定するとその期限日のもの）を続ける
 
+    アーカイブは送信しながら展開する。アーカイブへの移動の途中で止まり、両方に残っているTODOは
+    メモリ上のものだけを返す。
+    """
+    ids = {todo.id for todo in todos}
+    archived = (todo for todo in manager.iter_archived()
+                if todo.id not in ids and (date is None or todo.due_date == date))
+    return itertools.chain(todos, archived)
 
-@app.route('/api/todos', methods=['POST'])
+
+@api.route('/todos', methods=['POST'])
 def add_todo():
     """新しいTODOを追加"""
     data = request.get_json()
@@ -45,18 +320,43 @@ def add_todo():
     if not data or 'title' not in data:
         return jsonify({'error': 'タイトルは必須です'}), 400
     
+    try:
+        check_text_fields(title=data['title'], description=data.get('description'), due_date=data.get('due_date'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     title = data['title'].strip()
-    description = data.get('description', '').strip()
-    due_date = data.get('due_date', '').strip() or None
+    description = (data.get('description') or '').strip()
+    due_date = (data.get('due_date') or '').strip() or None
     
     if not title:
         return jsonify({'error': 'タイトルは必須です'}), 400
     
-    todo = todo_manager.add_todo(title, description, due_date)
+    try:
+        todo = current_manager().add_todo(title, description, due_date)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify(todo.to_dict()), 201
 
 
-@app.route('/api/todos/<int:todo_id>', methods=['PUT'])
+@api.route('/todos/batch', methods=['POST'])
+def apply_batch():
+    """複数の作成・更新・完了・削除をまとめて適用し、操作ごとの結果を返す"""
+    data = request.get_json()
+    ops = data.get('ops') if isinstance(data, dict) else data
+    
+    if not isinstance(ops, list):
+        return jsonify({'error': '操作の一覧（ops）が必要です'}), 400
+    
+    try:
+        results = current_manager().apply_batch(ops)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'results': results})
+
+
+@api.route('/todos/<int:todo_id>', methods=['PUT'])
 def update_todo(todo_id):
     """TODOを更新"""
     data = request.get_json()
@@ -64,12 +364,19 @@ def update_todo(todo_id):
     if not data:
         return jsonify({'error': '更新データが必要です'}), 400
     
+    # 完了状態を変える前にタイトル・説明・期限日を検証する
+    try:
+        check_text_fields(title=data.get('title'), description=data.get('description'))
+        normalize_due_date(data.get('due_date'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     # 完了状態の更新
     if 'completed' in data:
         if data['completed']:
-            success = todo_manager.complete_todo(todo_id)
+            success = current_manager().complete_todo(todo_id)
         else:
-            success = todo_manager.uncomplete_todo(todo_id)
+            success = current_manager().uncomplete_todo(todo_id)
         
         if not success:
             return jsonify({'error': 'TODOが見つかりません'}), 404
@@ -80,21 +387,43 @@ def update_todo(todo_id):
     due_date = data.get('due_date')
     
     if title is not None or description is not None or due_date is not None:
-        success = todo_manager.update_todo(todo_id, title, description, due_date)
+        success = current_manager().update_todo(todo_id, title, description, due_date)
         if not success:
             return jsonify({'error': 'TODOが見つかりません'}), 404
     
-    updated_todo = todo_manager.get_todo_by_id(todo_id)
+    updated_todo = current_manager().get_todo_by_id(todo_id)
     if updated_todo:
         return jsonify(updated_todo.to_dict())
     else:
         return jsonify({'error': 'TODOが見つかりません'}), 404
 
 
-@app.route('/api/todos/<int:todo_id>', methods=['DELETE'])
+@api.route('/todos/due')
+def get_due_todos():
+    """期限が過ぎた未完了のTODO（overdue）と、期限の近い順の未完了のTODO（upcoming）を最大 limit 件ずつ取得
+
+    hours を指定すると、upcoming を今から hours 時間以内に期限（期限日の終わり）が来るものに絞る。
+    """
+    limit = request.args.get('limit', '20')
+    limit = int(limit) if limit.isdigit() else 0
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({'error': f"limitは1から{MAX_PAGE_SIZE}の範囲で指定してください"}), 400
+    hours = request.args.get('hours')
+    try:
+        hours = float(hours) if hours is not None else None
+        now = datetime.now()
+        overdue = current_manager().get_overdue(now, limit)
+        upcoming = current_manager().next_due(limit, hours, now)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'overdue': [todo.to_dict() for todo in overdue],
+                    'upcoming': [todo.to_dict() for todo in upcoming]})
+
+
+@api.route('/todos/<int:todo_id>', methods=['DELETE'])
 def delete_todo(todo_id):
     """TODOを削除"""
-    success = todo_manager.delete_todo(todo_id)
+    success = current_manager().delete_todo(todo_id)
     
     if success:
         return jsonify({'message': 'TODOを削除しました'}), 200
@@ -102,40 +431,230 @@ def delete_todo(todo_id):
         return jsonify({'error': 'TODOが見つかりません'}), 404
 
 
-@app.route('/api/todos/clear-completed', methods=['DELETE'])
+@api.route('/todos/clear-completed', methods=['DELETE'])
 def clear_completed():
     """完了済みTODOを全削除"""
-    count = todo_manager.clear_completed()
+    count = current_manager().clear_completed()
     return jsonify({'message': f'{count}件の完了済みTODOを削除しました', 'count': count})
 
 
-@app.route('/api/stats')
+@api.route('/search')
+def search_todos():
+    """タイトル・説明の全文検索（関連度の高い順）
+
+    q の語をすべて含むTODOを返す。最後の語は前方一致なので、入力途中の文字列でも検索できる。
+    include_archived=true で、limit に満たない分をアーカイブから新しい順に補う。
+    """
+    # 末尾の空白は「最後の語を前方一致にしない」という意味を持つので取り除かない
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', '20')
+    limit = int(limit) if limit.isdigit() else 0
+    if not 1 <= limit <= MAX_SEARCH_RESULTS:
+        return jsonify({'error': f"limitは1から{MAX_SEARCH_RESULTS}の範囲で指定してください"}), 400
+    show_completed = request.args.get('show_completed', 'true').lower() == 'true'
+    include_archived = request.args.get('include_archived', 'false').lower() == 'true'
+    
+    etag = data_etag(current_manager().version)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    try:
+        fields = parse_fields(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    todos = current_manager().search(query, limit, show_completed) if query.strip() else []
+    if include_archived and show_completed and query.strip() and len(todos) < limit:
+        ids = {todo.id for todo in todos}
+        archived = [todo for todo in current_manager().search_archived(query, limit) if todo.id not in ids]
+        todos += archived[:limit - len(todos)]
+    body = codec.encode_array(todo.to_json(fields) for todo in todos)
+    return with_etag(json_response(body), etag)
+
+
+@api.route('/archive', methods=['GET'])
+def get_archive_stats():
+    """アーカイブの件数・セグメント数・合計バイト数を取得"""
+    return jsonify(current_manager().get_archive_stats())
+
+
+@api.route('/archive', methods=['POST'])
+def archive_completed():
+    """完了してから older_than_days 日（既定は ARCHIVE_AFTER_DAYS）以上たったTODOをアーカイブに移す"""
+    data = request.get_json(silent=True) or {}
+    days = data.get('older_than_days', ARCHIVE_AFTER_DAYS)
+    if not isinstance(days, int) or isinstance(days, bool) or days < 0:
+        return jsonify({'error': 'older_than_daysは0以上の整数で指定してください'}), 400
+    try:
+        count = current_manager().archive_completed(days)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'message': f'{count}件の完了済みTODOをアーカイブしました', 'count': count})
+
+
+@api.route('/archive/<int:todo_id>', methods=['GET'])
+def get_archived(todo_id):
+    """アーカイブされたTODOを取得"""
+    todo = current_manager().get_archived(todo_id)
+    if todo is None:
+        return jsonify({'error': 'アーカイブにTODOが見つかりません'}), 404
+    return jsonify(todo.to_dict())
+
+
+@api.route('/archive/<int:todo_id>/restore', methods=['POST'])
+def unarchive(todo_id):
+    """アーカイブからTODOを戻す"""
+    try:
+        todo = current_manager().unarchive(todo_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if todo is None:
+        return jsonify({'error': 'アーカイブにTODOが見つかりません'}), 404
+    return jsonify(todo.to_dict())
+
+
+@api.route('/changes')
+def get_changes():
+    """since で指定したバージョンより後の変更（作成・更新・削除）だけを返す
+
+    epoch が変わっている場合や since が変更履歴より古い場合は resync: true を返すので、
+    クライアントは一覧を取得し直す。
+    """
+    since = request.args.get('since', '')
+    if not since.isdigit():
+        return jsonify({'error': 'sinceはバージョン番号で指定してください'}), 400
+    return jsonify(current_manager().get_changes(int(since), request.args.get('epoch')))
+
+
+# /api/events のストリームはリクエストの後も続くので、使うたびにリストの TodoManager を取得する
+def list_hello(list_id: str = None):
+    """購読の開始時・resync のときに送る、リストの現在のバージョン"""
+    with using_list(list_id) as manager:
+        return {'type': 'hello', 'epoch': manager.epoch, 'version': manager.version}
+
+
+def refresh_list(list_id: str = None):
+    """リストに他のプロセス（CLIなど）による変更があれば取り込む（ハートビートのたびに呼ぶ）"""
+    with using_list(list_id) as manager:
+        manager.refresh()
+
+
+@api.route('/events')
+def events():
+    """変更イベントを Server-Sent Events で配信
+
+    change イベントは変更されたTODOのIDだけを含むので、クライアントは /api/changes で差分を取得する。
+    resync イベントを受け取った場合は一覧を取得し直す。
+    """
+    list_id = g.list_id
+    broadcaster = broadcasters.setdefault(list_id, EventBroadcaster())
+    stream = event_stream(broadcaster, lambda: list_hello(list_id), EVENTS_HEARTBEAT, lambda: refresh_list(list_id))
+    response = Response(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # リバースプロキシ（nginx）にバッファリングさせない
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api.route('/stats')
 def get_stats():
     """統計情報を取得"""
-    todos = todo_manager.get_todos()
-    total = len(todos)
-    completed = len([todo for todo in todos if todo.completed])
-    pending = total - completed
-    
-    return jsonify({
-        'total': total,
-        'completed': completed,
-        'pending': pending
-    })
+    # 期限切れ・今日が期限の件数は日付が変わると変わるため、ETagに日付を含める
+    etag = data_etag(current_manager().version, datetime.now().strftime("%Y%m%d"))
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    return with_etag(jsonify(current_manager().get_stats()), etag)
 
 
-@app.route('/api/calendar/<int:year>/<int:month>')
+@api.route('/calendar/<int:year>/<int:month>')
 def get_calendar_data(year, month):
     """指定された月のカレンダーデータを取得"""
+    etag = data_etag('m', current_manager().get_month_version(year, month))
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    
     show_completed = request.args.get('show_completed', 'true').lower() == 'true'
-    month_todos = todo_manager.get_todos_by_month(year, month, show_completed)
     
-    # TodoオブジェクトをJSON形式に変換
-    serialized_todos = {}
-    for date_key, todos_list in month_todos.items():
-        serialized_todos[date_key] = [todo.to_dict() for todo in todos_list]
+    def build():
+        month_todos = current_manager().get_todos_by_month(year, month, show_completed)
+        # 日付ごとのTODOをエンコード済みのJSONから組み立てる
+        return b'{' + b','.join(
+            codec.dumps(date_key) + b':' + codec.encode_array(todo.to_json() for todo in todos_list)
+            for date_key, todos_list in month_todos.items()
+        ) + b'}'
     
-    return jsonify(serialized_todos)
+    body = cached_month_body(current_manager(), g.list_id, 'todos', year, month, show_completed, build)
+    return with_etag(json_response(body), etag)
+
+
+def cached_month_body(manager, list_id: str, kind: str, year: int, month: int, show_completed: bool,
+                      build) -> bytes:
+    """リストの月ごとのレスポンス本文をキャッシュから取得（なければ build() で作ってキャッシュする）"""
+    key = (kind, list_id, year, month, show_completed)
+    # 本文を作る前のバージョンを記録しておけば、作っている間に変更されても次の取得で作り直される
+    stamp = (manager.epoch, manager.get_month_version(year, month))
+    body = calendar_cache.get(key, stamp)
+    if body is None:
+        body = build()
+        calendar_cache.put(key, stamp, body, tag=(list_id, year, month))
+    return body
+
+
+def parse_month(value: str):
+    """YYYY-MM 形式の文字列を (年, 月) に変換"""
+    parts = value.split('-')
+    if len(parts) != 2 or not all(part.isdigit() for part in parts):
+        raise ValueError("startはYYYY-MM形式で指定してください")
+    year, month = int(parts[0]), int(parts[1])
+    if not 1 <= year <= 9998 or not 1 <= month <= 12:
+        raise ValueError("startはYYYY-MM形式で指定してください")
+    return year, month
+
+
+@api.route('/calendar/range')
+def get_calendar_range():
+    """start（YYYY-MM）から months か月分の、日ごとの件数と先頭のTODOの概要をまとめて取得
+    
+    {"YYYY-MM": {"YYYY-MM-DD": {"count", "completed", "preview": [...]}}} を返す。
+    各日のTODOの全項目は /api/todos?date=YYYY-MM-DD で取得する。
+    """
+    try:
+        year, month = parse_month(request.args.get('start', ''))
+        count = request.args.get('months', '3')
+        count = int(count) if count.isdigit() else 0
+        if not 1 <= count <= MAX_CALENDAR_MONTHS:
+            raise ValueError(f"monthsは1から{MAX_CALENDAR_MONTHS}の範囲で指定してください")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    months = [(year + (month - 1 + i) // 12, (month - 1 + i) % 12 + 1) for i in range(count)]
+    
+    etag = data_etag('r', *(current_manager().get_month_version(y, m) for y, m in months))
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    
+    show_completed = request.args.get('show_completed', 'true').lower() == 'true'
+    parts = []
+    for y, m in months:
+        summary = cached_month_body(current_manager(), g.list_id, 'summary', y, m, show_completed,
+                                    lambda: codec.dumps(current_manager().get_month_summary(y, m, show_completed)))
+        parts.append(codec.dumps(f"{y:04d}-{m:02d}") + b':' + summary)
+    return with_etag(json_response(b'{' + b','.join(parts) + b'}'), etag)
+
+
+app.register_blueprint(api, url_prefix='/api')
+app.register_blueprint(api, url_prefix='/api/lists/<list_id>', name='list_api')
+
+
+@app.route('/api/cache')
+def get_cache_stats():
+    """カレンダーのキャッシュのヒット・ミス・追い出し・無効化の回数とサイズを取得（上限の調整用）"""
+    return jsonify({'calendar': calendar_cache.stats(), 'lists': list_registry.stats()})
+
+
+@app.route('/metrics')
+def get_metrics():
+    """メトリクスを Prometheus のテキスト形式で出力（TODO_METRICS=0 のときは404）"""
+    if not registry.enabled:
+        return not_found(None)
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 @app.route('/calendar')
@@ -161,4 +680,7 @@ if __name__ == '__main__':
     print("📱 ブラウザで http://localhost:8083 にアクセスしてください")
     print("🛑 終了するには Ctrl+C を押してください")
     
+    # SIGTERM でも atexit の処理（保存を遅らせている変更の書き出し）を実行してから終了する
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
     app.run(debug=True, host='0.0.0.0', port=8083)
@@ -0,0 +1,221 @@
+"""
+TODOアプリ - アーカイブ
+完了してから時間がたったTODOを、メモリ上のTODOとは別に月ごとの圧縮ファイルへ追記して保管する
+"""
+
+import gzip
+import os
+import threading
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import codec
+
+INDEX_FILE = "index.ndjson"
+SEGMENT_SUFFIX = ".ndjson.gz"
+
+# 1つの gzip メンバーに入れるTODOの上限（1件を取得するときに展開する量を抑える）
+MEMBER_SIZE = 256
+
+# 索引の取り消し行がこの件数を超え、かつ有効な行より多くなったら索引を書き直す
+COMPACT_MIN_DEAD = 1000
+
+
+def archived_at(todo: Dict) -> str:
+    """アーカイブの基準にする日時（完了日時。記録されていない古いTODOは作成日時）"""
+    return todo.get("completed_at") or todo.get("created_at") or ""
+
+
+def segment_name(todo: Dict) -> str:
+    """TODOを入れるセグメント（基準日時の年月 YYYY-MM）"""
+    month = archived_at(todo)[:7]
+    return month if len(month) == 7 and month[4] == "-" else "unknown"
+
+
+def _read_member(path: str, offset: int) -> List[Dict]:
+    """セグメントの offset から始まる gzip メンバーを1つだけ展開し、TODOの辞書のリストを返す"""
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    chunks = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while not decompressor.eof:
+            data = f.read(64 * 1024)
+            if not data:
+                break
+            chunks.append(decompressor.decompress(data))
+    return [codec.loads(line) for line in b"".join(chunks).splitlines() if line]
+
+
+def _matches(todo: Dict, terms: List[Tuple[str, bool]]) -> bool:
+    """TODOのタイトル・説明が検索語をすべて含むか（SearchIndex と同じ語の単位で照合する）"""
+    from search import tokenize
+    tokens = tokenize(todo["title"]) | tokenize(todo.get("description") or "")
+    return all(term in tokens or (prefix and any(token.startswith(term) for token in tokens))
+               for term, prefix in terms)
+
+
+class TodoArchive:
+    """完了済みのTODO（辞書）を保管する追記専用のアーカイブ
+
+    TODOは基準日時の月ごとのセグメント（YYYY-MM.ndjson.gz）に、MEMBER_SIZE 件ずつの gzip メンバー
+    （1行1件のJSON）として追記する。索引（index.ndjson）には ID → (セグメント, メンバーの開始位置) を追記し、
+    取り出したTODOは取り消しの行を追記する。メモリに持つのは索引だけで、TODOの本文は必要なときに
+    メンバー単位で展開して読む。セグメントと索引は書き換えないので、読み込み側はロックなしで読める
+    （索引は追記された分だけを読み足す）。書き込みの排他は呼び出し側（TodoManager のファイルロック）が行う。
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self._lock = threading.Lock()
+        # ID → (セグメント, メンバーの開始位置)
+        self._index: Dict[int, Tuple[str, int]] = {}
+        # 読み込み済みの索引ファイル（inode）と位置、取り消し行の数
+        self._index_state: Tuple[Optional[int], int] = (None, 0)
+        self._dead = 0
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._index)
+
+    def __contains__(self, todo_id: int) -> bool:
+        self._refresh()
+        return todo_id in self._index
+
+    def _segment_path(self, segment: str) -> str:
+        return os.path.join(self.directory, segment + SEGMENT_SUFFIX)
+
+    def _refresh(self) -> None:
+        """索引ファイルの追記分を読み足す（書き直されていれば読み直す）"""
+        with self._lock:
+            try:
+                st = os.stat(self.index_path)
+            except FileNotFoundError:
+                self._index, self._index_state, self._dead = {}, (None, 0), 0
+                return
+            inode, offset = self._index_state
+            if inode != st.st_ino or st.st_size < offset:
+                self._index, offset, self._dead = {}, 0, 0
+            if st.st_size == offset:
+                return
+            with open(self.index_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+            # 書き込み途中の最後の行は次回に読む
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                self._apply_index_line(codec.loads(line))
+            self._index_state = (st.st_ino, offset + end)
+
+    def _apply_index_line(self, entry: Dict) -> None:
+        """索引の1行をメモリ上の索引に反映（ロック取得済みで呼ぶ）"""
+        if entry.get("removed"):
+            if self._index.pop(entry["id"], None) is not None:
+                self._dead += 2
+        else:
+            if entry["id"] in self._index:
+                self._dead += 1
+            self._index[entry["id"]] = (entry["segment"], entry["offset"])
+
+    def _append_index(self, entries: List[Dict]) -> None:
+        """索引に行を追記してディスクに同期し、メモリ上の索引にも反映"""
+        data = b"".join(codec.dumps(entry) + b"\n" for entry in entries)
+        with open(self.index_path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._refresh()
+        if self._dead > COMPACT_MIN_DEAD and self._dead > len(self._index):
+            self._compact_index()
+
+    def _compact_index(self) -> None:
+        """取り消された行を除いて索引を書き直す（一時ファイルから置き換えるので、読み込み側は読み直す）"""
+        with self._lock:
+            entries = [{"id": todo_id, "segment": segment, "offset": offset}
+                       for todo_id, (segment, offset) in self._index.items()]
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(b"".join(codec.dumps(entry) + b"\n" for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+        self._refresh()
+
+    def append(self, todos: Iterable[Dict]) -> int:
+        """TODOをセグメントに追記して索引に登録し、件数を返す（ファイルの排他ロックを取得して呼ぶ）"""
+        segments: Dict[str, List[Dict]] = {}
+        for todo in todos:
+            segments.setdefault(segment_name(todo), []).append(todo)
+        if not segments:
+            return 0
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for segment, segment_todos in sorted(segments.items()):
+            with open(self._segment_path(segment), 'ab') as f:
+                for start in range(0, len(segment_todos), MEMBER_SIZE):
+                    member = segment_todos[start:start + MEMBER_SIZE]
+                    offset = f.tell()
+                    f.write(gzip.compress(b"".join(codec.dumps(todo) + b"\n" for todo in member)))
+                    entries.extend({"id": todo["id"], "segment": segment, "offset": offset} for todo in member)
+                f.flush()
+                os.fsync(f.fileno())
+        # 本文を書き終えてから索引に載せるので、索引から引けるTODOは必ず読める
+        self._append_index(entries)
+        return len(entries)
+
+    def remove(self, todo_ids: Iterable[int]) -> None:
+        """TODOを索引から外す（セグメントの本文は残る。ファイルの排他ロックを取得して呼ぶ）"""
+        entries = [{"id": todo_id, "removed": True} for todo_id in todo_ids]
+        if entries:
+            self._append_index(entries)
+
+    def get(self, todo_id: int) -> Optional[Dict]:
+        """アーカイブされたTODOを取得（なければ None）"""
+        self._refresh()
+        location = self._index.get(todo_id)
+        if location is None:
+            return None
+        segment, offset = location
+        for data in _read_member(self._segment_path(segment), offset):
+            if data["id"] == todo_id:
+                return data
+        return None
+
+    def _members(self) -> Dict[Tuple[str, int], List[int]]:
+        """メンバー (セグメント, 開始位置) ごとの、索引に載っているIDのリスト"""
+        self._refresh()
+        with self._lock:
+            members: Dict[Tuple[str, int], List[int]] = {}
+            for todo_id, location in self._index.items():
+                members.setdefault(location, []).append(todo_id)
+        return members
+
+    def iter_todos(self) -> Iterator[Dict]:
+        """アーカイブされたTODOを古いセグメントから順に返す"""
+        for (segment, offset), ids in sorted(self._members().items()):
+            ids = set(ids)
+            for data in _read_member(self._segment_path(segment), offset):
+                # 取り出した後に再びアーカイブしたTODOは、古いメンバーにも残っているので除く
+                if data["id"] in ids:
+                    ids.discard(data["id"])
+                    yield data
+
+    def search(self, query: str, limit: Optional[int] = 20) -> List[Dict]:
+        """タイトル・説明に検索語をすべて含むTODOを新しい順に取得（全件を展開して照合する）"""
+        from search import query_terms
+        terms = query_terms(query)
+        if not terms:
+            return []
+        found = sorted((todo for todo in self.iter_todos() if _matches(todo, terms)),
+                       key=lambda todo: todo["id"], reverse=True)
+        return found if limit is None else found[:limit]
+
+    def stats(self) -> Dict[str, int]:
+        """アーカイブの件数・セグメント数・セグメントの合計バイト数"""
+        self._refresh()
+        segments = {segment for segment, _ in self._index.values()}
+        size = 0
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(SEGMENT_SUFFIX):
+                    size += os.path.getsize(os.path.join(self.directory, name))
+        return {"count": len(self._index), "segments": len(segments), "bytes": size}
@@ -0,0 +1,712 @@
+#!/usr/bin/env python3
+"""
+TODOアプリ - 非同期（ASGI）版
+app.py と同じAPIを ASGI アプリケーションとして提供する
+
+TodoManager の呼び出し（ロックの待ちとディスクI/O）はスレッドプールで実行し、イベントループは止めない。
+読み込みと変更は別のスレッドプールで実行するので、変更が詰まっても読み込みは待たされない。
+/api/events の長時間の接続はイベントループで待つだけなので、1プロセスで数千の接続を保持できる。
+
+使用方法:
+    python asgi.py                          # 標準ライブラリだけの HTTP/1.1 サーバーで起動（ポート8083）
+    python asgi.py --host 127.0.0.1 --port 8000
+    uvicorn asgi:app --port 8083            # ASGI サーバー（uvicorn など）があればそれでも動く
+
+/api/todos・/api/stats・/api/calendar・/api/events（/api/lists/<リストID>/... も）はこのモジュールで処理し、
+それ以外のルート（画面・検索・アーカイブなど）は app.py の Flask アプリ（WSGI）をスレッドプールで呼び出す。
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import re
+import signal
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote
+from werkzeug.http import parse_etags
+
+# 読み込みがスナップショットの保存を待たないよう、既定で保存をバックグラウンドのスレッドに任せる
+# （TODO_WRITE_BEHIND= と空にすると毎回保存する。ジャーナルモードは追記だけなので対象外）
+if os.environ.get('TODO_JOURNAL') != '1':
+    os.environ.setdefault('TODO_WRITE_BEHIND', '0.05')
+
+import app as web
+import codec
+from events import EventBroadcaster, async_event_stream
+from lists import valid_list_id
+from todo import check_text_fields, normalize_due_date
+
+# 読み込みを実行するスレッドの数（TODO_ASGI_THREADS）。変更は1つのスレッドで順に実行し、
+# 書き込みロックを待つ変更が読み込みのスレッドを埋めないようにする
+readers = ThreadPoolExecutor(int(os.environ.get('TODO_ASGI_THREADS', 32)), thread_name_prefix='todo-read')
+writers = ThreadPoolExecutor(1, thread_name_prefix='todo-write')
+
+# 受け付けるリクエストのヘッダーの上限（バイト）
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class Request:
+    """ハンドラーに渡すリクエスト（クエリ文字列は Flask の request.args.get と同じく最初の値を使う）"""
+
+    __slots__ = ('method', 'args', 'headers', 'body', 'list_id', 'data_version')
+
+    def __init__(self, scope: Dict, body: bytes, list_id: Optional[str]):
+        self.method = scope['method']
+        self.args: Dict[str, str] = {}
+        for key, value in parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True):
+            self.args.setdefault(key, value)
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        self.body = body
+        self.list_id = list_id
+        # 差分同期（/api/changes）の起点としてクライアントに渡すバージョン
+        self.data_version: Optional[Tuple[str, int]] = None
+
+    def json(self) -> Any:
+        """本文のJSON（空かJSONとして解釈できなければ None）"""
+        try:
+            return codec.loads(self.body) if self.body else None
+        except codec.JSONDecodeError:
+            return None
+
+    def not_modified(self, etag: str) -> bool:
+        """If-None-Match が etag と一致するか"""
+        return parse_etags(self.headers.get('if-none-match')).contains(etag)
+
+
+class Response:
+    """ハンドラーが返すレスポンス
+
+    body はバイト列、少しずつ返すイテレータ（スレッドプールで進める）、非同期イテレータ（ループで進める）のいずれか。
+    """
+
+    __slots__ = ('status', 'headers', 'body')
+
+    def __init__(self, body: Any = b'', status: int = 200, content_type: Optional[str] = 'application/json',
+                 headers: List[Tuple[str, str]] = None):
+        self.status = status
+        self.headers = [('Content-Type', content_type)] if content_type else []
+        self.headers += headers or []
+        self.body = body
+
+
+def json_response(data: Any, status: int = 200) -> Response:
+    """データをJSONにして返す"""
+    return Response(codec.dumps(data), status)
+
+
+def error(message: str, status: int = 400) -> Response:
+    """{'error': message} を返す（app.py と同じ形式）"""
+    return json_response({'error': message}, status)
+
+
+def refresh(request: Request, manager) -> None:
+    """他のプロセスによる変更を取り込み、レスポンスのヘッダーに付けるバージョンを記録"""
+    manager.refresh()
+    request.data_version = (manager.epoch, manager.version)
+
+
+def make_etag(manager, *parts) -> str:
+    """データのバージョンからETagを作成（app.data_etag と同じ形式。refresh() の後に呼ぶ）"""
+    return '-'.join([manager.epoch] + [str(part) for part in parts])
+
+
+def with_etag(request: Request, response: Response, etag: str) -> Response:
+    """レスポンスに強いETagを付け、毎回再検証させる"""
+    response.headers += [('ETag', f'"{etag}"'), ('Cache-Control', 'no-cache')]
+    if request.data_version is not None:
+        epoch, version = request.data_version
+        response.headers += [('X-Data-Epoch', epoch), ('X-Data-Version', str(version))]
+    return response
+
+
+def not_modified(request: Request, etag: str) -> Response:
+    """本文を作らずに 304 Not Modified を返す"""
+    return with_etag(request, Response(status=304, content_type=None), etag)
+
+
+def get_todos(request: Request, manager) -> Response:
+    """GET /api/todos（app.get_todos と同じ。一覧は送信しながらエンコードする）"""
+    refresh(request, manager)
+    etag = make_etag(manager, manager.version)
+    if request.not_modified(etag):
+        return not_modified(request, etag)
+
+    args = request.args
+    show_completed = args.get('show_completed', 'true').lower() == 'true'
+    include_archived = args.get('include_archived', 'false').lower() == 'true'
+    date = args.get('date')
+    paginated = 'limit' in args or 'cursor' in args
+
+    try:
+        fields = web.parse_fields(args)
+        if include_archived and (paginated or 'sort' in args):
+            raise ValueError("include_archivedはlimit・cursor・sortと同時に指定できません")
+        if date:
+            todos = manager.get_todos_by_date(date, show_completed)
+        elif paginated or 'sort' in args:
+            limit = None
+            if paginated:
+                limit = args.get('limit', '100')
+                limit = int(limit) if limit.isdigit() else 0
+                if not 1 <= limit <= web.MAX_PAGE_SIZE:
+                    raise ValueError(f"limitは1から{web.MAX_PAGE_SIZE}の範囲で指定してください")
+            todos, next_cursor = manager.query_todos(limit, args.get('cursor'), args.get('sort', 'id'),
+                                                     show_completed)
+            if paginated:
+                body = (b'{"todos":' + codec.encode_array(todo.to_json(fields) for todo in todos) +
+                        b',"next_cursor":' + codec.dumps(next_cursor) + b'}')
+                return with_etag(request, Response(body), etag)
+        else:
+            todos = manager.get_todos(show_completed)
+    except ValueError as e:
+        return error(str(e))
+
+    if include_archived and show_completed:
+        todos = web.with_archived(manager, todos, date)
+    return with_etag(request, Response(codec.iter_array(todo.to_json(fields) for todo in todos)), etag)
+
+
+def add_todo(request: Request, manager) -> Response:
+    """POST /api/todos"""
+    data = request.json()
+
+    if not data or 'title' not in data:
+        return error('タイトルは必須です')
+
+    try:
+        check_text_fields(title=data['title'], description=data.get('description'), due_date=data.get('due_date'))
+    except ValueError as e:
+        return error(str(e))
+
+    title = data['title'].strip()
+    description = (data.get('description') or '').strip()
+    due_date = (data.get('due_date') or '').strip() or None
+
+    if not title:
+        return error('タイトルは必須です')
+
+    try:
+        todo = manager.add_todo(title, description, due_date)
+    except ValueError as e:
+        return error(str(e))
+    return json_response(todo.to_dict(), 201)
+
+
+def update_todo(request: Request, manager, todo_id: int) -> Response:
+    """PUT /api/todos/<todo_id>（完了状態とタイトル・説明・期限日の更新）"""
+    data = request.json()
+
+    if not data:
+        return error('更新データが必要です')
+
+    try:
+        check_text_fields(title=data.get('title'), description=data.get('description'))
+        normalize_due_date(data.get('due_date'))
+    except ValueError as e:
+        return error(str(e))
+
+    if 'completed' in data:
+        if data['completed']:
+            success = manager.complete_todo(todo_id)
+        else:
+            success = manager.uncomplete_todo(todo_id)
+        if not success:
+            return error('TODOが見つかりません', 404)
+
+    title = data.get('title')
+    description = data.get('description')
+    due_date = data.get('due_date')
+
+    if title is not None or description is not None or due_date is not None:
+        if not manager.update_todo(todo_id, title, description, due_date):
+            return error('TODOが見つかりません', 404)
+
+    updated_todo = manager.get_todo_by_id(todo_id)
+    if updated_todo is None:
+        return error('TODOが見つかりません', 404)
+    return json_response(updated_todo.to_dict())
+
+
+def delete_todo(request: Request, manager, todo_id: int) -> Response:
+    """DELETE /api/todos/<todo_id>"""
+    if manager.delete_todo(todo_id):
+        return json_response({'message': 'TODOを削除しました'})
+    return error('TODOが見つかりません', 404)
+
+
+def get_stats(request: Request, manager) -> Response:
+    """GET /api/stats"""
+    refresh(request, manager)
+    # 期限切れ・今日が期限の件数は日付が変わると変わるため、ETagに日付を含める
+    etag = make_etag(manager, manager.version, datetime.now().strftime("%Y%m%d"))
+    if request.not_modified(etag):
+        return not_modified(request, etag)
+    return with_etag(request, json_response(manager.get_stats()), etag)
+
+
+def get_calendar_data(request: Request, manager, year: int, month: int) -> Response:
+    """GET /api/calendar/<year>/<month>（月ごとの本文は app.py と同じキャッシュを使う）"""
+    refresh(request, manager)
+    etag = make_etag(manager, 'm', manager.get_month_version(year, month))
+    if request.not_modified(etag):
+        return not_modified(request, etag)
+
+    show_completed = request.args.get('show_completed', 'true').lower() == 'true'
+
+    def build():
+        month_todos = manager.get_todos_by_month(year, month, show_completed)
+        return b'{' + b','.join(
+            codec.dumps(date_key) + b':' + codec.encode_array(todo.to_json() for todo in todos_list)
+            for date_key, todos_list in month_todos.items()
+        ) + b'}'
+
+    body = web.cached_month_body(manager, request.list_id, 'todos', year, month, show_completed, build)
+    return with_etag(request, Response(body), etag)
+
+
+def get_calendar_range(request: Request, manager) -> Response:
+    """GET /api/calendar/range（start から months か月分の概要）"""
+    try:
+        year, month = web.parse_month(request.args.get('start', ''))
+        count = request.args.get('months', '3')
+        count = int(count) if count.isdigit() else 0
+        if not 1 <= count <= web.MAX_CALENDAR_MONTHS:
+            raise ValueError(f"monthsは1から{web.MAX_CALENDAR_MONTHS}の範囲で指定してください")
+    except ValueError as e:
+        return error(str(e))
+    months = [(year + (month - 1 + i) // 12, (month - 1 + i) % 12 + 1) for i in range(count)]
+
+    refresh(request, manager)
+    etag = make_etag(manager, 'r', *(manager.get_month_version(y, m) for y, m in months))
+    if request.not_modified(etag):
+        return not_modified(request, etag)
+
+    show_completed = request.args.get('show_completed', 'true').lower() == 'true'
+    parts = []
+    for y, m in months:
+        summary = web.cached_month_body(manager, request.list_id, 'summary', y, m, show_completed,
+                                        lambda: codec.dumps(manager.get_month_summary(y, m, show_completed)))
+        parts.append(codec.dumps(f"{y:04d}-{m:02d}") + b':' + summary)
+    return with_etag(request, Response(b'{' + b','.join(parts) + b'}'), etag)
+
+
+async def events(request: Request) -> Response:
+    """GET /api/events（変更イベントの Server-Sent Events。接続ごとにスレッドを使わない）"""
+    loop = asyncio.get_running_loop()
+    list_id = request.list_id
+    broadcaster = web.broadcasters.setdefault(list_id, EventBroadcaster())
+    stream = async_event_stream(broadcaster, lambda: loop.run_in_executor(readers, web.list_hello, list_id),
+                                web.EVENTS_HEARTBEAT,
+                                lambda: loop.run_in_executor(readers, web.refresh_list, list_id))
+    # リバースプロキシ（nginx）にバッファリングさせない
+    return Response(stream, content_type='text/event-stream; charset=utf-8',
+                    headers=[('Cache-Control', 'no-cache'), ('X-Accel-Buffering', 'no')])
+
+
+# (メソッド, パス, ルール（メトリクスのラベル。app.py のURLのパターンと同じ）, ハンドラー)
+# パスは /api または /api/lists/<リストID> より後の部分。コルーチン関数のハンドラーはイベントループで実行する
+ROUTES = [
+    ('GET', re.compile(r'/todos'), '/todos', get_todos),
+    ('POST', re.compile(r'/todos'), '/todos', add_todo),
+    ('PUT', re.compile(r'/todos/(\d+)'), '/todos/<int:todo_id>', update_todo),
+    ('DELETE', re.compile(r'/todos/(\d+)'), '/todos/<int:todo_id>', delete_todo),
+    ('GET', re.compile(r'/stats'), '/stats', get_stats),
+    ('GET', re.compile(r'/calendar/(\d+)/(\d+)'), '/calendar/<int:year>/<int:month>', get_calendar_data),
+    ('GET', re.compile(r'/calendar/range'), '/calendar/range', get_calendar_range),
+    ('GET', re.compile(r'/events'), '/events', events),
+]
+
+_API_PATH = re.compile(r'/api(?:/lists/([^/]+))?(/.*)')
+
+
+def match_route(method: str, path: str) -> Optional[Tuple[Callable, str, Optional[str], Tuple[int, ...]]]:
+    """(ハンドラー, ルール, リストID, URLの数値) を返す（このモジュールで処理しないルートは None）"""
+    match = _API_PATH.fullmatch(path)
+    if match is None:
+        return None
+    list_id, rest = match.groups()
+    for route_method, pattern, rule, handler in ROUTES:
+        if route_method != method:
+            continue
+        params = pattern.fullmatch(rest)
+        if params is not None:
+            prefix = '/api' if list_id is None else '/api/lists/<list_id>'
+            return handler, prefix + rule, list_id, tuple(int(value) for value in params.groups())
+    return None
+
+
+def call_handler(handler: Callable, request: Request, params: Tuple[int, ...]) -> Response:
+    """リクエストの間だけリストの TodoManager を使用中にしてハンドラーを呼ぶ（スレッドプールで実行）"""
+    try:
+        with web.using_list(request.list_id) as manager:
+            return handler(request, manager, *params)
+    except Exception:
+        traceback.print_exc()
+        return error('サーバーエラーが発生しました', 500)
+
+
+async def read_body(receive: Callable) -> bytes:
+    """リクエストの本文をすべて受け取る"""
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            return b''.join(chunks)
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def iterate_in(executor: ThreadPoolExecutor, iterable: Iterable) -> AsyncIterator:
+    """同期のイテレータをスレッドプールで1つずつ進める（最後に close() があれば呼ぶ）"""
+    loop = asyncio.get_running_loop()
+    iterator = iter(iterable)
+    try:
+        while True:
+            chunk = await loop.run_in_executor(executor, next, iterator, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            await loop.run_in_executor(executor, close)
+
+
+async def stream_body(chunks: AsyncIterator, receive: Callable, send: Callable) -> None:
+    """本文を少しずつ送る（クライアントが切断したら送るのをやめ、chunks の後始末をする）"""
+    async def pump():
+        try:
+            async for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            await chunks.aclose()
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(disconnected())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        result = (await asyncio.gather(*tasks, return_exceptions=True))[0]
+    # 切断による送信の失敗以外のエラーは表示する
+    if isinstance(result, Exception) and not isinstance(result, OSError):
+        traceback.print_exception(type(result), result, result.__traceback__)
+
+
+async def send_response(response: Response, receive: Callable, send: Callable) -> None:
+    """ハンドラーのレスポンスを送る"""
+    headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers]
+    body = response.body
+    if isinstance(body, bytes):
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': response.status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+        return
+    await send({'type': 'http.response.start', 'status': response.status, 'headers': headers})
+    if not hasattr(body, '__aiter__'):
+        body = iterate_in(readers, body)
+    await stream_body(body, receive, send)
+
+
+def wsgi_environ(scope: Dict, body: bytes) -> Dict:
+    """ASGI の scope から WSGI の environ を作成"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': '',
+        # WSGI のパスは、UTF-8 のバイト列を latin-1 の文字列として表す
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else 'HTTP_' + name
+        value = value.decode('latin-1')
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+def start_wsgi(environ: Dict) -> Tuple[int, List[Tuple[bytes, bytes]], Iterable[bytes]]:
+    """Flask アプリを呼び出し、(ステータス, ヘッダー, 本文のイテレータ) を返す（スレッドプールで実行）"""
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [int(status.split(' ', 1)[0]),
+                      [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]]
+
+    result = web.app(environ, start_response)
+    return started[0], started[1], result
+
+
+async def call_flask(scope: Dict, receive: Callable, send: Callable) -> None:
+    """このモジュールで処理しないルートを app.py の Flask アプリで処理する"""
+    body = await read_body(receive)
+    executor = readers if scope['method'] in ('GET', 'HEAD') else writers
+    status, headers, result = await asyncio.get_running_loop().run_in_executor(
+        executor, start_wsgi, wsgi_environ(scope, body))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await stream_body(iterate_in(executor, result), receive, send)
+
+
+def shutdown() -> None:
+    """開いているリストと既定のリストを閉じる（保存を遅らせている変更を書き出す）"""
+    web.list_registry.close()
+    web.todo_manager.close()
+
+
+async def lifespan(receive: Callable, send: Callable) -> None:
+    """ASGI サーバーの起動・終了の通知を処理"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await asyncio.get_running_loop().run_in_executor(writers, shutdown)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope: Dict, receive: Callable, send: Callable) -> None:
+    """ASGI アプリケーション"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        raise ValueError(f"{scope['type']} には対応していません")
+    method = scope['method']
+    match = match_route(method, scope['path'])
+    if match is None:
+        await call_flask(scope, receive, send)
+        return
+    start = time.perf_counter()
+    handler, rule, list_id, params = match
+    request = Request(scope, await read_body(receive), list_id)
+    if list_id is not None and not valid_list_id(list_id):
+        response = error('リストIDは英数字・-・_ の64文字以内で指定してください')
+    elif asyncio.iscoroutinefunction(handler):
+        response = await handler(request)
+    else:
+        executor = readers if method == 'GET' else writers
+        response = await asyncio.get_running_loop().run_in_executor(executor, call_handler, handler, request,
+                                                                       params)
+    web.request_seconds.observe(time.perf_counter() - start, method, rule, str(response.status))
+    await send_response(response, receive, send)
+
+
+class _Exchange:
+    """組み込みサーバーの1つのリクエストの receive / send
+
+    レスポンスの本文は、1回で送られる場合は Content-Length を付け、続きがある場合はチャンク転送で送る。
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, buffer: bytearray,
+                 body: bytes, keep_alive: bool):
+        self.reader = reader
+        self.writer = writer
+        self.buffer = buffer
+        self.body = body
+        self.keep_alive = keep_alive
+        self.status = 500
+        self.headers: List[Tuple[bytes, bytes]] = []
+        self.started = False
+        self.chunked = False
+        self.finished = False
+
+    async def receive(self) -> Dict:
+        if self.body is not None:
+            body, self.body = self.body, None
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        # 本文の後は切断されるまで待つ（届いたデータは次のリクエストとして残しておく）
+        while True:
+            data = await self.reader.read(64 * 1024)
+            if not data:
+                return {'type': 'http.disconnect'}
+            self.buffer += data
+
+    async def send(self, message: Dict) -> None:
+        if self.writer.is_closing():
+            raise ConnectionResetError("接続が閉じられています")
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+            self.headers = list(message.get('headers', []))
+            return
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+        if not self.started:
+            self.started = True
+            self._write_head(body, more_body)
+        if self.chunked:
+            if body:
+                self.writer.write(b'%x\r\n%s\r\n' % (len(body), body))
+            if not more_body:
+                self.writer.write(b'0\r\n\r\n')
+        else:
+            self.writer.write(body)
+        if not more_body:
+            self.finished = True
+        await self.writer.drain()
+
+    def _write_head(self, body: bytes, more_body: bool) -> None:
+        """ステータス行とヘッダーを書き込む"""
+        try:
+            reason = HTTPStatus(self.status).phrase.encode('latin-1')
+        except ValueError:
+            reason = b''
+        headers = self.headers
+        names = {name.lower() for name, _ in headers}
+        if b'content-length' not in names and self.status >= 200 and self.status not in (204, 304):
+            if more_body:
+                self.chunked = True
+                headers.append((b'transfer-encoding', b'chunked'))
+            else:
+                headers.append((b'content-length', b'%d' % len(body)))
+        if not self.keep_alive:
+            headers.append((b'connection', b'close'))
+        self.writer.write(b'HTTP/1.1 %d %s\r\n' % (self.status, reason) +
+                          b''.join(name + b': ' + value + b'\r\n' for name, value in headers) + b'\r\n')
+
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, application: Callable) -> None:
+    """1つの接続のリクエストを順に処理する（HTTP/1.1 の keep-alive。リクエストのチャンク転送には対応しない）"""
+    buffer = bytearray()
+    server = writer.get_extra_info('sockname')
+    client = writer.get_extra_info('peername')
+    try:
+        while True:
+            end = buffer.find(b'\r\n\r\n')
+            while end < 0:
+                if len(buffer) > MAX_HEADER_BYTES:
+                    return
+                data = await reader.read(64 * 1024)
+                if not data:
+                    return
+                buffer += data
+                end = buffer.find(b'\r\n\r\n')
+            request_line, *lines = bytes(buffer[:end]).decode('latin-1').split('\r\n')
+            del buffer[:end + 4]
+            headers = []
+            for line in lines:
+                name, _, value = line.partition(':')
+                headers.append((name.strip().lower().encode('latin-1'), value.strip().encode('latin-1')))
+            fields = dict(headers)
+            parts = request_line.split(' ')
+            length = fields.get(b'content-length', b'0')
+            if len(parts) != 3 or not length.isdigit() or b'chunked' in fields.get(b'transfer-encoding', b''):
+                writer.write(b'HTTP/1.1 400 Bad Request\r\ncontent-length: 0\r\nconnection: close\r\n\r\n')
+                return
+            method, target, version = parts
+            length = int(length)
+            while len(buffer) < length:
+                data = await reader.read(64 * 1024)
+                if not data:
+                    return
+                buffer += data
+            body = bytes(buffer[:length])
+            del buffer[:length]
+            path, _, query = target.partition('?')
+            keep_alive = version == 'HTTP/1.1' and fields.get(b'connection', b'').lower() != b'close'
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': version[5:],
+                'method': method,
+                'scheme': 'http',
+                'path': unquote(path, errors='replace'),
+                'raw_path': path.encode('latin-1'),
+                'query_string': query.encode('latin-1'),
+                'root_path': '',
+                'headers': headers,
+                'client': client[:2] if client else None,
+                'server': server[:2] if server else None,
+            }
+            exchange = _Exchange(reader, writer, buffer, body, keep_alive)
+            await application(scope, exchange.receive, exchange.send)
+            if not keep_alive or not exchange.finished:
+                return
+    except ConnectionError:
+        pass
+    except Exception:
+        traceback.print_exc()
+    finally:
+        writer.close()
+
+
+def raise_open_files_limit() -> None:
+    """多数の接続を保持できるよう、開けるファイル数の上限をハードリミットまで上げる"""
+    try:
+        import resource
+    except ImportError:  # Windows では変更しない
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = hard if hard != resource.RLIM_INFINITY else max(soft, 65536)
+    if soft != resource.RLIM_INFINITY and soft < target:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        except (ValueError, OSError):
+            pass
+
+
+async def serve(host: str, port: int) -> None:
+    """組み込みの HTTP/1.1 サーバーで app を起動し、SIGINT・SIGTERM で保存してから終了する"""
+    raise_open_files_limit()
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):  # Windows・メインスレッド以外
+            pass
+    server = await asyncio.start_server(lambda reader, writer: handle_connection(reader, writer, app),
+                                        host, port, backlog=4096)
+    try:
+        await stop.wait()
+    finally:
+        server.close()
+        await loop.run_in_executor(writers, shutdown)
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="TODOアプリ（ASGI版）を組み込みの HTTP/1.1 サーバーで起動")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8083)
+    args = parser.parse_args(argv)
+
+    print("🌐 TODOアプリ（ASGI版）を起動しています...")
+    print(f"📱 ブラウザで http://localhost:{args.port} にアクセスしてください")
+    print("🛑 終了するには Ctrl+C を押してください")
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
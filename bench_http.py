@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+TODOアプリのHTTPスループットのベンチマーク
+app.py（Flask の開発サーバー）と asgi.py（組み込みの HTTP/1.1 サーバー）を同じ合成データで起動し、
+多数の keep-alive の接続から読み込み中心のリクエストを送って、1秒あたりの処理数と応答時間を比較する
+
+使用方法:
+    python bench_http.py                                # 1万件・100接続・各10秒
+    python bench_http.py --size 100000 --connections 500 --idle 1000 --duration 20
+                                                        # /api/events の接続を1000本保持したまま計測
+    python bench_http.py --only asgi                    # asgi.py だけ
+
+Flask は app.py の起動方法（開発サーバー、接続ごとのスレッド）と同じだが、自動再読み込みはしない。
+保存の条件をそろえるため、両方とも TODO_WRITE_BEHIND（--write-behind）で保存をまとめる。
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from typing import Dict, List, Tuple
+from bench_suite import around_today, metadata, month_of, save_json, write_dataset
+
+SERVERS = ["flask", "asgi"]
+
+# (重み, メソッド, URL, 本文)。読み込み中心で、1割を追加・完了にする
+Request = Tuple[int, str, str, bytes]
+
+
+def request_mix(size: int, today: date, rng: random.Random) -> Tuple[str, str, bytes]:
+    """次に送るリクエスト (メソッド, URL, 本文) を重みに従って選ぶ"""
+    i = rng.randrange(1 << 20)
+    year, month = month_of(today, i)
+    day = around_today(today, i).isoformat()
+    mix: List[Request] = [
+        (30, "GET", "/api/todos?limit=50", b""),
+        (20, "GET", "/api/stats", b""),
+        (20, "GET", f"/api/calendar/{year}/{month}", b""),
+        (10, "GET", f"/api/todos?date={day}", b""),
+        (10, "GET", f"/api/calendar/range?start={year:04d}-{month:02d}&months=3", b""),
+        (5, "POST", "/api/todos", ('{"title": "HTTPベンチマーク %d", "due_date": "%s"}' % (i, day)).encode()),
+        (5, "PUT", f"/api/todos/{rng.randint(1, size)}", b'{"completed": true}'),
+    ]
+    _, method, url, body = rng.choices(mix, weights=[weight for weight, _, _, _ in mix])[0]
+    return method, url, body
+
+
+async def read_response(reader: asyncio.StreamReader) -> Tuple[int, bool]:
+    """レスポンスを本文まで読み、(ステータス, 接続を続けられるか) を返す"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    version, status = lines[0].split(" ")[:2]
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif "chunked" in headers.get("transfer-encoding", ""):
+        while True:
+            length = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(length + 2)
+            if not length:
+                break
+    elif status not in ("204", "304"):
+        # 長さの分からない本文は切断まで続く
+        await reader.read()
+        return int(status), False
+    keep_alive = version == "HTTP/1.1" and headers.get("connection") != "close"
+    return int(status), keep_alive
+
+
+async def connection_loop(port: int, size: int, today: date, seed: int, start: float, deadline: float,
+                          latencies: List[float], statuses: Dict[int, int]) -> None:
+    """1つの接続でリクエストを順に送り、start より後に送ったものの応答時間を記録する"""
+    rng = random.Random(seed)
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        method, url, body = request_mix(size, today, rng)
+        sent = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"{method} {url} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            status, keep_alive = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            status, keep_alive = 0, False
+        if sent >= start:
+            latencies.append(time.perf_counter() - sent)
+            statuses[status] = statuses.get(status, 0) + 1
+        if not keep_alive and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def _client(port: int, size: int, today: date, connections: int, seed: int, warmup: float, duration: float,
+            results) -> None:
+    """別プロセスで connections 本の接続からリクエストを送り、結果をキューに入れる"""
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def run():
+        start = time.perf_counter() + warmup
+        deadline = start + duration
+        await asyncio.gather(*(connection_loop(port, size, today, seed * 100_000 + i, start, deadline,
+                                               latencies, statuses) for i in range(connections)))
+
+    asyncio.run(run())
+    results.put({"latencies": latencies, "statuses": statuses})
+
+
+def _idle_holder(port: int, count: int, opened, stop) -> None:
+    """別プロセスで /api/events の接続を count 本開き、stop まで保持する（届いたイベントは読み捨てる）"""
+    async def hold(index: int, ready: List[int]):
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /api/events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            await reader.readuntil(b"event: hello")
+            ready.append(index)
+            while await reader.read(64 * 1024):
+                pass
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+
+    async def run():
+        ready: List[int] = []
+        tasks = []
+        for index in range(count):
+            tasks.append(asyncio.ensure_future(hold(index, ready)))
+            # 一度に接続しすぎて accept の待ち行列があふれないよう、少しずつ開く
+            if index % 100 == 99:
+                await asyncio.sleep(0.05)
+        deadline = time.time() + 60
+        while len(ready) < count and time.time() < deadline and not all(task.done() for task in tasks):
+            await asyncio.sleep(0.1)
+        opened.put(len(ready))
+        while not stop.is_set():
+            await asyncio.sleep(0.1)
+        for task in tasks:
+            task.cancel()
+
+    asyncio.run(run())
+
+
+def free_port() -> int:
+    """空いているポート番号"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(port: int, server: subprocess.Popen, timeout: float = 120) -> None:
+    """サーバーが応答するまで待つ"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"サーバーが起動できませんでした（終了コード {server.returncode}）")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as sock:
+                sock.sendall(b"GET /api/stats HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+                if sock.recv(12).startswith(b"HTTP/1.1 200"):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("サーバーが時間内に応答しませんでした")
+
+
+def serve(kind: str, port: int) -> None:
+    """サーバーとして起動（ベンチマークから別プロセスで呼ばれる）"""
+    if kind == "asgi":
+        import asgi
+        asgi.main(["--host", "127.0.0.1", "--port", str(port)])
+        return
+    import logging
+    from werkzeug.serving import run_simple
+    import app as web
+    # リクエストごとのログを出さない
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    # SIGTERM でも atexit の処理（保存を遅らせている変更の書き出し）を実行してから終了する
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    run_simple("127.0.0.1", port, web.app, threaded=True)
+
+
+def bench_server(kind: str, directory: str, args, today: date) -> Dict:
+    """サーバーを起動してクライアントのプロセスからリクエストを送り、スループットと応答時間を返す"""
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)),
+               TODO_WRITE_BEHIND=str(args.write_behind))
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", kind, "--port", str(port)],
+                              cwd=directory, env=env, stdout=subprocess.DEVNULL)
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    holder = None
+    try:
+        wait_ready(port, server)
+        idle = 0
+        if args.idle:
+            opened = context.Queue()
+            holder = context.Process(target=_idle_holder, args=(port, args.idle, opened, stop))
+            holder.start()
+            idle = opened.get()
+        results = context.Queue()
+        per_client = [args.connections // args.clients + (i < args.connections % args.clients)
+                      for i in range(args.clients)]
+        clients = [context.Process(target=_client, args=(port, args.size, today, count, i, args.warmup,
+                                                         args.duration, results))
+                   for i, count in enumerate(per_client) if count]
+        for client in clients:
+            client.start()
+        outputs = [results.get() for _ in clients]
+        for client in clients:
+            client.join()
+    finally:
+        stop.set()
+        if holder is not None:
+            holder.join(10)
+        server.terminate()
+        server.wait(30)
+
+    latencies = sorted(latency for output in outputs for latency in output["latencies"])
+    statuses: Dict[int, int] = {}
+    for output in outputs:
+        for status, count in output["statuses"].items():
+            statuses[status] = statuses.get(status, 0) + count
+    errors = sum(count for status, count in statuses.items() if not 200 <= status < 400)
+    return {
+        "server": kind,
+        "size": args.size,
+        "connections": args.connections,
+        "idle": idle,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / args.duration,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else 0.0
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="TODOアプリのHTTPスループットのベンチマーク（Flask と ASGI の比較）")
+    parser.add_argument("--size", type=int, default=10_000, help="TODOの件数")
+    parser.add_argument("--connections", type=int, default=100, help="リクエストを送る接続の数")
+    parser.add_argument("--idle", type=int, default=0, help="計測中に保持する /api/events の接続の数")
+    parser.add_argument("--clients", type=int, default=min(4, os.cpu_count() or 1), help="クライアントのプロセス数")
+    parser.add_argument("--duration", type=float, default=10.0, help="サーバーごとの計測時間（秒）")
+    parser.add_argument("--warmup", type=float, default=2.0, help="計測前に送り続ける時間（秒）")
+    parser.add_argument("--write-behind", type=float, default=0.05, help="TODO_WRITE_BEHIND（秒）")
+    parser.add_argument("--only", choices=SERVERS, help="どちらかのサーバーだけを計測")
+    parser.add_argument("--output", default="bench_http_results.json", help="結果のJSONファイル")
+    parser.add_argument("--serve", choices=SERVERS, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.serve:
+        serve(args.serve, args.port)
+        return 0
+
+    today = date.today()
+    results = []
+    print(f"{'サーバー':<8} | {'接続':>6} | {'待機':>6} | {'リクエスト/秒':>12} | {'p50(ms)':>9} | {'p99(ms)':>9} | "
+          f"{'エラー':>6}")
+    print("-" * 78)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for kind in [args.only] if args.only else SERVERS:
+            directory = os.path.join(tmp_dir, kind)
+            os.makedirs(directory)
+            write_dataset(os.path.join(directory, "todos.json"), args.size, today)
+            result = bench_server(kind, directory, args, today)
+            results.append(result)
+            print(f"{kind:<8} | {result['connections']:>6} | {result['idle']:>6} | {result['rps']:>12.1f} | "
+                  f"{result['p50_ms']:>9.2f} | {result['p99_ms']:>9.2f} | {result['errors']:>6}")
+    meta = dict(metadata(args.duration), connections=args.connections, idle=args.idle, clients=args.clients,
+                write_behind=args.write_behind)
+    save_json(args.output, {"meta": meta, "results": results})
+    print(f"\n💾 結果を {args.output} に保存しました")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+TODOアプリのベンチマークスイート
+TodoManager の全メソッドと app.py の全ルートを合成データで計測し、結果をJSONで保存して基準と比較する
+
+使用方法:
+    python bench_suite.py                           # 1k〜1Mの各件数で計測し bench_results.json に保存
+    python bench_suite.py --sizes 1000 10000        # 件数を指定
+    python bench_suite.py --only manager            # TodoManager だけ（routes でルートだけ）
+    python bench_suite.py --save-baseline           # 結果を基準として bench_baseline.json にも保存
+    python bench_suite.py --baseline bench_baseline.json --threshold 0.25
+                                                    # 基準より25%以上遅くなった項目があれば終了コード1
+"""
+
+import argparse
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+import codec
+from bench_todo import search_text
+from todo import TodoManager
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+# 計測しない TodoManager のメソッド（リスナーの登録・解除や終了処理）
+EXCLUDED_METHODS = {"add_listener", "remove_listener", "add_due_listener", "remove_due_listener", "close",
+                    "wait_loaded"}
+
+# 検索の項目で順に使う検索語
+SEARCH_QUERIES = ["請求書 支払い", "会議", "deplo", "#1234", "歯医者 deploy"]
+
+# ベンチマークの1項目: (名前, 計測する処理 func(i), オプション)
+# オプション: warmup（最初に1回計測せずに呼ぶか、既定 True）、max_runs（最大回数）、
+# setup（各回の前に計測せずに呼ぶ setup(i)）
+Case = Tuple[str, Callable[[int], object], Dict]
+
+
+def synthetic_todo(todo_id: int, rng: random.Random, today: date) -> Dict:
+    """実際の使われ方に近い期限日の分布を持つTODOを1件作成
+
+    期限なしが25%、期限切れ（最近のものほど多い）が15%、2週間以内に集中する直近の予定が40%、
+    1〜6か月先が15%、2年先までが5%。期限を過ぎたものほど完了済みの割合が高い。
+    """
+    title, description = search_text(todo_id)
+    r = rng.random()
+    if r < 0.25:
+        offset = None
+    elif r < 0.40:
+        offset = -1 - int(rng.expovariate(1 / 20))
+    elif r < 0.80:
+        offset = int(rng.expovariate(1 / 7))
+    elif r < 0.95:
+        offset = rng.randint(30, 180)
+    else:
+        offset = rng.randint(180, 730)
+    if offset is None:
+        completed = rng.random() < 0.3
+        due_date = None
+    else:
+        completed = rng.random() < (0.6 if offset < 0 else 0.1)
+        due_date = (today + timedelta(days=offset)).isoformat()
+    created = datetime.combine(today + timedelta(days=min(offset or 0, 0) - rng.randint(0, 90)),
+                               datetime.min.time()) + timedelta(seconds=rng.randrange(86400))
+    return {
+        "id": todo_id,
+        "title": title,
+        "description": description,
+        "completed": completed,
+        "created_at": created.strftime("%Y-%m-%d %H:%M:%S"),
+        "due_date": due_date
+    }
+
+
+def write_dataset(path: str, size: int, today: date, seed: int = 0) -> None:
+    """合成データのJSONファイルを作成（全件のリストを作らず、少しずつ書き出す）"""
+    rng = random.Random(seed)
+    todos = (synthetic_todo(todo_id, rng, today) for todo_id in range(1, size + 1))
+    with open(path, 'wb') as f:
+        f.write(b'{"todos":')
+        for chunk in codec.iter_array(codec.dumps(todo) for todo in todos):
+            f.write(chunk)
+        f.write(b',"next_id":%d}' % (size + 1))
+
+
+def measure(func: Callable[[int], object], budget: float, warmup: bool = True, max_runs: int = 1000,
+            min_runs: int = 3, setup: Callable[[int], object] = None) -> Dict[str, float]:
+    """func(i) を繰り返し呼び、1回あたりの時間（μs）の中央値・95パーセンタイル・最小値を返す
+
+    min_runs 回以上、max_runs 回に達するか budget 秒を過ぎるまで繰り返す。
+    warmup=True なら最初に1回（i=0）計測せずに呼ぶ（インデックスの作成などを除くため）。
+    """
+    index = 0
+    if warmup:
+        if setup is not None:
+            setup(index)
+        func(index)
+        index += 1
+    times = []
+    deadline = time.perf_counter() + budget
+    while len(times) < max_runs and (len(times) < min_runs or time.perf_counter() < deadline):
+        if setup is not None:
+            setup(index)
+        start = time.perf_counter()
+        func(index)
+        times.append(time.perf_counter() - start)
+        index += 1
+    times.sort()
+    return {
+        "runs": len(times),
+        "median_us": statistics.median(times) * 1_000_000,
+        "p95_us": times[min(len(times) - 1, int(len(times) * 0.95))] * 1_000_000,
+        "min_us": times[0] * 1_000_000
+    }
+
+
+def run_cases(cases: List[Case], size: int, budget: float, verbose: bool = True) -> List[Dict]:
+    """ベンチマークの項目を順に計測し、結果のリストを返す"""
+    results = []
+    for name, func, options in cases:
+        result = dict(size=size, name=name, **measure(func, budget, **options))
+        results.append(result)
+        if verbose:
+            print(f"{size:>10} | {name:<44} | {result['median_us']:>12.1f} | {result['p95_us']:>12.1f} | "
+                  f"{result['runs']:>6}")
+    return results
+
+
+def sample_ids(rng: random.Random, size: int, count: int) -> List[int]:
+    """重複しないIDを count 個（最大で全体の4分の1）選ぶ"""
+    return rng.sample(range(1, size + 1), max(1, min(count, size // 4)))
+
+
+def around_today(today: date, i: int) -> date:
+    """i ごとに前後30日の範囲を巡回する日付"""
+    return today + timedelta(days=i % 61 - 30)
+
+
+def month_of(today: date, i: int) -> Tuple[int, int]:
+    """i ごとに前後6か月の範囲を巡回する (年, 月)"""
+    index = today.year * 12 + today.month - 1 + i % 13 - 6
+    return index // 12, index % 12 + 1
+
+
+def manager_cases(manager: TodoManager, size: int, today: date, max_runs: int = 1000) -> List[Case]:
+    """TodoManager の各メソッドの項目（読み込み → 変更 → 保存の順。最後に完了済みを一括削除する）"""
+    rng = random.Random(size)
+    read_ids = sample_ids(rng, size, 1000)
+    update_ids, complete_ids, delete_ids = (sample_ids(rng, size, max_runs + 1) for _ in range(3))
+    first_page, cursor = manager.query_todos(50)
+    heavy = {"max_runs": 5}
+    # 同じTODOへの変更を繰り返さないよう、回数は選んだIDの数まで（最初の1回は計測しない）
+    per_id = {"max_runs": len(delete_ids) - 1}
+
+    def complete_some(i: int) -> None:
+        ids = rng.sample(read_ids, min(10, len(read_ids)))
+        manager.apply_batch([{"op": "complete", "id": todo_id} for todo_id in ids])
+
+    # アーカイブしたTODOのID（最初の archive_completed の後に選ぶ）
+    archived: List[int] = []
+
+    def archive_all(i: int) -> None:
+        manager.archive_completed(0)
+        if not archived:
+            archived.extend(todo.id for todo in manager.iter_archived())
+            rng.shuffle(archived)
+
+    return [
+        ("manager.load_todos", lambda i: manager.load_todos(), dict(heavy, warmup=False)),
+        ("manager.refresh", lambda i: manager.refresh(), {}),
+        ("manager.get_todo_by_id", lambda i: manager.get_todo_by_id(read_ids[i % len(read_ids)]), {}),
+        ("manager.get_todos", lambda i: manager.get_todos(), {}),
+        ("manager.get_todos[pending]", lambda i: manager.get_todos(show_completed=False), {}),
+        ("manager.query_todos[id]", lambda i: manager.query_todos(50), {}),
+        ("manager.query_todos[cursor]", lambda i: manager.query_todos(50, cursor), {}),
+        ("manager.query_todos[due_date]", lambda i: manager.query_todos(50, sort="due_date"), {}),
+        ("manager.query_todos[-created_at]", lambda i: manager.query_todos(50, sort="-created_at"), {}),
+        ("manager.get_todos_by_date",
+         lambda i: manager.get_todos_by_date(around_today(today, i).isoformat()), {}),
+        ("manager.get_todos_by_range",
+         lambda i: manager.get_todos_by_range(around_today(today, i).isoformat(),
+                                              (around_today(today, i) + timedelta(days=6)).isoformat()), {}),
+        ("manager.get_todos_by_month", lambda i: manager.get_todos_by_month(*month_of(today, i)), {}),
+        ("manager.get_month_summary", lambda i: manager.get_month_summary(*month_of(today, i)), {}),
+        ("manager.get_month_version", lambda i: manager.get_month_version(*month_of(today, i)), {}),
+        # 最初の検索はインデックスの作成を含むので別に計測する
+        ("manager.search[build]", lambda i: manager.search(SEARCH_QUERIES[0]), dict(warmup=False, max_runs=1)),
+        ("manager.search", lambda i: manager.search(SEARCH_QUERIES[i % len(SEARCH_QUERIES)]), {}),
+        ("manager.get_stats", lambda i: manager.get_stats(), {}),
+        ("manager.recount_stats", lambda i: manager.recount_stats(), {}),
+        ("manager.next_due", lambda i: manager.next_due(50), {}),
+        ("manager.next_due[hours]", lambda i: manager.next_due(None, 48), {}),
+        ("manager.get_overdue", lambda i: manager.get_overdue(limit=50), {}),
+        # 1回ごとに1日ずつ進め、その日に期限が過ぎたTODOをヒープから移す
+        ("manager.check_due", lambda i: manager.check_due(datetime.now() + timedelta(days=i)), {"max_runs": 30}),
+        ("manager.add_todo",
+         lambda i: manager.add_todo(f"ベンチマーク {i}", due_date=around_today(today, i).isoformat()),
+         {"max_runs": max_runs}),
+        ("manager.update_todo",
+         lambda i: manager.update_todo(update_ids[i], title=f"更新 {i}",
+                                       due_date=around_today(today, i).isoformat()),
+         per_id),
+        ("manager.complete_todo", lambda i: manager.complete_todo(complete_ids[i]), per_id),
+        ("manager.uncomplete_todo", lambda i: manager.uncomplete_todo(complete_ids[i]), per_id),
+        ("manager.delete_todo", lambda i: manager.delete_todo(delete_ids[i]), per_id),
+        ("manager.apply_batch[10]",
+         lambda i: manager.apply_batch([{"op": "create", "title": f"一括 {i}-{j}"} for j in range(10)]),
+         {"max_runs": max_runs}),
+        ("manager.get_changes", lambda i: manager.get_changes(manager.version - 10, manager.epoch), {}),
+        ("manager.compact", lambda i: manager.compact(), heavy),
+        ("manager.save_todos", lambda i: manager.save_todos(), heavy),
+        ("manager.import_todos[1000]",
+         lambda i: manager.import_todos({"title": f"取り込み {i}-{j}", "due_date": around_today(today, j).isoformat()}
+                                        for j in range(1000)),
+         heavy),
+        # 最初の1回（計測しない）で完了済みをすべてアーカイブに移し、以降は毎回10件を完了にしてから移す
+        ("manager.archive_completed", archive_all, dict(heavy, setup=complete_some)),
+        ("manager.get_archive_stats", lambda i: manager.get_archive_stats(), {}),
+        ("manager.get_archived", lambda i: manager.get_archived(archived[i % len(archived)]), {}),
+        ("manager.iter_archived", lambda i: sum(1 for _ in manager.iter_archived()), heavy),
+        ("manager.search_archived",
+         lambda i: manager.search_archived(SEARCH_QUERIES[i % len(SEARCH_QUERIES)]), heavy),
+        ("manager.unarchive", lambda i: manager.unarchive(archived[i % len(archived)]), {"max_runs": 100}),
+        # 最初の1回（計測しない）で大部分の完了済みを削除し、以降は毎回10件を完了にしてから削除する
+        ("manager.clear_completed", lambda i: manager.clear_completed(), dict(heavy, setup=complete_some)),
+    ]
+
+
+def write_behind_cases(manager: TodoManager, today: date, max_runs: int = 1000) -> List[Case]:
+    """write_behind の TodoManager の項目（保存を遅らせた変更と、まとめて保存する flush）"""
+    add = lambda i: manager.add_todo(f"遅延保存 {i}", due_date=around_today(today, i).isoformat())
+    return [
+        ("manager.add_todo[write_behind]", add, {"max_runs": max_runs}),
+        ("manager.flush", lambda i: manager.flush(), {"max_runs": 5, "setup": add}),
+    ]
+
+
+def bench_manager(path: str, size: int, today: date, budget: float) -> List[Dict]:
+    """TodoManager の各メソッドを計測
+
+    変更はジャーナルに追記し、圧縮は compact の項目だけで行う。flush は自動では保存しない
+    長い待ち時間の write_behind で計測する。
+    """
+    manager = TodoManager(path, journal=True, compact_threshold=sys.maxsize)
+    try:
+        results = run_cases(manager_cases(manager, size, today), size, budget)
+        manager.compact()
+    finally:
+        manager.close()
+    manager = TodoManager(path, write_behind=3600)
+    try:
+        return results + run_cases(write_behind_cases(manager, today), size, budget)
+    finally:
+        manager.close()
+
+
+def route_cases(client, size: int, today: date, max_runs: int = 1000) -> List[Case]:
+    """app.py の各ルートの項目（Flask のテストクライアントで呼ぶ）"""
+    rng = random.Random(size)
+    update_ids, complete_ids, delete_ids = (sample_ids(rng, size, max_runs + 1) for _ in range(3))
+    heavy = {"max_runs": 5}
+    # 同じTODOへの変更を繰り返さないよう、回数は選んだIDの数まで（最初の1回は計測しない）
+    per_id = {"max_runs": len(delete_ids) - 1}
+
+    def call(method: str, url: Callable[[int], str], status: int = 200, body: Callable[[int], object] = None,
+             headers: Callable[[], Dict] = None) -> Callable[[int], object]:
+        def func(i: int):
+            response = client.open(url(i), method=method, json=body(i) if body else None,
+                                   headers=headers() if headers else None)
+            response.get_data()
+            if response.status_code != status:
+                raise RuntimeError(f"{method} {url(i)}: {response.status_code}")
+        return func
+
+    def first_event(i: int) -> None:
+        # 購読を開始して最初のイベント（hello）を受け取るまで
+        response = client.get('/api/events', buffered=False)
+        next(iter(response.response))
+        response.close()
+
+    def etag() -> Dict:
+        return {'If-None-Match': client.get('/api/todos?limit=50').headers['ETag']}
+
+    changes_url = []
+
+    def since(i: int) -> None:
+        # 直近10バージョン分の変更を取得するURL（変更の項目の後に計測するので、差分がある）
+        response = client.get('/api/stats')
+        changes_url[:] = [f"/api/changes?since={int(response.headers['X-Data-Version']) - 10}"
+                          f"&epoch={response.headers['X-Data-Epoch']}"]
+
+    def complete_some(i: int) -> None:
+        client.post('/api/todos/batch', json=[{"op": "complete", "id": todo_id}
+                                              for todo_id in rng.sample(range(1, size + 1), 10)])
+
+    # アーカイブから戻すTODO（完了にする項目で選んだもののうち、削除しないもの）
+    deleted = set(delete_ids)
+    restore_ids = [todo_id for todo_id in complete_ids if todo_id not in deleted]
+
+    def complete_restore_ids(i: int) -> None:
+        # 最初の1回（計測しない）の前に、戻すTODOをすべて完了にしておく
+        if i == 0:
+            client.post('/api/todos/batch', json=[{"op": "complete", "id": todo_id} for todo_id in restore_ids])
+        else:
+            complete_some(i)
+
+    month = lambda i: "%04d/%d" % month_of(today, i)
+    start = lambda i: "%04d-%02d" % month_of(today, i)
+    day = lambda i: around_today(today, i).isoformat()
+    etag_headers = etag()
+
+    return [
+        ("GET /", call('GET', lambda i: '/'), {}),
+        ("GET /calendar", call('GET', lambda i: '/calendar'), {}),
+        ("GET /static/<path:filename>", call('GET', lambda i: '/static/js/app.js'), {}),
+        ("GET /api/todos", call('GET', lambda i: '/api/todos'), {}),
+        ("GET /api/todos?limit=50", call('GET', lambda i: '/api/todos?limit=50'), {}),
+        ("GET /api/todos?limit=50[304]",
+         call('GET', lambda i: '/api/todos?limit=50', 304, headers=lambda: etag_headers), {}),
+        ("GET /api/todos?limit=50&sort=due_date", call('GET', lambda i: '/api/todos?limit=50&sort=due_date'), {}),
+        ("GET /api/todos?date", call('GET', lambda i: f'/api/todos?date={day(i)}'), {}),
+        ("GET /api/search", call('GET', lambda i: f'/api/search?q={SEARCH_QUERIES[i % len(SEARCH_QUERIES)]}'), {}),
+        ("GET /api/stats", call('GET', lambda i: '/api/stats'), {}),
+        ("GET /api/calendar/<int:year>/<int:month>", call('GET', lambda i: f'/api/calendar/{month(i)}'), {}),
+        ("GET /api/calendar/range", call('GET', lambda i: f'/api/calendar/range?start={start(i)}&months=3'), {}),
+        ("GET /api/events", first_event, {}),
+        ("GET /api/cache", call('GET', lambda i: '/api/cache'), {}),
+        ("GET /metrics", call('GET', lambda i: '/metrics'), {}),
+        ("POST /api/todos",
+         call('POST', lambda i: '/api/todos', 201, lambda i: {"title": f"ベンチマーク {i}", "due_date": day(i)}),
+         {"max_runs": max_runs}),
+        ("POST /api/todos/batch",
+         call('POST', lambda i: '/api/todos/batch', 200,
+              lambda i: [{"op": "create", "title": f"一括 {i}-{j}"} for j in range(10)]),
+         {"max_runs": max_runs}),
+        ("PUT /api/todos/<int:todo_id>",
+         call('PUT', lambda i: f'/api/todos/{update_ids[i]}', 200,
+              lambda i: {"title": f"更新 {i}", "due_date": day(i)}),
+         per_id),
+        ("PUT /api/todos/<int:todo_id>[completed]",
+         call('PUT', lambda i: f'/api/todos/{complete_ids[i]}', 200,
+              lambda i: {"completed": True}),
+         per_id),
+        ("DELETE /api/todos/<int:todo_id>",
+         call('DELETE', lambda i: f'/api/todos/{delete_ids[i]}'), per_id),
+        ("POST /api/archive",
+         call('POST', lambda i: '/api/archive', 200, lambda i: {"older_than_days": 0}),
+         dict(heavy, setup=complete_restore_ids)),
+        ("GET /api/archive", call('GET', lambda i: '/api/archive'), {}),
+        ("GET /api/archive/<int:todo_id>",
+         call('GET', lambda i: f'/api/archive/{restore_ids[i % len(restore_ids)]}'), {}),
+        ("GET /api/todos?include_archived", call('GET', lambda i: '/api/todos?include_archived=true'), heavy),
+        ("GET /api/search?include_archived",
+         call('GET', lambda i: f'/api/search?q={SEARCH_QUERIES[i % len(SEARCH_QUERIES)]}&include_archived=true'),
+         heavy),
+        ("POST /api/archive/<int:todo_id>/restore",
+         call('POST', lambda i: f'/api/archive/{restore_ids[i]}/restore'), {"max_runs": len(restore_ids) - 1}),
+        # リストを順に切り替える（開く・使われていないリストを閉じる処理を含む）
+        ("GET /api/lists/<list_id>/todos?limit=50",
+         call('GET', lambda i: f'/api/lists/bench{i % 20}/todos?limit=50'), {}),
+        ("POST /api/lists/<list_id>/todos",
+         call('POST', lambda i: f'/api/lists/bench{i % 20}/todos', 201, lambda i: {"title": f"リスト {i}"}),
+         {"max_runs": max_runs}),
+        ("GET /api/changes", call('GET', lambda i: changes_url[0]), {"setup": since}),
+        ("DELETE /api/todos/clear-completed", call('DELETE', lambda i: '/api/todos/clear-completed'),
+         dict(heavy, setup=complete_some)),
+    ]
+
+
+def uncovered_routes(app, cases: List[Case]) -> List[str]:
+    """計測していないルート（"メソッド URLのパターン"）の一覧
+
+    リストごとのルート（/api/lists/<list_id>/...）は既定のリストのルートと同じ処理なので、
+    どちらかを計測していればよい。
+    """
+    covered = {name.split("?")[0].split("[")[0] for name, _, _ in cases}
+    covered |= {name.replace("/api/lists/<list_id>/", "/api/") for name in covered}
+    routes = []
+    for rule in app.url_map.iter_rules():
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            route = f"{method} {rule.rule}"
+            if route not in covered and route.replace("/api/lists/<list_id>/", "/api/") not in covered:
+                routes.append(route)
+    return routes
+
+
+def _route_child(directory: str, size: int, today: date, budget: float, results) -> None:
+    """別プロセスで todos.json のあるディレクトリに移動して app.py を読み込み、各ルートを計測"""
+    os.chdir(directory)
+    os.environ.setdefault('TODO_JOURNAL', '1')
+    import app as web
+    web.app.testing = True
+    cases = route_cases(web.app.test_client(), size, today)
+    missing = uncovered_routes(web.app, cases)
+    if missing:
+        print(f"⚠️  計測していないルート: {', '.join(missing)}")
+    try:
+        results.put(run_cases(cases, size, budget))
+    finally:
+        web.todo_manager.close()
+
+
+def bench_routes(path: str, size: int, today: date, budget: float) -> List[Dict]:
+    """app.py の各ルートを計測（起動時に作られる TodoManager を使うため別プロセスで実行）"""
+    directory = os.path.join(os.path.dirname(path), f"app_{size}")
+    os.makedirs(directory)
+    os.replace(path, os.path.join(directory, "todos.json"))
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_route_child, args=(directory, size, today, budget, results))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"ルートの計測に失敗しました（件数 {size}）")
+    return results.get()
+
+
+def metadata(budget: float) -> Dict:
+    """結果と一緒に保存する実行環境の情報"""
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "orjson": codec.orjson is not None,
+        "budget": budget
+    }
+
+
+def run_suite(sizes: List[int], budget: float, only: Optional[str] = None, today: date = None) -> Dict:
+    """件数ごとに合成データを作って計測し、{"meta": ..., "results": [...]} を返す"""
+    today = today or date.today()
+    results = []
+    print(f"{'件数':>10} | {'項目':<44} | {'中央値(μs)':>12} | {'p95(μs)':>12} | {'回数':>6}")
+    print("-" * 98)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            path = os.path.join(tmp_dir, f"suite_{size}.json")
+            if only in (None, "manager"):
+                write_dataset(path, size, today)
+                results.extend(bench_manager(path, size, today, budget))
+            if only in (None, "routes"):
+                write_dataset(path, size, today)
+                results.extend(bench_routes(path, size, today, budget))
+    return {"meta": metadata(budget), "results": results}
+
+
+def compare(results: Dict, baseline: Dict, threshold: float, min_delta_us: float) -> List[Dict]:
+    """基準と中央値を比較し、threshold の割合以上かつ min_delta_us 以上遅くなった項目を返す
+
+    min_delta_us はとても速い項目（数μs）の誤差で失敗しないための下限。基準にない項目は比較しない。
+    """
+    previous = {(result["size"], result["name"]): result for result in baseline["results"]}
+    regressions = []
+    for result in results["results"]:
+        before = previous.get((result["size"], result["name"]))
+        if before is None:
+            continue
+        ratio = result["median_us"] / before["median_us"] if before["median_us"] else 1.0
+        if ratio > 1 + threshold and result["median_us"] - before["median_us"] > min_delta_us:
+            regressions.append(dict(result, baseline_us=before["median_us"], ratio=ratio))
+    return regressions
+
+
+def save_json(path: str, data: Dict) -> None:
+    """結果をJSONファイルに保存"""
+    with open(path, 'wb') as f:
+        f.write(codec.dumps(data))
+
+
+def load_json(path: str) -> Dict:
+    """保存した結果を読み込む"""
+    with open(path, 'rb') as f:
+        return codec.loads(f.read())
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="TODOアプリのベンチマークスイート")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="TODOの件数")
+    parser.add_argument("--only", choices=["manager", "routes"], help="TodoManager かルートだけを計測")
+    parser.add_argument("--budget", type=float, default=1.0, help="1項目あたりの計測時間の目安（秒）")
+    parser.add_argument("--output", default="bench_results.json", help="結果のJSONファイル")
+    parser.add_argument("--baseline", help="比較する基準のJSONファイル")
+    parser.add_argument("--save-baseline", nargs="?", const="bench_baseline.json", help="結果を基準として保存")
+    parser.add_argument("--threshold", type=float, default=0.25, help="遅くなったとみなす割合（0.25で25%%）")
+    parser.add_argument("--min-delta-us", type=float, default=10.0, help="遅くなったとみなす差の下限（μs）")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.budget, args.only)
+    save_json(args.output, results)
+    print(f"\n💾 結果を {args.output} に保存しました")
+    if args.save_baseline:
+        save_json(args.save_baseline, results)
+        print(f"💾 基準を {args.save_baseline} に保存しました")
+    if not args.baseline:
+        return 0
+
+    regressions = compare(results, load_json(args.baseline), args.threshold, args.min_delta_us)
+    if not regressions:
+        print(f"✅ 基準（{args.baseline}）より {args.threshold:.0%} 以上遅くなった項目はありません")
+        return 0
+    print(f"❌ 基準より {args.threshold:.0%} 以上遅くなった項目: {len(regressions)}件")
+    for regression in regressions:
+        print(f"{regression['size']:>10} | {regression['name']:<44} | {regression['baseline_us']:>10.1f} → "
+              f"{regression['median_us']:>10.1f}μs（{regression['ratio']:.2f}倍）")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
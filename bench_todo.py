@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+TODOアプリのベンチマークスクリプト
+使用方法: python bench_todo.py [件数 ...]
+"""
+
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+import codec
+from todo import Todo, TodoColumns, TodoManager, parse_due_date
+
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+BASE_DATE = date(2025, 1, 1)
+
+
+def due_date_for(i: int) -> str:
+    """2年間に分散した期限日を返す（3件に1件は期限なし）"""
+    if i % 3 == 2:
+        return None
+    return (BASE_DATE + timedelta(days=(i * 7919) % 730)).isoformat()
+
+
+def make_dataset(path: str, size: int, text=None) -> None:
+    """指定件数のTODOを含むJSONファイルを作成（text(i) で (タイトル, 説明) を指定できる）"""
+    text = text or (lambda i: (f"TODO {i}", ""))
+    todos = [
+        {
+            "id": i,
+            "title": title,
+            "description": description,
+            "completed": i % 3 == 0,
+            "created_at": "2025-01-01 00:00:00",
+            "due_date": due_date_for(i)
+        }
+        for i, (title, description) in ((i, text(i)) for i in range(1, size + 1))
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"todos": todos, "next_id": size + 1}, f, ensure_ascii=False)
+
+
+SEARCH_WORDS_JA = ["会議", "資料", "準備", "買い物", "牛乳", "掃除", "洗濯", "請求書", "支払い", "予約",
+                   "病院", "歯医者", "レポート", "提出", "確認", "電話", "メール", "返信", "旅行", "計画"]
+SEARCH_WORDS_EN = ["report", "review", "meeting", "invoice", "deploy", "release", "budget", "travel", "design", "backup"]
+
+
+def search_text(i: int):
+    """全文検索用のタイトルと説明（少ない語彙から選ぶので、よく使われる語は1割前後のTODOに現れる）"""
+    rng = random.Random(i)
+    title = f"{rng.choice(SEARCH_WORDS_JA)}の{rng.choice(SEARCH_WORDS_JA)} {rng.choice(SEARCH_WORDS_EN)} #{i}"
+    description = f"{rng.choice(SEARCH_WORDS_JA)}を{rng.choice(SEARCH_WORDS_JA)}" if i % 4 == 0 else ""
+    return title, description
+
+
+def per_op(func, ids) -> float:
+    """1操作あたりの平均時間（マイクロ秒）を計測"""
+    start = time.perf_counter()
+    for todo_id in ids:
+        func(todo_id)
+    return (time.perf_counter() - start) / len(ids) * 1_000_000
+
+
+def bench_id_index(sizes) -> None:
+    """IDで指定する操作のレイテンシが件数に依存しないことを確認"""
+    print("📏 IDインデックスのベンチマーク（1操作あたりのμs）")
+    print(f"{'件数':>10} | {'get_todo_by_id':>14} | {'complete':>10} | {'delete':>10}")
+    print("-" * 54)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            path = os.path.join(tmp_dir, f"bench_{size}.json")
+            make_dataset(path, size)
+            # 保存コストを除くためジャーナルモードで計測（圧縮は発生させない）
+            manager = TodoManager(path, journal=True, compact_threshold=sys.maxsize)
+
+            rng = random.Random(size)
+            ids = rng.sample(range(1, size + 1), min(size, 1000))
+            get_us = per_op(manager.get_todo_by_id, ids)
+            complete_us = per_op(manager.complete_todo, ids)
+            delete_us = per_op(manager.delete_todo, ids)
+            manager.close()
+
+            print(f"{size:>10} | {get_us:>14.2f} | {complete_us:>10.2f} | {delete_us:>10.2f}")
+
+
+def bench_due_index(sizes) -> None:
+    """期限日インデックスによる月・日付検索のレイテンシを計測"""
+    print("\n📅 期限日インデックスのベンチマーク（1クエリあたりのμs）")
+    print(f"{'件数':>10} | {'by_month':>10} | {'by_date':>10} | {'1週間の範囲':>10}")
+    print("-" * 54)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            path = os.path.join(tmp_dir, f"bench_{size}.json")
+            make_dataset(path, size)
+            manager = TodoManager(path, journal=True, compact_threshold=sys.maxsize)
+
+            months = [(2025 + m // 12, m % 12 + 1) for m in range(24)]
+            start = time.perf_counter()
+            for year, month in months:
+                manager.get_todos_by_month(year, month)
+            month_us = (time.perf_counter() - start) / len(months) * 1_000_000
+
+            days = [(BASE_DATE + timedelta(days=d)).isoformat() for d in range(0, 730, 7)]
+            date_us = per_op(manager.get_todos_by_date, days)
+            week_us = per_op(lambda day: manager.get_todos_by_range(
+                day, (date.fromisoformat(day) + timedelta(days=6)).isoformat()), days)
+            manager.close()
+
+            print(f"{size:>10} | {month_us:>10.1f} | {date_us:>10.1f} | {week_us:>10.1f}")
+
+
+def bench_batch_import(count: int = 50_000) -> None:
+    """apply_batch による一括インポートの時間を計測"""
+    print(f"\n📦 一括インポートのベンチマーク（{count}件）")
+    ops = [{"op": "create", "title": f"インポート {i}", "due_date": due_date_for(i)} for i in range(count)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for journal in (False, True):
+            path = os.path.join(tmp_dir, f"import_{journal}.json")
+            manager = TodoManager(path, journal=journal)
+            start = time.perf_counter()
+            manager.apply_batch(ops)
+            elapsed = time.perf_counter() - start
+            manager.close()
+            mode = "ジャーナル" if journal else "JSON"
+            print(f"{mode:>10} | {elapsed:.2f}秒")
+
+
+def bench_search(sizes) -> None:
+    """全文検索インデックスの作成時間と、検索語ごとのレイテンシを計測"""
+    queries = ["#12345", "#1234", "請求書 支払い", "歯医者 deploy", "会議 資料 budget", "deplo", "会議", "請"]
+    print("\n🔍 全文検索のベンチマーク（1クエリあたりのms、作成は最初の検索でインデックスを作る時間）")
+    print(f"{'件数':>10} | {'作成(ms)':>10} | " + " | ".join(f"{query:>8}" for query in queries))
+    print("-" * (28 + 11 * len(queries)))
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            path = os.path.join(tmp_dir, f"search_{size}.json")
+            make_dataset(path, size, search_text)
+            manager = TodoManager(path, journal=True, compact_threshold=sys.maxsize)
+            start = time.perf_counter()
+            manager.search("")
+            build_ms = (time.perf_counter() - start) * 1000
+            timings = []
+            for query in queries:
+                manager.search(query)
+                start = time.perf_counter()
+                for _ in range(10):
+                    manager.search(query)
+                timings.append((time.perf_counter() - start) / 10 * 1000)
+            manager.close()
+            print(f"{size:>10} | {build_ms:>10.1f} | " + " | ".join(f"{ms:>8.2f}" for ms in timings))
+
+
+class DictTodo:
+    """__slots__ を使う前の Todo と同じ、インスタンスごとに __dict__ を持つクラス（比較用）"""
+    
+    def __init__(self, id, title, description, completed, created_at, due_date):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.completed = completed
+        self.created_at = created_at
+        self.due_date = due_date
+
+
+LAYOUTS = {
+    "__dict__": lambda rows: {row["id"]: DictTodo(**row) for row in rows},
+    "__slots__": lambda rows: {todo.id: todo for todo in map(Todo.from_dict, rows)},
+    "columnar": lambda rows: TodoColumns(map(Todo.from_dict, rows)),
+}
+
+
+def scan_stats(store, today: int):
+    """完了件数と期限切れ件数を全件走査で数える（recount_stats と同じ処理）"""
+    if isinstance(store, TodoColumns):
+        overdue = sum(count for ordinal, count in store.pending_due_counts().items() if ordinal < today)
+        return store.count_completed(), overdue
+    completed = overdue = 0
+    for todo in store.values():
+        if todo.completed:
+            completed += 1
+            continue
+        ordinal = parse_due_date(todo.due_date)
+        if ordinal is not None and ordinal < today:
+            overdue += 1
+    return completed, overdue
+
+
+def bench_layout(sizes) -> None:
+    """TODOの保持方法ごとのメモリ（JSONから読み込んだ後に残る量）と全件走査の時間を比較"""
+    print("\n🧱 データ構造のベンチマーク")
+    print(f"{'件数':>10} | {'構造':>10} | {'バイト/件':>10} | {'全件走査(ms)':>12}")
+    print("-" * 54)
+    
+    today = date(2026, 1, 1).toordinal()
+    for size in sizes:
+        text = json.dumps([
+            {"id": i, "title": f"TODO {i}", "description": "", "completed": i % 3 == 0,
+             "created_at": "2025-01-01 00:00:00", "due_date": due_date_for(i)}
+            for i in range(1, size + 1)
+        ], ensure_ascii=False)
+        for name, build in LAYOUTS.items():
+            tracemalloc.start()
+            store = build(json.loads(text))
+            retained = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            start = time.perf_counter()
+            scan_stats(store, today)
+            scan_ms = (time.perf_counter() - start) * 1000
+            del store
+            print(f"{size:>10} | {name:>10} | {retained / size:>10.1f} | {scan_ms:>12.1f}")
+
+
+def _startup_child(path: str, mode: str, results) -> None:
+    """起動から最初のリクエスト（先頭ページの取得）に応答するまでの時間とピークRSSを計測（別プロセスで実行）"""
+    import resource
+    start = time.perf_counter()
+    if mode == "json.loads":
+        # 以前の読み込み方（ファイル全体をデコードしてからTODOを作る）
+        with open(path, 'rb') as f:
+            data = codec.loads(f.read())
+        manager = TodoManager(path + ".empty")
+        manager._todos = manager._new_store(Todo.from_dict(todo) for todo in data["todos"])
+        manager._rebuild_indexes()
+        del data
+    else:
+        manager = TodoManager(path, background_load=(mode == "background"))
+    manager.query_todos(50)
+    first_request = time.perf_counter() - start
+    manager.wait_loaded()
+    loaded = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put((first_request, loaded, peak_mb))
+
+
+def bench_startup(sizes) -> None:
+    """起動時の読み込み方法ごとに、最初のリクエストまでの時間・全件の読み込み時間・ピークRSSを比較"""
+    print("\n🚀 起動時間のベンチマーク")
+    print(f"{'件数':>10} | {'読み込み':>12} | {'最初の応答(ms)':>14} | {'全件(ms)':>10} | {'ピークRSS(MB)':>13}")
+    print("-" * 74)
+    
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            path = os.path.join(tmp_dir, f"startup_{size}.json")
+            make_dataset(path, size)
+            for mode in ("json.loads", "streaming", "background"):
+                results = context.Queue()
+                process = context.Process(target=_startup_child, args=(path, mode, results))
+                process.start()
+                first_request, loaded, peak_mb = results.get()
+                process.join()
+                print(f"{size:>10} | {mode:>12} | {first_request * 1000:>14.1f} | {loaded * 1000:>10.1f} | "
+                      f"{peak_mb:>13.1f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    bench_id_index(sizes)
+    bench_due_index(sizes)
+    bench_batch_import()
+    bench_search(sizes)
+    bench_layout(sizes)
+    bench_startup(sizes)
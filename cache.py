@@ -0,0 +1,100 @@
+"""
+TODOアプリ - レスポンスキャッシュ
+エンコード済みのレスポンス本文を、合計バイト数を上限としてLRUで保持する
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set
+
+
+class ResponseCache:
+    """エンコード済みのレスポンス本文のLRUキャッシュ（合計バイト数で上限を決める）
+
+    各エントリは作成時のデータのバージョン（stamp）と一緒に保持し、取得時に stamp が変わっていれば
+    古いものとして捨てる。tag を付けておくと、invalidate(tag) でそのタグのエントリだけをまとめて捨てられる。
+    max_bytes が0のときは何も保持しない。
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # キー → (stamp, 本文, タグ)。末尾ほど最近使われたもの
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, stamp: Any) -> Optional[bytes]:
+        """キャッシュされた本文を取得（ないか stamp が変わっていれば None）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != stamp:
+                self._remove(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, stamp: Any, body: bytes, tag: Hashable = None) -> None:
+        """本文を保持し、上限を超えた分を使われていない順に捨てる（上限より大きい本文は保持しない）"""
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (stamp, body, tag)
+            self._bytes += len(body)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        """エントリを1つ取り除く（ロック取得済みで呼ぶ）"""
+        _, body, tag = self._entries.pop(key)
+        self._bytes -= len(body)
+        if tag is not None:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def invalidate(self, tag: Hashable) -> None:
+        """タグの付いたエントリをすべて捨てる"""
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """すべてのエントリを捨てる"""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット・ミス・追い出し・無効化の回数と、現在のエントリ数・バイト数"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes
+            }
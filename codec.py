@@ -0,0 +1,153 @@
+"""
+TODOアプリ - JSONコーデック
+orjson がインストールされていればそれを使い、なければ標準の json で同じ形式（UTF-8・空白なし）を出力する
+"""
+
+import codecs
+import json
+from typing import Any, BinaryIO, Dict, Iterable, Iterator
+
+try:
+    import orjson
+except ImportError:  # orjson は任意の依存関係
+    orjson = None
+
+# 何件分のJSONをまとめて1回で書き出すか（バイト数）
+CHUNK_SIZE = 64 * 1024
+
+# ストリーミングで読み込むときに1回で読むバイト数
+READ_SIZE = 1024 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+JSONDecodeError = json.JSONDecodeError
+
+
+def dumps(obj: Any) -> bytes:
+    """オブジェクトをJSON（UTF-8のバイト列）にエンコード"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data) -> Any:
+    """JSON（バイト列または文字列）をデコード"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def iter_array(fragments: Iterable[bytes], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """エンコード済みの要素からJSON配列を組み立て、chunk_size 程度ずつ返す"""
+    chunk = [b'[']
+    size = 1
+    separator = b''
+    for fragment in fragments:
+        chunk.append(separator)
+        chunk.append(fragment)
+        separator = b','
+        size += len(fragment) + 1
+        if size >= chunk_size:
+            yield b''.join(chunk)
+            chunk = []
+            size = 0
+    chunk.append(b']')
+    yield b''.join(chunk)
+
+
+def encode_array(fragments: Iterable[bytes]) -> bytes:
+    """エンコード済みの要素から1つのJSON配列を作成"""
+    return b'[' + b','.join(fragments) + b']'
+
+
+class _StreamReader:
+    """ファイルを少しずつ読みながら、JSONの値を先頭から1つずつ取り出す"""
+
+    def __init__(self, f: BinaryIO, read_size: int):
+        self._f = f
+        self._read_size = read_size
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """続きを読み込む（ファイルの終わりなら False）"""
+        if self._eof:
+            return False
+        data = self._f.read(self._read_size)
+        self._eof = not data
+        self._buffer = self._buffer[self._pos:] + self._utf8.decode(data, final=self._eof)
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """空白を読み飛ばし、次の1文字を返す（ファイルの終わりなら空文字）"""
+        while True:
+            buffer, pos = self._buffer, self._pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        """次の文字が char であることを確認して読み進める"""
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"'{char}' が必要です", self._buffer, self._pos)
+        self._pos += 1
+
+    def value(self) -> Any:
+        """次の値を1つデコード"""
+        self.peek()
+        while True:
+            # 数値などは途中で切れていてもデコードできてしまうので、値の後ろまで読み込んでから確定する
+            if len(self._buffer) - self._pos < self._read_size and self._fill():
+                continue
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_object_array(f: BinaryIO, key: str, rest: Dict[str, Any], read_size: int = READ_SIZE) -> Iterator[Any]:
+    """JSONオブジェクトのファイルを先頭から少しずつ読み、key の配列の要素を1つずつ返す
+
+    ファイル全体を読み込まないので、大きなファイルでもメモリは要素1つ分と読み込み単位で済む。
+    key 以外の項目は読み終わった時点で rest に入れる。
+    """
+    reader = _StreamReader(f, read_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        name = reader.value()
+        reader.expect(':')
+        if name == key:
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.expect(']')
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.peek() == ',':
+                        reader.expect(',')
+                    else:
+                        reader.expect(']')
+                        break
+        else:
+            rest[name] = reader.value()
+        if reader.peek() == ',':
+            reader.expect(',')
+        else:
+            reader.expect('}')
+            return
@@ -0,0 +1,184 @@
+"""
+TODOアプリ - 変更通知
+TodoRepository の変更イベントを購読者ごとのキューに配り、Server-Sent Events 形式で送る
+"""
+
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+
+
+class Subscription:
+    """1つの接続（購読者）に届いた未送信のイベント
+
+    キューがあふれた（クライアントの受信が追いつかない）場合は溜まったイベントを捨て、
+    代わりに resync イベントを1つだけ返して一覧の取得し直しを促す。
+    """
+
+    __slots__ = ("_queue", "_maxsize", "_ready", "overflowed", "closed")
+
+    def __init__(self, maxsize: int):
+        self._queue = deque()
+        self._maxsize = maxsize
+        self._ready = threading.Event()
+        self.overflowed = False
+        self.closed = False
+
+    def put(self, event: Dict) -> None:
+        """イベントを追加（ブロックしない）"""
+        if self.overflowed:
+            return
+        if len(self._queue) >= self._maxsize:
+            self._queue.clear()
+            self.overflowed = True
+        else:
+            self._queue.append(event)
+        self._ready.set()
+
+    def get(self, timeout: float = None) -> Optional[Dict]:
+        """次のイベントを取得（timeout 秒以内に届かなければ None）"""
+        if not self._queue and not self.overflowed:
+            self._ready.wait(timeout)
+        self._ready.clear()
+        if self.overflowed:
+            self.overflowed = False
+            return {"type": "resync"}
+        if self._queue:
+            event = self._queue.popleft()
+            if self._queue:
+                self._ready.set()
+            return event
+        return None
+
+
+class AsyncSubscription(Subscription):
+    """イベントループで待つ購読者（接続ごとにスレッドを使わない）
+
+    put は TodoRepository を変更したスレッドから呼ばれるので、待っているループには call_soon_threadsafe で知らせる。
+    """
+
+    __slots__ = ("_loop", "_waiter")
+
+    def __init__(self, maxsize: int, loop: asyncio.AbstractEventLoop):
+        super().__init__(maxsize)
+        self._loop = loop
+        self._waiter = asyncio.Event()
+
+    def put(self, event: Dict) -> None:
+        super().put(event)
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._waiter.set)
+
+    async def get_async(self, timeout: float) -> Optional[Dict]:
+        """次のイベントを取得（timeout 秒以内に届かなければ None）。ループのスレッドから呼ぶ"""
+        deadline = self._loop.time() + timeout
+        while True:
+            event = self.get(0)
+            if event is not None:
+                return event
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                return None
+            self._waiter.clear()
+            # clear の直前に届いたイベントを取りこぼさないよう、もう一度確かめてから待つ
+            if self._queue or self.overflowed:
+                continue
+            try:
+                await asyncio.wait_for(self._waiter.wait(), remaining)
+            except asyncio.TimeoutError:
+                return self.get(0)
+
+
+class EventBroadcaster:
+    """変更イベントをすべての購読者に配る
+
+    publish は TodoRepository の書き込みロック内から呼ばれるため、購読者ごとのキューに
+    追加するだけですぐに戻る。
+    """
+
+    def __init__(self, maxsize: int = 100):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop = None) -> Subscription:
+        """購読を開始（loop を指定すると、そのイベントループで待つ AsyncSubscription を返す）"""
+        subscription = Subscription(self.maxsize) if loop is None else AsyncSubscription(self.maxsize, loop)
+        with self._lock:
+            self._subscribers = self._subscribers + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """購読を終了"""
+        subscription.closed = True
+        with self._lock:
+            self._subscribers = [sub for sub in self._subscribers if sub is not subscription]
+
+    def publish(self, event: Dict) -> None:
+        """すべての購読者にイベントを配る"""
+        # 購読者の一覧は置き換えるだけなので、ロックを取らずにそのときの一覧へ配ればよい
+        for subscription in self._subscribers:
+            subscription.put(event)
+
+
+def format_event(event: Dict) -> str:
+    """イベントを text/event-stream の1メッセージに変換"""
+    data = {key: value for key, value in event.items() if key != "type"}
+    return f"event: {event['type']}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def event_stream(broadcaster: EventBroadcaster, hello: Callable[[], Dict], heartbeat: float = 15.0,
+                 on_idle: Callable[[], None] = None) -> Iterator[str]:
+    """購読を開始し、届いたイベントを Server-Sent Events として順に返すジェネレータ
+
+    最初に hello() のイベントを送り、heartbeat 秒ごとにコメント行を送って接続を維持する。
+    on_idle はハートビートのたびに呼ばれる（他のプロセスによる変更の取り込みに使う）。
+    """
+    subscription = broadcaster.subscribe()
+    try:
+        yield f"retry: 3000\n{format_event(hello())}"
+        while not subscription.closed:
+            event = subscription.get(heartbeat)
+            if event is None:
+                if on_idle:
+                    on_idle()
+                    event = subscription.get(0)
+                if event is None:
+                    yield ": heartbeat\n\n"
+                    continue
+            if event["type"] == "resync":
+                event = dict(hello(), type="resync")
+            yield format_event(event)
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+async def async_event_stream(broadcaster: EventBroadcaster, hello: Callable[[], Awaitable[Dict]],
+                             heartbeat: float = 15.0,
+                             on_idle: Callable[[], Awaitable[None]] = None) -> AsyncIterator[str]:
+    """event_stream の非同期版（イベントループで待つので、多数の接続を1つのスレッドで扱える）
+
+    hello・on_idle はコルーチン関数（TodoRepository の呼び出しはスレッドプールで実行すること）。
+    """
+    subscription = broadcaster.subscribe(asyncio.get_running_loop())
+    try:
+        yield f"retry: 3000\n{format_event(await hello())}"
+        while not subscription.closed:
+            event = await subscription.get_async(heartbeat)
+            if event is None:
+                if on_idle:
+                    await on_idle()
+                    event = subscription.get(0)
+                if event is None:
+                    yield ": heartbeat\n\n"
+                    continue
+            if event["type"] == "resync":
+                event = dict(await hello(), type="resync")
+            yield format_event(event)
+    finally:
+        broadcaster.unsubscribe(subscription)
@@ -0,0 +1,180 @@
+"""
+TODOアプリ - 複数リスト
+リストごとの TodoManager を最初に使われたときに開き、推定メモリの上限を超えたら使われていないものから閉じる
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+from todo import TodoRepository
+
+# リストIDに使える文字（ファイル名にそのまま使うので、区切り文字や . は含めない）
+_LIST_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# 推定メモリ: 開いているリスト1つあたりの固定分と、TODO1件あたりの量（インデックスを含む目安）
+BASE_BYTES = 8 * 1024
+BYTES_PER_TODO = 1000
+
+
+def valid_list_id(list_id: str) -> bool:
+    """リストIDとして使える文字列か"""
+    return _LIST_ID_RE.fullmatch(list_id) is not None
+
+
+class _Entry:
+    """開いている（または開いている途中の）リスト"""
+
+    __slots__ = ("list_id", "manager", "refs", "size", "version", "lock")
+
+    def __init__(self, list_id: str):
+        self.list_id = list_id
+        self.manager: Optional[TodoRepository] = None
+        # 使用中のリクエストの数（0のものだけを閉じる）
+        self.refs = 0
+        self.size = 0
+        self.version = None
+        # 開く・閉じる処理をリストごとに排他する（他のリストの処理は待たせない）
+        self.lock = threading.Lock()
+
+
+class ListRegistry:
+    """リストID → TodoRepository のLRU（開いているリストの推定メモリの合計で上限を決める）
+
+    acquire() で初めて使うときに open_list(list_id) で開き、release() するまでは閉じない。
+    release() のときに上限を超えていれば、使用中でないリストを使われていない順に close() して捨てる
+    （保存を遅らせている変更も書き出される）。直前に使われたリストは上限を超えていても閉じない。
+    推定メモリは TODOの件数 × bytes_per_todo + base_bytes。
+    """
+
+    def __init__(self, open_list: Callable[[str], TodoRepository], max_bytes: int,
+                 bytes_per_todo: int = BYTES_PER_TODO, base_bytes: int = BASE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes_per_todo = bytes_per_todo
+        self.base_bytes = base_bytes
+        self._open_list = open_list
+        self._lock = threading.Lock()
+        # 末尾ほど最近使われたもの
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # 閉じている途中のリスト（同じリストを開き直すときは閉じ終わるのを待つ）
+        self._closing: Dict[str, _Entry] = {}
+        self._bytes = 0
+        self.opens = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, list_id: str) -> bool:
+        return list_id in self._entries
+
+    def acquire(self, list_id: str) -> TodoRepository:
+        """リストを（開いていなければ開いて）使用中にする。使い終わったら release() を呼ぶこと"""
+        with self._lock:
+            entry = self._entries.get(list_id)
+            if entry is None:
+                entry = self._entries[list_id] = _Entry(list_id)
+            self._entries.move_to_end(list_id)
+            entry.refs += 1
+            closing = self._closing.get(list_id)
+        try:
+            with entry.lock:
+                if entry.manager is None:
+                    if closing is not None:
+                        # 捨てたインスタンスが変更を書き出し終わるまで待ってから読み込む
+                        with closing.lock:
+                            pass
+                    entry.manager = self._open_list(list_id)
+                    with self._lock:
+                        self.opens += 1
+        except BaseException:
+            self._release(entry)
+            raise
+        return entry.manager
+
+    def release(self, list_id: str) -> None:
+        """acquire() したリストの使用を終える"""
+        with self._lock:
+            entry = self._entries[list_id]
+        self._release(entry)
+
+    @contextmanager
+    def using(self, list_id: str) -> Iterator[TodoRepository]:
+        """with の間だけリストを使用中にする"""
+        manager = self.acquire(list_id)
+        try:
+            yield manager
+        finally:
+            self.release(list_id)
+
+    def _estimate(self, entry: _Entry) -> int:
+        """リストの推定メモリ（変更がなければ件数を数え直さない）"""
+        manager = entry.manager
+        if manager is None:
+            return 0
+        version = (manager.epoch, manager.version)
+        if entry.version == version:
+            return entry.size
+        size = self.base_bytes + manager.get_stats()["total"] * self.bytes_per_todo
+        entry.version = version
+        return size
+
+    def _release(self, entry: _Entry) -> None:
+        size = self._estimate(entry)
+        with self._lock:
+            entry.refs -= 1
+            self._bytes += size - entry.size
+            entry.size = size
+            if entry.manager is None and not entry.refs:
+                # 開くのに失敗した
+                if self._entries.get(entry.list_id) is entry:
+                    del self._entries[entry.list_id]
+                return
+            victims = []
+            if self._bytes > self.max_bytes:
+                for candidate in list(self._entries.values())[:-1]:
+                    if self._bytes <= self.max_bytes:
+                        break
+                    if candidate.refs or candidate.manager is None:
+                        continue
+                    # 使用中でないリストのロックは空いている。閉じ終わるまで、開き直しを待たせる
+                    candidate.lock.acquire()
+                    del self._entries[candidate.list_id]
+                    self._closing[candidate.list_id] = candidate
+                    self._bytes -= candidate.size
+                    victims.append(candidate)
+        for victim in victims:
+            self._close(victim)
+
+    def _close(self, entry: _Entry) -> None:
+        """捨てたリストを閉じる（保存を遅らせている変更を書き出す）。entry.lock は取得済みで呼ぶ"""
+        try:
+            entry.manager.close()
+        finally:
+            entry.lock.release()
+            with self._lock:
+                if self._closing.get(entry.list_id) is entry:
+                    del self._closing[entry.list_id]
+                self.evictions += 1
+
+    def close(self) -> None:
+        """開いているすべてのリストを閉じる"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            self._bytes = 0
+        for entry in entries:
+            if entry.manager is not None:
+                entry.manager.close()
+
+    def stats(self) -> Dict[str, int]:
+        """開いているリストの数・推定メモリと、開いた・捨てた回数"""
+        with self._lock:
+            return {
+                "open": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "opens": self.opens,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,130 @@
+"""
+TODOアプリ - ロック
+スレッド間の読み書きロックと、プロセス間のファイルロックを提供する
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows ではプロセス間ロックを行わない
+    fcntl = None
+
+
+class ReadWriteLock:
+    """複数の読み込みと1つの書き込みを排他する再入可能なロック（書き込み優先）
+
+    同じスレッドが保持中に read() / write() を重ねて呼んでもデッドロックしない。
+    ただし読み込みロックを保持したまま書き込みロックへ昇格することはできない。
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    def _depth(self) -> int:
+        return getattr(self._local, "depth", 0)
+
+    def held(self) -> bool:
+        """現在のスレッドが読み込み・書き込みいずれかのロックを保持しているか"""
+        return self._depth() > 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """読み込みロックを取得"""
+        depth = self._depth()
+        if depth:
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+        with self._cond:
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """書き込みロックを取得"""
+        me = threading.get_ident()
+        depth = self._depth()
+        if depth:
+            if self._writer != me:
+                raise RuntimeError("読み込みロックを保持したまま書き込みロックは取得できません")
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._cond:
+                self._writer = None
+                self._cond.notify_all()
+
+
+class FileLock:
+    """ロックファイルを使ったプロセス間ロック（fcntl.flock）
+
+    スレッド間の排他は ReadWriteLock で行い、このロックは保持中のスレッドからのみ使う前提。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    @contextmanager
+    def _locked(self, operation: int) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def shared(self):
+        """共有ロック（読み込み用）を取得"""
+        return self._locked(fcntl.LOCK_SH if fcntl else 0)
+
+    def exclusive(self):
+        """排他ロック（書き込み用）を取得"""
+        return self._locked(fcntl.LOCK_EX if fcntl else 0)
+
+    def close(self) -> None:
+        """ロックファイルを閉じる"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -1,18 +1,29 @@
 #!/usr/bin/env python3
 """
 TODOアプリ - コマンドラインインターフェース
-使用方法: python main.py
+使用方法:
+    python main.py                                  # 対話形式のメニュー
+    python main.py add "牛乳を買う" --due 2025-07-01  # サブコマンド（スクリプトから使う）
+    python main.py list --pending
+    python main.py complete 3 5
+    python main.py delete 4
+    python main.py export --format csv > todos.csv  # NDJSON（既定）か CSV で標準出力へ
+    python main.py import --format csv < todos.csv  # 標準入力から取り込み、保存は最後に1回だけ
+    python main.py stats
+
+起動を速くするため、モジュールはサブコマンドで使うものだけを実行時に読み込む。
 """
 
+import argparse
 import sys
-from todo import TodoManager
 
 
 class TodoCLI:
     """TODOアプリのコマンドラインインターフェース"""
     
-    def __init__(self):
-        self.manager = TodoManager()
+    def __init__(self, data_file: str = "todos.json"):
+        from todo import TodoManager
+        self.manager = TodoManager(data_file)
         self.commands = {
             '1': self.add_todo,
             '2': self.list_todos,
@@ -207,10 +218,249 @@ class TodoCLI:
                 input("Enterキーを押して続行...")
 
 
-def main():
-    """メイン関数"""
-    app = TodoCLI()
-    app.run()
+# CSVの列（TODOの全項目）
+CSV_FIELDS = ("id", "title", "description", "completed", "created_at", "due_date", "completed_at")
+
+# エクスポートで1回に取得・書き出すTODOの件数
+EXPORT_PAGE = 10000
+
+
+def open_manager(args):
+    """--file のTODO管理クラスを作成（ジャーナルがあれば一緒に読み込む）"""
+    import os
+    from todo import TodoManager
+    return TodoManager(args.file, journal=os.path.exists(args.file + ".log"))
+
+
+def read_ndjson(stream):
+    """NDJSON（1行1件のJSON）を1件ずつ辞書にする（空行は読み飛ばす）"""
+    import codec
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield codec.loads(line)
+            except codec.JSONDecodeError:
+                raise ValueError(f"{number}行目: JSONとして解釈できません")
+
+
+def read_csv(stream):
+    """CSV（先頭行が列名）を1件ずつ辞書にする（空の列は未指定として扱う）"""
+    import csv
+    import io
+    for row in csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")):
+        data = {key: value for key, value in row.items() if key and value not in (None, "")}
+        if "id" in data:
+            data["id"] = int(data["id"]) if data["id"].isdigit() else data["id"]
+        if "completed" in data:
+            data["completed"] = data["completed"].lower() in ("true", "1", "yes")
+        yield data
+
+
+def iter_all(manager, show_completed: bool = True):
+    """全TODOをID順にページ単位で取得して1件ずつ返す（全件のリストを作らない）"""
+    cursor = None
+    while True:
+        todos, cursor = manager.query_todos(EXPORT_PAGE, cursor, show_completed=show_completed)
+        yield from todos
+        if cursor is None:
+            return
+
+
+def write_todos(todos, fmt: str, out) -> int:
+    """TODOを NDJSON か CSV で out（バイナリのストリーム）に書き出し、件数を返す"""
+    count = 0
+    if fmt == "csv":
+        import csv
+        import io
+        text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=False)
+        writer = csv.writer(text)
+        writer.writerow(CSV_FIELDS)
+        for todo in todos:
+            row = todo.to_dict()
+            row["completed"] = "true" if row["completed"] else "false"
+            writer.writerow(["" if row[field] is None else row[field] for field in CSV_FIELDS])
+            count += 1
+        text.flush()
+        text.detach()
+        return count
+    chunk = []
+    for todo in todos:
+        chunk.append(todo.to_json())
+        count += 1
+        if len(chunk) >= 1000:
+            chunk.append(b"")
+            out.write(b"\n".join(chunk))
+            chunk = []
+    if chunk:
+        chunk.append(b"")
+        out.write(b"\n".join(chunk))
+    out.flush()
+    return count
+
+
+def command_add(args) -> int:
+    """TODOを追加し、追加したTODOをJSONで出力"""
+    if not args.title.strip():
+        raise ValueError("タイトルは必須です")
+    manager = open_manager(args)
+    todo = manager.add_todo(args.title.strip(), args.description.strip(), args.due or None)
+    manager.close()
+    write_todos([todo], "ndjson", sys.stdout.buffer)
+    return 0
+
+
+def command_list(args) -> int:
+    """TODOを表示（--format ndjson / csv で機械向けの形式）"""
+    manager = open_manager(args)
+    if args.date:
+        todos = manager.get_todos_by_date(args.date, not args.pending)
+    else:
+        todos = iter_all(manager, not args.pending)
+    if args.format == "text":
+        for todo in todos:
+            due = f" （期限: {todo.due_date}）" if todo.due_date else ""
+            print(f"{todo}{due}")
+    else:
+        sys.stdout.flush()
+        write_todos(todos, args.format, sys.stdout.buffer)
+    manager.close()
+    return 0
+
+
+def apply_to_ids(args, op: str, message: str) -> int:
+    """IDごとの操作（complete / delete）を1回の保存でまとめて適用（見つからないIDがあれば終了コード1）"""
+    manager = open_manager(args)
+    results = manager.apply_batch([{"op": op, "id": todo_id} for todo_id in args.ids])
+    manager.close()
+    status = 0
+    for todo_id, result in zip(args.ids, results):
+        if result["ok"]:
+            print(f"{message}: {todo_id}")
+        else:
+            print(f"❌ ID {todo_id} のTODOが見つかりません。", file=sys.stderr)
+            status = 1
+    return status
+
+
+def command_import(args) -> int:
+    """NDJSON / CSV のTODOを取り込む（読み込みながら取り込み、保存は最後に1回だけ）"""
+    stream = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    manager = open_manager(args)
+    try:
+        records = read_csv(stream) if args.format == "csv" else read_ndjson(stream)
+        count = manager.import_todos(records, keep_ids=args.keep_ids)
+    finally:
+        manager.close()
+        if stream is not sys.stdin.buffer:
+            stream.close()
+    print(f"📥 {count}件のTODOを取り込みました。", file=sys.stderr)
+    return 0
+
+
+def command_export(args) -> int:
+    """TODOを NDJSON / CSV で出力"""
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    manager = open_manager(args)
+    try:
+        count = write_todos(iter_all(manager, not args.pending), args.format, out)
+    finally:
+        manager.close()
+        if out is not sys.stdout.buffer:
+            out.close()
+    print(f"📤 {count}件のTODOを書き出しました。", file=sys.stderr)
+    return 0
+
+
+def command_due(args) -> int:
+    """期限が過ぎた未完了のTODOと、期限の近い未完了のTODOを表示（リマインダーの定期実行向け）"""
+    manager = open_manager(args)
+    try:
+        overdue = manager.get_overdue(limit=args.limit)
+        upcoming = manager.next_due(args.limit, args.hours)
+    finally:
+        manager.close()
+    if args.format == "text":
+        for label, todos in (("⚠️ 期限切れ", overdue), ("⏰ もうすぐ期限", upcoming)):
+            for todo in todos:
+                print(f"{label} {todo} （期限: {todo.due_date}）")
+    else:
+        sys.stdout.flush()
+        write_todos(overdue + upcoming, args.format, sys.stdout.buffer)
+    return 0
+
+
+def command_stats(args) -> int:
+    """統計情報をJSONで出力"""
+    import json
+    manager = open_manager(args)
+    print(json.dumps(manager.get_stats(), ensure_ascii=False))
+    manager.close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """サブコマンドの引数の定義"""
+    parser = argparse.ArgumentParser(description="TODOアプリ（サブコマンドなしで対話形式のメニュー）")
+    parser.add_argument("-f", "--file", default="todos.json", help="データファイル（既定: todos.json）")
+    commands = parser.add_subparsers(dest="command")
+    
+    add = commands.add_parser("add", help="TODOを追加")
+    add.add_argument("title")
+    add.add_argument("-d", "--description", default="")
+    add.add_argument("--due", help="期限日（YYYY-MM-DD）")
+    add.set_defaults(handler=command_add)
+    
+    list_ = commands.add_parser("list", help="TODOを表示")
+    list_.add_argument("--pending", action="store_true", help="未完了のTODOだけ")
+    list_.add_argument("--date", help="期限日（YYYY-MM-DD）で絞り込む")
+    list_.add_argument("--format", choices=("text", "ndjson", "csv"), default="text")
+    list_.set_defaults(handler=command_list)
+    
+    for name, op, message, help_text in (("complete", "complete", "✅ 完了にしました", "TODOを完了にする"),
+                                         ("delete", "delete", "🗑️ 削除しました", "TODOを削除")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("ids", type=int, nargs="+", metavar="ID")
+        command.set_defaults(handler=lambda args, op=op, message=message: apply_to_ids(args, op, message))
+    
+    import_ = commands.add_parser("import", help="NDJSON / CSV のTODOを取り込む")
+    import_.add_argument("input", nargs="?", default="-", help="入力ファイル（既定: 標準入力）")
+    import_.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    import_.add_argument("--keep-ids", action="store_true", help="新しいIDを振らず、入力のIDを使う")
+    import_.set_defaults(handler=command_import)
+    
+    export = commands.add_parser("export", help="TODOを NDJSON / CSV で出力")
+    export.add_argument("-o", "--output", default="-", help="出力ファイル（既定: 標準出力）")
+    export.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    export.add_argument("--pending", action="store_true", help="未完了のTODOだけ")
+    export.set_defaults(handler=command_export)
+    
+    due = commands.add_parser("due", help="期限切れと期限の近い未完了のTODOを表示")
+    due.add_argument("--hours", type=float, help="この時間以内に期限（期限日の終わり）が来るものだけ")
+    due.add_argument("--limit", type=int, default=20, help="それぞれの最大件数（既定: 20）")
+    due.add_argument("--format", choices=("text", "ndjson", "csv"), default="text")
+    due.set_defaults(handler=command_due)
+    
+    stats = commands.add_parser("stats", help="統計情報をJSONで出力")
+    stats.set_defaults(handler=command_stats)
+    return parser
+
+
+def main(argv=None):
+    """メイン関数（サブコマンドがなければ対話形式のメニューを起動）"""
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        app = TodoCLI(args.file)
+        app.run()
+        return
+    try:
+        status = args.handler(args)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        status = 1
+    except BrokenPipeError:
+        # head などで出力を途中で閉じられた
+        status = 0
+    sys.exit(status)
 
 
 if __name__ == "__main__":
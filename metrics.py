@@ -0,0 +1,207 @@
+"""
+TODOアプリ - メトリクス
+処理時間のヒストグラムやカウンタを集計し、Prometheus のテキスト形式で出力する
+
+Registry(enabled=False) で作ったメトリクスは何もしない（計測を止めたいときの no-op モード）。
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, Union
+
+# 処理時間（秒）のバケット
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# バイト数のバケット（256B から 4倍ずつ 256MB まで）
+BYTE_BUCKETS = tuple(256 * 4 ** i for i in range(11))
+
+
+def _escape(value: str) -> str:
+    """ラベルの値をエスケープ"""
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """{name="value",...} 形式のラベルを作成（ラベルがなければ空文字）"""
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: Union[int, float]) -> str:
+    """値を出力用の文字列に変換"""
+    if isinstance(value, float):
+        return repr(value) if value == value and abs(value) != float("inf") else \
+            ("NaN" if value != value else ("+Inf" if value > 0 else "-Inf"))
+    return str(value)
+
+
+class _Metric:
+    """メトリクスの共通部分（名前・説明・ラベル名）"""
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def collect(self) -> Iterator[str]:
+        """出力する行（HELP・TYPE を除く）を返す"""
+        raise NotImplementedError
+
+    def render(self) -> Iterator[str]:
+        """HELP・TYPE を含めて出力する行を返す"""
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+        yield from self.collect()
+
+
+class Histogram(_Metric):
+    """値の分布（バケットごとの件数・合計・件数）をラベルの組ごとに集計する"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # ラベルの値の組 → [バケットごとの件数..., +Inf の件数, 合計]
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """値を1つ記録"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def collect(self) -> Iterator[str]:
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(series[-1])}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class Counter(_Metric):
+    """増えるだけの値をラベルの組ごとに集計する"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        """値を amount だけ増やす"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self) -> Iterator[str]:
+        with self._lock:
+            snapshot = dict(self._values)
+        for labels, value in sorted(snapshot.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class CallbackMetric(_Metric):
+    """出力のたびに callback() を呼んで値を取得するメトリクス（件数などの現在値）
+
+    callback はラベルがなければ値を、あればラベルの値の組 → 値の辞書を返す。
+    累積の回数（キャッシュのヒット数など）は metric_type="counter" で出力する。
+    """
+
+    def __init__(self, name: str, documentation: str, callback: Callable, labelnames: Sequence[str] = (),
+                 metric_type: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.type = metric_type
+
+    def collect(self) -> Iterator[str]:
+        values = self.callback()
+        if not self.labelnames:
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class _NullMetric:
+    """何もしないメトリクス（no-op モード）"""
+
+    def observe(self, value: float, *labels: str) -> None:
+        pass
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        pass
+
+
+NULL_METRIC = _NullMetric()
+
+
+class Registry:
+    """メトリクスを登録し、まとめてテキスト形式で出力する
+
+    enabled=False のときは登録せずに何もしないメトリクスを返し、render() は空文字を返す。
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: List[_Metric] = []
+
+    def _register(self, metric: _Metric):
+        if not self.enabled:
+            return NULL_METRIC
+        if any(existing.name == metric.name for existing in self._metrics):
+            raise ValueError(f"メトリクス {metric.name} は登録済みです")
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """ヒストグラムを登録"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """カウンタを登録"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def callback(self, name: str, documentation: str, callback: Callable, labelnames: Sequence[str] = (),
+                 metric_type: str = "gauge") -> None:
+        """出力のたびに値を取得するメトリクスを登録"""
+        self._register(CallbackMetric(name, documentation, callback, labelnames, metric_type))
+
+    def render(self) -> str:
+        """登録されたすべてのメトリクスを Prometheus のテキスト形式（version 0.0.4）で出力"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+class StoreMetrics:
+    """TodoRepository の計測項目（操作ごとの処理時間・ロックの待ち時間・書き込んだバイト数）
+
+    既定では何もしない Registry(enabled=False) のメトリクスを使うので、計測しない場合の負荷はほぼない。
+    """
+
+    def __init__(self, registry: Registry = None):
+        registry = registry or Registry(enabled=False)
+        self.operation_seconds = registry.histogram(
+            "todo_operation_seconds", "TodoRepository の操作ごとの処理時間（ロックの待ち時間を含む）", ["operation"])
+        self.lock_wait_seconds = registry.histogram(
+            "todo_lock_wait_seconds", "読み込み・書き込みロックを取得するまでの待ち時間", ["mode"])
+        self.write_bytes = registry.histogram(
+            "todo_write_bytes", "1回の保存で書き込んだバイト数（snapshot はJSONファイル全体、journal はログ1行）",
+            ["kind"], BYTE_BUCKETS)
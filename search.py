@@ -0,0 +1,273 @@
+"""
+TODOアプリ - 全文検索
+タイトルと説明の転置インデックスを持ち、TODOの追加・変更・削除に合わせて少しずつ更新する
+
+日本語（ひらがな・カタカナ・漢字）は文字の2-gram、それ以外は単語を単位に索引する。
+"""
+
+import heapq
+import itertools
+import re
+import unicodedata
+from collections import defaultdict
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+# 日本語として2-gramに分割する文字（長音記号を含む）
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+# 検索語を日本語の並びと単語に分ける
+_RUN_RE = re.compile(f"([{_CJK}]+)|([^\\W_{_CJK}]+)")
+# 索引する語（日本語の2-gramと並びの末尾の1文字、単語）の先頭で空文字に一致し、語をグループで取り出す
+_TERM_RE = re.compile(f"(?=([{_CJK}]{{2}}|[{_CJK}](?![{_CJK}])|(?<![^\\W_{_CJK}])[^\\W_{_CJK}]+))")
+
+# タイトルに含まれる語は説明に含まれる語より高く評価する
+TITLE_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+# 前方一致で展開する語の上限（短い接頭辞で語彙全体を走査しないようにする）
+MAX_PREFIX_TERMS = 256
+
+# 候補がこの件数以下なら、全候補のスコアを計算して並べる
+SCORE_ALL_LIMIT = 2000
+
+# 候補が多いとき、最新のIDから順に所属を調べながら、何個ごとに残りの個数を見積もり直すか
+SCAN_LIMIT = 2048
+
+_EMPTY: Set[int] = frozenset()
+
+
+def normalize(text: str) -> str:
+    """全角・半角や大文字・小文字の違いをそろえる"""
+    if text.isascii():
+        return text.lower()
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def _scan(text: str) -> Iterator[Tuple[str, bool]]:
+    """正規化したテキストを (文字の並び, 日本語か) に分割"""
+    for match in _RUN_RE.finditer(normalize(text)):
+        cjk, word = match.groups()
+        if cjk:
+            yield cjk, True
+        else:
+            yield word, False
+
+
+def tokenize(text: str) -> Set[str]:
+    """索引する語の集合を返す
+
+    日本語は2-gramに加えて末尾の1文字も索引し、1文字での検索を前方一致で引けるようにする。
+    """
+    return set(_TERM_RE.findall(normalize(text)))
+
+
+def query_terms(query: str) -> List[Tuple[str, bool]]:
+    """検索語を (語, 前方一致か) のリストに変換
+
+    入力途中の最後の語（末尾が空白でないもの）と、日本語の1文字は前方一致で検索する。
+    """
+    terms = []
+    for run, cjk in _scan(query):
+        if cjk and len(run) > 1:
+            terms.extend((run[i:i + 2], False) for i in range(len(run) - 1))
+        else:
+            terms.append((run, cjk))
+    if terms and query[-1:].strip():
+        terms[-1] = (terms[-1][0], True)
+    return list(dict.fromkeys(terms))
+
+
+class SearchIndex:
+    """タイトル・説明の転置インデックス（語 → TODOのIDの集合）
+
+    前方一致のため語彙をソート済みのリストでも持つ。IDがなくなった語も語彙には残し、
+    同じ語が再び現れたときにリストへの挿入をしなくて済むようにする。
+    """
+
+    def __init__(self):
+        self._title: Dict[str, Set[int]] = {}
+        self._description: Dict[str, Set[int]] = {}
+        self._terms: List[str] = []
+        self._count = 0
+        self._max_id = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def build(self, entries: Iterator[Tuple[int, str, str]]) -> None:
+        """(ID, タイトル, 説明) からまとめて作成（語彙のソートは最後に1回だけ行う）"""
+        title_postings = defaultdict(set, self._title)
+        description_postings = defaultdict(set, self._description)
+        for todo_id, title, description in entries:
+            for term in tokenize(title) if title else ():
+                title_postings[term].add(todo_id)
+            for term in tokenize(description) if description else ():
+                description_postings[term].add(todo_id)
+            self._count += 1
+            if todo_id > self._max_id:
+                self._max_id = todo_id
+        self._title = dict(title_postings)
+        self._description = dict(description_postings)
+        self._terms = sorted(self._title.keys() | self._description.keys())
+
+    def add(self, todo_id: int, title: str, description: str) -> None:
+        """TODOを登録"""
+        for postings, text in ((self._title, title), (self._description, description)):
+            for term in tokenize(text) if text else ():
+                ids = postings.get(term)
+                if ids is None:
+                    if term not in self._title and term not in self._description:
+                        insort(self._terms, term)
+                    postings[term] = ids = set()
+                ids.add(todo_id)
+        self._count += 1
+        self._max_id = max(self._max_id, todo_id)
+
+    def remove(self, todo_id: int, title: str, description: str) -> None:
+        """TODOを外す（登録したときと同じタイトル・説明を渡す）"""
+        for postings, text in ((self._title, title), (self._description, description)):
+            for term in tokenize(text) if text else ():
+                ids = postings.get(term)
+                if ids is not None:
+                    ids.discard(todo_id)
+        self._count -= 1
+
+    def _expand(self, prefix: str) -> Iterator[str]:
+        """prefix で始まる語を最大 MAX_PREFIX_TERMS 個返す"""
+        terms = self._terms
+        start = bisect_left(terms, prefix)
+        for term in terms[start:start + MAX_PREFIX_TERMS]:
+            if not term.startswith(prefix):
+                break
+            yield term
+
+    def _levels(self, term: str, prefix: bool) -> List[Tuple[int, Set[int]]]:
+        """語に一致するIDの (重み, 集合) のリスト（重みの大きい順、空の集合は除く）
+
+        タイトルでの完全一致を最も高く、前方一致で展開した語はその半分の重みにする。
+        1つのIDが複数の集合に含まれる場合は最初（最大の重み）の集合に一致したものとして扱う。
+        """
+        title = self._title.get(term, _EMPTY)
+        description = self._description.get(term, _EMPTY)
+        if not prefix:
+            levels = [(TITLE_WEIGHT * 2, [title]), (DESCRIPTION_WEIGHT * 2, [description])]
+        else:
+            expanded = [other for other in self._expand(term) if other != term]
+            levels = [
+                (TITLE_WEIGHT * 2, [title]),
+                (TITLE_WEIGHT, [self._title[other] for other in expanded if other in self._title]),
+                (DESCRIPTION_WEIGHT * 2, [description]),
+                (DESCRIPTION_WEIGHT, [self._description[other] for other in expanded if other in self._description]),
+            ]
+        merged: Dict[int, List[Set[int]]] = {}
+        for weight, sets in levels:
+            merged.setdefault(weight, []).extend(ids for ids in sets if ids)
+        return [(weight, _union(sets)) for weight, sets in merged.items() if sets]
+
+    def search(self, query: str, limit: Optional[int] = 20,
+               accept: Callable[[int], bool] = None) -> List[Tuple[int, int]]:
+        """すべての語を含むTODOを (ID, スコア) のリストでスコアの高い順に返す（同点は新しい順）
+
+        スコアは語ごとの重みの合計。候補が多いときは全件のスコアを計算せず、スコアの高い組み合わせから順に
+        集合の積で候補を絞り、limit 件に達したところで打ち切る。
+        accept を渡すと、それが True を返すIDだけを返す。
+        """
+        groups = []
+        for term, prefix in query_terms(query):
+            levels = self._levels(term, prefix)
+            if not levels:
+                return []
+            groups.append(levels)
+        if not groups:
+            return []
+        estimate = min(sum(len(ids) for _, ids in levels) for levels in groups)
+        if limit is None or estimate <= SCORE_ALL_LIMIT:
+            unions = sorted((_union([ids for _, ids in levels]) for levels in groups), key=len)
+            candidates = unions[0].intersection(*unions[1:]) if len(unions) > 1 else unions[0]
+            return self._score_all(candidates, groups, limit, accept)
+        # 重みの組み合わせをスコアの高い順に調べる（同じスコアの組み合わせはまとめて新しい順に並べる）
+        tiers: Dict[int, List[List[Set[int]]]] = {}
+        for combination in itertools.product(*groups):
+            score = sum(weight for weight, _ in combination)
+            tiers.setdefault(score, []).append(sorted((ids for _, ids in combination), key=len))
+        results = []
+        taken = set()
+        for score in sorted(tiers, reverse=True):
+            for todo_id in self._newest(tiers[score], limit - len(results), accept, taken):
+                results.append((todo_id, score))
+                taken.add(todo_id)
+            if len(results) >= limit:
+                break
+        return results
+
+    def _newest(self, combinations: List[List[Set[int]]], count: int,
+                accept: Optional[Callable[[int], bool]], taken: Set[int]) -> List[int]:
+        """いずれかの組み合わせの集合すべてに含まれるIDを、新しい順に count 個まで返す
+
+        一致するIDが多いときは最新のIDから順に所属を調べればすぐに見つかるので、まずそれを試す。
+        SCAN_LIMIT 個ごとに見つかった割合から残りを見積もり、集合の積の計算（最小の集合の大きさに比例）より
+        時間がかかりそうなら、集合の積に切り替える。
+        """
+        found = []
+        budget = max(SCAN_LIMIT, sum(len(sets[0]) for sets in combinations) // 4)
+        start = self._max_id
+        checkpoint = start - SCAN_LIMIT
+        for todo_id in range(start, 0, -1):
+            if todo_id == checkpoint:
+                if count * (start - todo_id) > budget * max(len(found), 1):
+                    break
+                checkpoint -= SCAN_LIMIT
+            for sets in combinations:
+                if all(todo_id in ids for ids in sets):
+                    break
+            else:
+                continue
+            if todo_id in taken or (accept is not None and not accept(todo_id)):
+                continue
+            found.append(todo_id)
+            if len(found) >= count:
+                return found
+        else:
+            return found
+        tier = _union([sets[0].intersection(*sets[1:]) for sets in combinations])
+        return _take_newest(tier, count, accept, taken)
+
+    def _score_all(self, candidates: Set[int], groups: List[List[Tuple[int, Set[int]]]],
+                   limit: Optional[int], accept: Optional[Callable[[int], bool]]) -> List[Tuple[int, int]]:
+        """候補ごとにスコアを計算して並べる（候補が少ないとき）"""
+        scores = []
+        for todo_id in candidates:
+            if accept is not None and not accept(todo_id):
+                continue
+            score = 0
+            for levels in groups:
+                for weight, ids in levels:
+                    if todo_id in ids:
+                        score += weight
+                        break
+            scores.append((todo_id, score))
+        key = lambda item: (-item[1], -item[0])
+        if limit is None:
+            return sorted(scores, key=key)
+        return heapq.nsmallest(limit, scores, key=key)
+
+
+def _union(sets: List[Set[int]]) -> Set[int]:
+    """集合の和（1つだけならコピーせずにそのまま返すので、結果は変更しないこと）"""
+    if len(sets) == 1:
+        return sets[0]
+    if not sets:
+        return _EMPTY
+    return set().union(*sets)
+
+
+def _take_newest(ids: Set[int], count: int, accept: Optional[Callable[[int], bool]], taken: Set[int]) -> List[int]:
+    """ids からIDの大きい（新しい）順に、taken になく accept を満たすものを count 個まで返す"""
+    size = count
+    while True:
+        top = heapq.nlargest(size, ids)
+        picked = [todo_id for todo_id in top
+                  if todo_id not in taken and (accept is None or accept(todo_id))]
+        if len(picked) >= count or size >= len(ids):
+            return picked[:count]
+        size *= 4
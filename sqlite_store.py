@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+TODOアプリ - SQLiteストレージバックエンド
+全件をメモリに読み込まず、検索条件をSQLで処理する
+
+移行コマンド: python sqlite_store.py migrate [--overwrite] [todos.json] [todos.db]
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from search import normalize
+from todo import (NO_DUE_DAY, Todo, TodoManager, TodoRepository, check_text_fields, current_timestamp, decode_cursor,
+                  encode_cursor, month_ordinals, normalize_due_date, parse_due_date, parse_sort)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS todos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    completed INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    due_date TEXT,
+    due_day INTEGER,
+    completed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_todos_completed ON todos (completed, due_day);
+CREATE INDEX IF NOT EXISTS idx_todos_due_day ON todos (due_day, id);
+CREATE INDEX IF NOT EXISTS idx_todos_due_date ON todos (due_date);
+CREATE INDEX IF NOT EXISTS idx_todos_created_at ON todos (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_todos_due_sort ON todos (COALESCE(due_day, {no_due}), id);
+""".format(no_due=NO_DUE_DAY)
+
+# 全文検索用のFTS5テーブル（trigram なので日本語も3文字以上の部分一致で引ける）。todos の変更はトリガーで反映する
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(
+    title, description, content='todos', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN
+    INSERT INTO todos_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN
+    INSERT INTO todos_fts (todos_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF title, description ON todos BEGIN
+    INSERT INTO todos_fts (todos_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    INSERT INTO todos_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+END;
+"""
+REBUILD_SEARCH = "INSERT INTO todos_fts (todos_fts) VALUES ('rebuild')"
+SELECT_SEARCH_TABLE = "SELECT 1 FROM sqlite_master WHERE name = 'todos_fts'"
+# 完了日時の列がなかったデータベースに列を追加する
+SELECT_TABLE_COLUMNS = "SELECT name FROM pragma_table_info('todos')"
+ADD_COMPLETED_AT = "ALTER TABLE todos ADD COLUMN completed_at TEXT"
+
+COLUMNS = "id, title, description, completed, created_at, due_date, completed_at"
+
+# SQL文は定数にしておき、sqlite3 のステートメントキャッシュでプリペアドステートメントとして再利用する
+SELECT_ALL = f"SELECT {COLUMNS} FROM todos ORDER BY id"
+SELECT_PENDING = f"SELECT {COLUMNS} FROM todos WHERE completed = 0 ORDER BY id"
+SELECT_BY_ID = f"SELECT {COLUMNS} FROM todos WHERE id = ?"
+SELECT_BY_DATE = f"SELECT {COLUMNS} FROM todos WHERE due_date = ? AND completed <= ? ORDER BY id"
+SELECT_BY_RANGE = (f"SELECT {COLUMNS} FROM todos WHERE due_day >= ? AND due_day <= ? AND completed <= ? "
+                   "ORDER BY due_day, id")
+# 期限日が範囲内の未完了のTODO（idx_todos_completed をたどる。LIMIT -1 は件数の制限なし）
+SELECT_PENDING_DUE = (f"SELECT {COLUMNS} FROM todos WHERE completed = 0 AND due_day >= ? AND due_day < ? "
+                      "ORDER BY due_day, id LIMIT ?")
+# 並び替えの項目ごとのキー（期限日なしは最後に並ぶ）
+# 全文検索で todos_fts と結合するときの列（列名が重なるのでテーブル名を付ける）
+SEARCH_COLUMNS = ", ".join(f"todos.{column}" for column in COLUMNS.split(", "))
+# trigram で検索できない短い語は LIKE で照合する
+SEARCH_LIKE = "(todos.title LIKE ? ESCAPE '\\' OR todos.description LIKE ? ESCAPE '\\')"
+SORT_EXPRESSIONS = {
+    "id": "id",
+    "created_at": "created_at",
+    "due_date": f"COALESCE(due_day, {NO_DUE_DAY})",
+}
+INSERT = ("INSERT INTO todos (id, title, description, completed, created_at, due_date, due_day, completed_at) "
+          "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+SELECT_DUE_DAY = "SELECT due_day FROM todos WHERE id = ?"
+SELECT_COMPLETED_DUE_DAYS = "SELECT DISTINCT due_day FROM todos WHERE completed = 1 AND due_day IS NOT NULL"
+SELECT_COMPLETED_IDS = "SELECT id FROM todos WHERE completed = 1"
+SET_COMPLETED = "UPDATE todos SET completed = 1, completed_at = COALESCE(completed_at, ?) WHERE id = ?"
+SET_PENDING = "UPDATE todos SET completed = 0, completed_at = NULL WHERE id = ?"
+UPDATE = ("UPDATE todos SET title = COALESCE(?, title), description = COALESCE(?, description), "
+          "due_date = COALESCE(?, due_date), due_day = CASE WHEN ? IS NULL THEN due_day ELSE ? END "
+          "WHERE id = ?")
+DELETE = "DELETE FROM todos WHERE id = ?"
+CLEAR_COMPLETED = "DELETE FROM todos WHERE completed = 1"
+COUNT_STATS = ("SELECT COUNT(*), COALESCE(SUM(completed), 0), "
+               "(SELECT COUNT(*) FROM todos WHERE completed = 0 AND due_day < ?), "
+               "(SELECT COUNT(*) FROM todos WHERE completed = 0 AND due_day = ?) FROM todos")
+
+
+def _row_to_todo(row) -> Todo:
+    """SQLiteの行をTODOオブジェクトに変換"""
+    return Todo(row[0], row[1], row[2], bool(row[3]), row[4], row[5], row[6])
+
+
+class SqliteTodoManager(TodoRepository):
+    """SQLiteに保存するTODO管理クラス（WALモード・インデックス付き）"""
+
+    def __init__(self, db_file: str = "todos.db", change_feed_size: int = 1000):
+        super().__init__(change_feed_size)
+        self.db_file = db_file
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # 複数ワーカーが同じデータベースに書き込む場合はロック解除を待つ
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+        if "completed_at" not in {row[0] for row in self._conn.execute(SELECT_TABLE_COLUMNS)}:
+            self._conn.execute(ADD_COMPLETED_AT)
+        has_search_table = self._conn.execute(SELECT_SEARCH_TABLE).fetchone()
+        self._conn.executescript(SEARCH_SCHEMA)
+        if not has_search_table:
+            # 全文検索テーブルがなかったデータベースは、既存のTODOから作成する
+            self._conn.execute(REBUILD_SEARCH)
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def refresh(self) -> bool:
+        """他の接続（別のワーカー）がコミットしていればバージョンを無効にする"""
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return False
+            self._data_version = data_version
+            self._reset_versions()
+            return True
+
+    def _query(self, sql: str, params: Iterable = ()) -> List[Todo]:
+        with self._lock:
+            return [_row_to_todo(row) for row in self._conn.execute(sql, tuple(params))]
+
+    def add_todo(self, title: str, description: str = "", due_date: str = None) -> Todo:
+        """新しいTODOを追加（期限日が解釈できなければ ValueError）"""
+        check_text_fields(title=title, description=description)
+        todo = Todo(None, title, description, due_date=normalize_due_date(due_date))
+        with self._lock:
+            due_day = parse_due_date(todo.due_date)
+            cursor = self._conn.execute(INSERT, (None, todo.title, todo.description, 0, todo.created_at,
+                                                 todo.due_date, due_day, None))
+            todo.id = cursor.lastrowid
+            self._bump_version([due_day] if due_day is not None else [], [(todo.id, "created")])
+        return todo
+
+    def get_todos(self, show_completed: bool = True) -> List[Todo]:
+        """TODOリストを取得"""
+        return self._query(SELECT_ALL if show_completed else SELECT_PENDING)
+
+    def query_todos(self, limit: Optional[int] = 100, cursor: str = None, sort: str = "id",
+                    show_completed: bool = True) -> Tuple[List[Todo], Optional[str]]:
+        """並び順を指定してTODOを1ページ分取得し、(TODOのリスト, 次のページのカーソル) を返す"""
+        if limit is not None and limit < 1:
+            raise ValueError("limitは1以上で指定してください")
+        field, reverse = parse_sort(sort)
+        expression = SORT_EXPRESSIONS[field]
+        order = "DESC" if reverse else "ASC"
+        sql = f"SELECT {COLUMNS}, {expression} FROM todos WHERE completed <= ?"
+        params = [int(show_completed)]
+        if cursor:
+            sql += f" AND ({expression}, id) {'<' if reverse else '>'} (?, ?)"
+            params.extend(decode_cursor(cursor, sort))
+        sql += f" ORDER BY {expression} {order}, id {order} LIMIT ?"
+        # 次のページがあるかを判定するため1件多く取得する
+        params.append(-1 if limit is None else limit + 1)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        if limit is None or len(rows) <= limit:
+            return [_row_to_todo(row) for row in rows], None
+        rows = rows[:limit]
+        return [_row_to_todo(row) for row in rows], encode_cursor(sort, rows[-1][-1], rows[-1][0])
+
+    def get_todos_by_date(self, date: str, show_completed: bool = True) -> List[Todo]:
+        """指定された日付のTODOリストを取得"""
+        return self._query(SELECT_BY_DATE, (date, int(show_completed)))
+
+    def get_todos_by_range(self, start_date: str, end_date: str, show_completed: bool = True) -> List[Todo]:
+        """期限日が start_date 以上 end_date 以下のTODOを期限日順に取得"""
+        start = parse_due_date(start_date)
+        end = parse_due_date(end_date)
+        if start is None or end is None:
+            raise ValueError("日付はYYYY-MM-DD形式で指定してください")
+        return self._query(SELECT_BY_RANGE, (start, end, int(show_completed)))
+
+    def get_todos_by_month(self, year: int, month: int, show_completed: bool = True) -> Dict[str, List[Todo]]:
+        """指定された月のTODOを日付ごとにグループ化して取得"""
+        ordinals = month_ordinals(year, month)
+        if ordinals is None:
+            return {}
+        start, stop = ordinals
+        month_todos = {}
+        for todo in self._query(SELECT_BY_RANGE, (start, stop - 1, int(show_completed))):
+            month_todos.setdefault(todo.due_date, []).append(todo)
+        return month_todos
+
+    def search(self, query: str, limit: Optional[int] = 20, show_completed: bool = True) -> List[Todo]:
+        """タイトル・説明に検索語（空白区切り）をすべて含むTODOを関連度（bm25）の高い順に取得
+
+        3文字以上の語はFTS5の trigram インデックスで部分一致を探し、それより短い語は LIKE で照合する。
+        """
+        if limit is not None and limit < 1:
+            raise ValueError("limitは1以上で指定してください")
+        words = normalize(query).split()
+        if not words:
+            return []
+        long_words = [word for word in words if len(word) >= 3]
+        if long_words:
+            # タイトルの一致を説明の一致の2倍に重み付けする
+            sql = (f"SELECT {SEARCH_COLUMNS} FROM todos_fts JOIN todos ON todos.id = todos_fts.rowid "
+                   "WHERE todos_fts MATCH ?")
+            params = [" ".join('"' + word.replace('"', '""') + '"' for word in long_words)]
+            order = "bm25(todos_fts, 2.0, 1.0), todos.id DESC"
+        else:
+            sql = f"SELECT {SEARCH_COLUMNS} FROM todos WHERE 1"
+            params = []
+            order = "todos.id DESC"
+        for word in words:
+            if len(word) < 3:
+                pattern = "%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                sql += " AND " + SEARCH_LIKE
+                params.extend((pattern, pattern))
+        sql += f" AND todos.completed <= ? ORDER BY {order} LIMIT ?"
+        params.extend((int(show_completed), -1 if limit is None else limit))
+        return self._query(sql, params)
+
+    def get_todo_by_id(self, todo_id: int) -> Optional[Todo]:
+        """IDでTODOを検索"""
+        todos = self._query(SELECT_BY_ID, (todo_id,))
+        return todos[0] if todos else None
+
+    def _modify(self, sql: str, params: Iterable, due_days_sql: str, due_days_params: Iterable = (),
+                new_due_day: int = None, changes: Iterable[Tuple[int, str]] = ()) -> int:
+        """変更を実行し、影響を受けた期限日（変更前・変更後）とTODOのバージョンを進める"""
+        with self._lock:
+            due_days = [row[0] for row in self._conn.execute(due_days_sql, tuple(due_days_params))]
+            count = self._conn.execute(sql, tuple(params)).rowcount
+            if count:
+                due_days.append(new_due_day)
+                self._bump_version([day for day in due_days if day is not None], changes)
+            return count
+
+    def complete_todo(self, todo_id: int) -> bool:
+        """TODOを完了状態にする"""
+        return self._modify(SET_COMPLETED, (current_timestamp(), todo_id), SELECT_DUE_DAY, (todo_id,),
+                            changes=[(todo_id, "updated")]) > 0
+
+    def uncomplete_todo(self, todo_id: int) -> bool:
+        """TODOを未完了状態にする"""
+        return self._modify(SET_PENDING, (todo_id,), SELECT_DUE_DAY, (todo_id,),
+                            changes=[(todo_id, "updated")]) > 0
+
+    def delete_todo(self, todo_id: int) -> bool:
+        """TODOを削除"""
+        return self._modify(DELETE, (todo_id,), SELECT_DUE_DAY, (todo_id,),
+                            changes=[(todo_id, "deleted")]) > 0
+
+    def update_todo(self, todo_id: int, title: str = None, description: str = None, due_date: str = None) -> bool:
+        """TODOを更新（文字列でない項目や解釈できない期限日は ValueError）"""
+        check_text_fields(title=title, description=description)
+        due_date = normalize_due_date(due_date)
+        due_day = parse_due_date(due_date)
+        return self._modify(UPDATE, (title, description, due_date, due_date, due_day, todo_id),
+                            SELECT_DUE_DAY, (todo_id,), due_day, [(todo_id, "updated")]) > 0
+
+    def clear_completed(self) -> int:
+        """完了済みのTODOをすべて削除"""
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(SELECT_COMPLETED_IDS)]
+            return self._modify(CLEAR_COMPLETED, (), SELECT_COMPLETED_DUE_DAYS,
+                                changes=[(todo_id, "deleted") for todo_id in ids])
+
+    def get_changes(self, since: int, epoch: str = None) -> Dict:
+        """since より後の変更を返す（他の接続の変更があれば resync になる）"""
+        self.refresh()
+        with self._lock:
+            return super().get_changes(since, epoch)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """apply_batch の変更を1つのトランザクションでコミット（失敗時はロールバック）"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def get_stats(self) -> Dict[str, int]:
+        """統計情報（件数・完了・未完了・期限切れ・今日が期限）を取得"""
+        today = date.today().toordinal()
+        with self._lock:
+            total, completed, overdue, due_today = self._conn.execute(COUNT_STATS, (today, today)).fetchone()
+        return {
+            "total": total,
+            "completed": completed,
+            "pending": total - completed,
+            "overdue": overdue,
+            "due_today": due_today
+        }
+
+    def next_due(self, limit: Optional[int] = 10, hours: float = None, now: datetime = None) -> List[Todo]:
+        """期限がまだ過ぎていない未完了のTODOを期限の近い順に最大 limit 件取得"""
+        today, stop = self._due_window(limit, hours, now)
+        return self._query(SELECT_PENDING_DUE, (today, stop, -1 if limit is None else limit))
+
+    def get_overdue(self, now: datetime = None, limit: Optional[int] = None) -> List[Todo]:
+        """期限が過ぎた（期限日が now の日付より前の）未完了のTODOを期限日順に取得"""
+        today, _ = self._due_window(limit, None, now)
+        return self._query(SELECT_PENDING_DUE, (0, today, -1 if limit is None else limit))
+
+    def close(self) -> None:
+        """データベース接続を閉じる"""
+        self._close_due_watcher()
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json_to_sqlite(json_file: str, db_file: str, overwrite: bool = False) -> int:
+    """JSONファイル（ジャーナルを含む）のTODOをSQLiteデータベースに移行し、件数を返す
+
+    移行先にTODOがある場合は、overwrite=True のときだけ置き換える（それ以外は何もせずに ValueError）。
+    移行元のファイルもジャーナルもなければ、空のデータで置き換えないよう FileNotFoundError を送出する。
+    """
+    journal = os.path.exists(json_file + ".log")
+    if not journal and not os.path.exists(json_file):
+        raise FileNotFoundError(f"{json_file} が見つかりません")
+    source = TodoManager(json_file, journal=journal)
+    target = SqliteTodoManager(db_file)
+    try:
+        rows = [
+            (todo.id, todo.title, todo.description, int(todo.completed), todo.created_at,
+             todo.due_date, parse_due_date(todo.due_date), todo.completed_at)
+            for todo in source.get_todos()
+        ]
+        with target._lock:
+            conn = target._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not overwrite and conn.execute("SELECT 1 FROM todos LIMIT 1").fetchone():
+                    raise ValueError(f"{db_file} にはすでにTODOがあります（置き換える場合は overwrite を指定してください）")
+                conn.execute("DELETE FROM todos")
+                conn.executemany(INSERT, rows)
+                # 削除済みのIDを再利用しないよう、採番をJSON側の next_id に合わせる
+                conn.execute("DELETE FROM sqlite_sequence WHERE name = 'todos'")
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('todos', ?)", (source.next_id - 1,))
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+    finally:
+        source.close()
+        target.close()
+    return len(rows)
+
+
+def main():
+    """移行コマンドのエントリポイント"""
+    args = sys.argv[1:]
+    if not args or args[0] != "migrate":
+        print("使用方法: python sqlite_store.py migrate [--overwrite] [todos.json] [todos.db]")
+        sys.exit(1)
+    overwrite = "--overwrite" in args
+    args = [arg for arg in args if arg != "--overwrite"]
+    json_file = args[1] if len(args) > 1 else "todos.json"
+    db_file = args[2] if len(args) > 2 else "todos.db"
+    try:
+        count = migrate_json_to_sqlite(json_file, db_file, overwrite)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ {count}件のTODOを {json_file} から {db_file} に移行しました")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,107 @@ let todos = [];
 let currentFilter = 'all';
 let editingTodoId = null;
 
+// ページ単位の読み込み（スクロールに合わせて次のページを取得）
+const PAGE_SIZE = 50;
+let nextCursor = null;
+let loadingPage = false;
+let latestStats = { total: 0, completed: 0, pending: 0 };
+
+// ETagによる条件付きGET（変更がなければ304が返り、前回の結果をそのまま使う）
+const etagCache = new Map();
+
+// 差分同期（/api/changes）で使う、画面のデータが反映しているバージョン
+let syncState = null;
+
+// 全文検索（入力が止まってから /api/search を呼び、結果を一覧の代わりに表示する）
+const SEARCH_DELAY = 200;
+const SEARCH_LIMIT = 50;
+let searchQuery = '';
+let searchResults = null;
+let searchTimer = null;
+
+async function fetchJsonWithEtag(url) {
+    const cached = etagCache.get(url);
+    const headers = cached ? { 'If-None-Match': cached.etag } : {};
+    const response = await fetch(url, { headers: headers, cache: 'no-store' });
+    
+    // 差分同期の起点になるバージョン（304でも現在のバージョンが返る）
+    const version = {
+        epoch: response.headers.get('X-Data-Epoch'),
+        version: Number(response.headers.get('X-Data-Version'))
+    };
+    if (response.status === 304 && cached) {
+        return { ok: true, status: 304, data: cached.data, version: version };
+    }
+    const data = await response.json().catch(() => ({}));
+    if (response.ok && response.headers.get('ETag')) {
+        etagCache.set(url, { etag: response.headers.get('ETag'), data: data });
+    }
+    return { ok: response.ok, status: response.status, data: data, version: version };
+}
+
+// 前回の同期以降の変更だけを取得（null なら一覧を取得し直す必要がある）
+async function fetchChanges() {
+    if (!syncState.epoch) return null;
+    const params = new URLSearchParams({ since: syncState.version, epoch: syncState.epoch });
+    const response = await fetch(`/api/changes?${params}`, { cache: 'no-store' });
+    if (!response.ok) return null;
+    const changes = await response.json();
+    if (changes.resync) return null;
+    syncState = { epoch: changes.epoch, version: changes.version };
+    return changes;
+}
+
+// /api/events の通知を受けて、他のタブ・CLI・ワーカーでの変更を反映する
+// （EventSource が使えない環境では一定間隔で差分を問い合わせる）
+const SYNC_INTERVAL = 30000;
+
+function setupChangeSync(syncChanges, reload) {
+    // 同期中に届いた通知は、同期が終わってからもう一度だけ反映する
+    let syncing = false;
+    let syncAgain = false;
+    async function sync() {
+        if (syncing) {
+            syncAgain = true;
+            return;
+        }
+        syncing = true;
+        try {
+            do {
+                syncAgain = false;
+                await syncChanges();
+            } while (syncAgain);
+        } finally {
+            syncing = false;
+        }
+    }
+    
+    if (!window.EventSource) {
+        setInterval(function() {
+            if (document.visibilityState === 'visible') {
+                sync();
+            }
+        }, SYNC_INTERVAL);
+        return;
+    }
+    const source = new EventSource('/api/events');
+    // 接続直後（再接続を含む）は切断中の変更を取りこぼさないよう差分を問い合わせる
+    source.addEventListener('hello', sync);
+    source.addEventListener('change', function(e) {
+        const event = JSON.parse(e.data);
+        if (!syncState || event.version > syncState.version) {
+            sync();
+        }
+    });
+    source.addEventListener('resync', reload);
+}
+
 // ページ読み込み時の初期化
 document.addEventListener('DOMContentLoaded', function() {
     loadTodos();
     setupEventListeners();
+    setupInfiniteScroll();
+    setupChangeSync(syncChanges, loadTodos);
 });
 
 // イベントリスナーの設定
@@ -31,6 +128,12 @@ function setupEventListeners() {
         }
     });
     
+    // 入力のたびに検索（前方一致なので入力途中でも結果が出る）
+    document.getElementById('search-input').addEventListener('input', function(e) {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => searchTodos(e.target.value), SEARCH_DELAY);
+    });
+    
     // モーダルの外側クリックで閉じる
     document.getElementById('edit-modal').addEventListener('click', function(e) {
         if (e.target === this) {
@@ -39,20 +142,142 @@ function setupEventListeners() {
     });
 }
 
-// TODOリストを読み込み
+// 画面下部の目印が見えたら次のページを読み込む
+function setupInfiniteScroll() {
+    const sentinel = document.getElementById('load-more-sentinel');
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadNextPage();
+        }
+    }, { rootMargin: '200px' });
+    observer.observe(sentinel);
+}
+
+// 目印がまだ画面内にある（表示件数が少ない）場合は続けて読み込む
+function isSentinelVisible() {
+    const rect = document.getElementById('load-more-sentinel').getBoundingClientRect();
+    return rect.top <= window.innerHeight + 200;
+}
+
+// TODOリストを読み込み（最初のページから）
 async function loadTodos() {
+    todos = [];
+    nextCursor = null;
+    await loadNextPage(true);
+    updateStats();
+}
+
+// 次のページを読み込み
+async function loadNextPage(first = false) {
+    if (loadingPage || (!first && !nextCursor)) return;
+    loadingPage = true;
+    
     try {
-        const response = await fetch('/api/todos');
+        const params = new URLSearchParams({ limit: PAGE_SIZE });
+        if (nextCursor) {
+            params.set('cursor', nextCursor);
+        }
+        const response = await fetchJsonWithEtag(`/api/todos?${params}`);
         if (response.ok) {
-            todos = await response.json();
+            const page = response.data;
+            if (first) {
+                syncState = response.version;
+            }
+            // 読み込み済みのページより後に追加したTODOは重複させない
+            const loadedIds = new Set(todos.map(t => t.id));
+            todos = todos.concat(page.todos.filter(t => !loadedIds.has(t.id)));
+            nextCursor = page.next_cursor;
             renderTodos();
-            updateStats();
         } else {
             showNotification('TODOの読み込みに失敗しました', 'error');
+            nextCursor = null;
         }
     } catch (error) {
         console.error('Error loading todos:', error);
         showNotification('TODOの読み込み中にエラーが発生しました', 'error');
+        nextCursor = null;
+    } finally {
+        loadingPage = false;
+    }
+    
+    if (nextCursor && isSentinelVisible()) {
+        loadNextPage();
+    }
+}
+
+// 前回の同期以降の変更だけを読み込み済みのリストに反映
+async function syncChanges() {
+    if (loadingPage || !syncState) return;
+    try {
+        const changes = await fetchChanges();
+        if (!changes) {
+            loadTodos();
+            return;
+        }
+        const deletedIds = new Set(changes.deleted);
+        const changed = new Map(changes.created.concat(changes.updated).map(t => [t.id, t]));
+        if (deletedIds.size === 0 && changed.size === 0) return;
+        
+        todos = todos.filter(t => !deletedIds.has(t.id)).map(t => {
+            const todo = changed.get(t.id);
+            changed.delete(t.id);
+            return todo || t;
+        });
+        // 未読み込みのページにあるTODOはそのページを読み込んだときに表示される
+        if (!nextCursor) {
+            todos = todos.concat([...changed.values()]);
+        }
+        renderTodos();
+        updateStats();
+        refreshSearch();
+    } catch (error) {
+        console.error('Error syncing todos:', error);
+    }
+}
+
+// 全文検索を実行（空なら通常の一覧表示に戻す）
+async function searchTodos(query) {
+    searchQuery = query;
+    if (!query.trim()) {
+        searchResults = null;
+        renderTodos();
+        return;
+    }
+    try {
+        const params = new URLSearchParams({ q: query, limit: SEARCH_LIMIT });
+        const response = await fetchJsonWithEtag(`/api/search?${params}`);
+        // 結果が届くまでに入力が変わっていれば、古い検索の結果は捨てる
+        if (query !== searchQuery) return;
+        if (response.ok) {
+            searchResults = response.data;
+            renderTodos();
+        } else {
+            showNotification(response.data.error || '検索に失敗しました', 'error');
+        }
+    } catch (error) {
+        console.error('Error searching todos:', error);
+        showNotification('検索中にエラーが発生しました', 'error');
+    }
+}
+
+// 検索結果を表示中なら、変更を反映するために検索し直す
+function refreshSearch() {
+    if (searchResults) {
+        searchTodos(searchQuery);
+    }
+}
+
+// 読み込み済みの一覧または検索結果からTODOを探す
+function findTodo(todoId) {
+    return todos.find(t => t.id === todoId) || (searchResults || []).find(t => t.id === todoId);
+}
+
+// 更新されたTODOを一覧と検索結果の両方に反映
+function replaceTodo(updatedTodo) {
+    const replace = t => t.id === updatedTodo.id ? updatedTodo : t;
+    todos = todos.map(replace);
+    if (searchResults) {
+        searchResults = searchResults.map(replace);
     }
 }
 
@@ -96,6 +321,7 @@ async function addTodo() {
             
             renderTodos();
             updateStats();
+            refreshSearch();
             showNotification('TODOを追加しました');
         } else {
             const error = await response.json();
@@ -109,7 +335,7 @@ async function addTodo() {
 
 // TODOの完了状態を切り替え
 async function toggleTodo(todoId) {
-    const todo = todos.find(t => t.id === todoId);
+    const todo = findTodo(todoId);
     if (!todo) return;
     
     try {
@@ -125,8 +351,7 @@ async function toggleTodo(todoId) {
         
         if (response.ok) {
             const updatedTodo = await response.json();
-            const index = todos.findIndex(t => t.id === todoId);
-            todos[index] = updatedTodo;
+            replaceTodo(updatedTodo);
             
             renderTodos();
             updateStats();
@@ -144,7 +369,7 @@ async function toggleTodo(todoId) {
 
 // TODOを削除
 async function deleteTodo(todoId) {
-    const todo = todos.find(t => t.id === todoId);
+    const todo = findTodo(todoId);
     if (!todo) return;
     
     if (!confirm(`「${todo.title}」を削除しますか？`)) {
@@ -158,6 +383,9 @@ async function deleteTodo(todoId) {
         
         if (response.ok) {
             todos = todos.filter(t => t.id !== todoId);
+            if (searchResults) {
+                searchResults = searchResults.filter(t => t.id !== todoId);
+            }
             renderTodos();
             updateStats();
             showNotification('TODOを削除しました');
@@ -172,7 +400,7 @@ async function deleteTodo(todoId) {
 
 // 編集モーダルを開く
 function openEditModal(todoId) {
-    const todo = todos.find(t => t.id === todoId);
+    const todo = findTodo(todoId);
     if (!todo) return;
     
     editingTodoId = todoId;
@@ -217,8 +445,7 @@ async function saveEdit() {
         
         if (response.ok) {
             const updatedTodo = await response.json();
-            const index = todos.findIndex(t => t.id === editingTodoId);
-            todos[index] = updatedTodo;
+            replaceTodo(updatedTodo);
             
             closeEditModal();
             renderTodos();
@@ -235,14 +462,15 @@ async function saveEdit() {
 
 // 完了済みTODOを全削除
 async function clearCompleted() {
-    const completedTodos = todos.filter(t => t.completed);
+    // 未読み込みのページも含めた件数はサーバーの統計情報を使う
+    const completedCount = latestStats.completed;
     
-    if (completedTodos.length === 0) {
+    if (completedCount === 0) {
         showNotification('完了済みのTODOはありません', 'error');
         return;
     }
     
-    if (!confirm(`${completedTodos.length}件の完了済みTODOを削除しますか？`)) {
+    if (!confirm(`${completedCount}件の完了済みTODOを削除しますか？`)) {
         return;
     }
     
@@ -254,6 +482,9 @@ async function clearCompleted() {
         if (response.ok) {
             const result = await response.json();
             todos = todos.filter(t => !t.completed);
+            if (searchResults) {
+                searchResults = searchResults.filter(t => !t.completed);
+            }
             renderTodos();
             updateStats();
             showNotification(result.message);
@@ -277,6 +508,9 @@ function filterTodos(filter) {
     event.target.classList.add('active');
     
     renderTodos();
+    if (nextCursor && isSentinelVisible()) {
+        loadNextPage();
+    }
 }
 
 // TODOリストを描画
@@ -284,17 +518,18 @@ function renderTodos() {
     const todoList = document.getElementById('todo-list');
     const emptyState = document.getElementById('empty-state');
     
-    // フィルターを適用
-    let filteredTodos = todos;
+    // 検索中は検索結果（関連度順）にフィルターを適用
+    const shownTodos = searchResults || todos;
+    let filteredTodos = shownTodos;
     switch (currentFilter) {
         case 'pending':
-            filteredTodos = todos.filter(t => !t.completed);
+            filteredTodos = shownTodos.filter(t => !t.completed);
             break;
         case 'completed':
-            filteredTodos = todos.filter(t => t.completed);
+            filteredTodos = shownTodos.filter(t => t.completed);
             break;
         default:
-            filteredTodos = todos;
+            filteredTodos = shownTodos;
     }
     
     if (filteredTodos.length === 0) {
@@ -334,15 +569,19 @@ function renderTodos() {
     `).join('');
 }
 
-// 統計情報を更新
-function updateStats() {
-    const total = todos.length;
-    const completed = todos.filter(t => t.completed).length;
-    const pending = total - completed;
-    
-    document.getElementById('total-count').textContent = total;
-    document.getElementById('completed-count').textContent = completed;
-    document.getElementById('pending-count').textContent = pending;
+// 統計情報を更新（未読み込みのページも含めてサーバーで集計した値を表示）
+async function updateStats() {
+    try {
+        const response = await fetchJsonWithEtag('/api/stats');
+        if (!response.ok) return;
+        latestStats = response.data;
+        
+        document.getElementById('total-count').textContent = latestStats.total;
+        document.getElementById('completed-count').textContent = latestStats.completed;
+        document.getElementById('pending-count').textContent = latestStats.pending;
+    } catch (error) {
+        console.error('Error loading stats:', error);
+    }
 }
 
 // 通知を表示
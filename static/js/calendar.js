@@ -3,7 +3,96 @@
 let currentDate = new Date();
 let selectedDate = null;
 let editingTodoId = null;
-let calendarTodos = {};
+
+// 月ごとの日別の概要（"YYYY-MM" → {"YYYY-MM-DD": {count, completed, preview}}）
+// 表示中の月と前後の月を /api/calendar/range でまとめて取得しておき、月の移動はすぐに描画する
+const calendarSummaries = new Map();
+const PREFETCH_MONTHS = 1;
+
+// 選択中の日のTODO（全項目。日付を選んだときに /api/todos?date= で取得する）
+let selectedTodos = [];
+
+// ETagによる条件付きGET（変更がなければ304が返り、前回の結果をそのまま使う）
+const etagCache = new Map();
+
+// 差分同期（/api/changes）で使う、画面のデータが反映しているバージョン
+let syncState = null;
+
+async function fetchJsonWithEtag(url) {
+    const cached = etagCache.get(url);
+    const headers = cached ? { 'If-None-Match': cached.etag } : {};
+    const response = await fetch(url, { headers: headers, cache: 'no-store' });
+    
+    // 差分同期の起点になるバージョン（304でも現在のバージョンが返る）
+    const version = {
+        epoch: response.headers.get('X-Data-Epoch'),
+        version: Number(response.headers.get('X-Data-Version'))
+    };
+    if (response.status === 304 && cached) {
+        return { ok: true, status: 304, data: cached.data, version: version };
+    }
+    const data = await response.json().catch(() => ({}));
+    if (response.ok && response.headers.get('ETag')) {
+        etagCache.set(url, { etag: response.headers.get('ETag'), data: data });
+    }
+    return { ok: response.ok, status: response.status, data: data, version: version };
+}
+
+// 前回の同期以降の変更だけを取得（null なら一覧を取得し直す必要がある）
+async function fetchChanges() {
+    if (!syncState.epoch) return null;
+    const params = new URLSearchParams({ since: syncState.version, epoch: syncState.epoch });
+    const response = await fetch(`/api/changes?${params}`, { cache: 'no-store' });
+    if (!response.ok) return null;
+    const changes = await response.json();
+    if (changes.resync) return null;
+    syncState = { epoch: changes.epoch, version: changes.version };
+    return changes;
+}
+
+// /api/events の通知を受けて、他のタブ・CLI・ワーカーでの変更を反映する
+// （EventSource が使えない環境では一定間隔で差分を問い合わせる）
+const SYNC_INTERVAL = 30000;
+
+function setupChangeSync(syncChanges, reload) {
+    // 同期中に届いた通知は、同期が終わってからもう一度だけ反映する
+    let syncing = false;
+    let syncAgain = false;
+    async function sync() {
+        if (syncing) {
+            syncAgain = true;
+            return;
+        }
+        syncing = true;
+        try {
+            do {
+                syncAgain = false;
+                await syncChanges();
+            } while (syncAgain);
+        } finally {
+            syncing = false;
+        }
+    }
+    
+    if (!window.EventSource) {
+        setInterval(function() {
+            if (document.visibilityState === 'visible') {
+                sync();
+            }
+        }, SYNC_INTERVAL);
+        return;
+    }
+    const source = new EventSource('/api/events');
+    // 接続直後（再接続を含む）は切断中の変更を取りこぼさないよう差分を問い合わせる
+    source.addEventListener('hello', sync);
+    source.addEventListener('change', function(e) {
+        const event = JSON.parse(e.data);
+        if (!syncState || event.version > syncState.version) {
+            sync();
+        }
+    });
+    source.addEventListener('resync', reload);
+}
 
 // 月の名前（日本語）
 const monthNames = [
@@ -15,6 +104,7 @@ const monthNames = [
 document.addEventListener('DOMContentLoaded', function() {
     initializeCalendar();
     setupEventListeners();
+    setupChangeSync(syncChanges, reloadCalendar);
 });
 
 // イベントリスナーの設定
@@ -53,32 +143,59 @@ function updateCalendarHeader() {
     document.getElementById('current-month-year').textContent = `${year}年${monthNames[month]}`;
 }
 
-// カレンダーデータの読み込み
+// "YYYY-MM" 形式の月のキー
+function monthKey(date) {
+    return formatDateString(date).slice(0, 7);
+}
+
+// カレンダーデータの読み込み（表示中の月と前後の月の概要をまとめて取得）
 async function loadCalendarData() {
-    const year = currentDate.getFullYear();
-    const month = currentDate.getMonth() + 1; // JavaScriptの月は0から始まるため+1
+    // 読み込み済みの月はすぐに描画し、最新の内容は裏で取得し直す
+    if (calendarSummaries.has(monthKey(currentDate))) {
+        renderCalendar();
+    }
+    const start = new Date(currentDate.getFullYear(), currentDate.getMonth() - PREFETCH_MONTHS, 1);
+    const params = new URLSearchParams({ start: monthKey(start), months: PREFETCH_MONTHS * 2 + 1 });
     
     try {
-        console.log(`Loading calendar data for ${year}/${month}`);
-        const response = await fetch(`/api/calendar/${year}/${month}`);
+        const response = await fetchJsonWithEtag(`/api/calendar/range?${params}`);
         
         if (response.ok) {
-            const data = await response.json();
-            console.log('Calendar data loaded:', data);
-            calendarTodos = data;
-            renderCalendar();
+            for (const [key, days] of Object.entries(response.data)) {
+                calendarSummaries.set(key, days);
+            }
+            syncState = response.version;
         } else {
-            const errorData = await response.json().catch(() => ({}));
-            console.error('Calendar API error:', response.status, errorData);
+            console.error('Calendar API error:', response.status, response.data);
             showNotification(`カレンダーデータの読み込みに失敗しました (${response.status})`, 'error');
-            calendarTodos = {}; // 空のデータで初期化
-            renderCalendar();
         }
     } catch (error) {
         console.error('Error loading calendar data:', error);
         showNotification('カレンダーデータの読み込み中にエラーが発生しました', 'error');
-        calendarTodos = {}; // 空のデータで初期化
-        renderCalendar();
+    }
+    renderCalendar();
+}
+
+// 読み込み済みの月を捨てて取得し直す
+async function reloadCalendar() {
+    calendarSummaries.clear();
+    await loadCalendarData();
+    if (selectedDate) {
+        loadSelectedDateTodos();
+    }
+}
+
+// 前回の同期以降に変更があれば、表示中の月の概要と選択中の日のTODOを取得し直す
+async function syncChanges() {
+    if (!syncState) return;
+    try {
+        const changes = await fetchChanges();
+        if (changes && changes.created.length + changes.updated.length + changes.deleted.length === 0) return;
+        // 変更前の期限日は分からないので、読み込み済みの月はすべて取得し直す
+        // （サーバー側は変更のあった月だけを作り直し、それ以外の月はキャッシュから返す）
+        await reloadCalendar();
+    } catch (error) {
+        console.error('Error syncing calendar data:', error);
     }
 }
 
@@ -127,17 +244,16 @@ function createDayElement(date, currentMonth, today) {
     dayNumber.textContent = date.getDate();
     dayDiv.appendChild(dayNumber);
     
-    // その日のTODOを表示
+    // その日のTODOの概要（先頭の数件のタイトルと件数）を表示
     const dateString = formatDateString(date);
-    const dayTodos = calendarTodos[dateString] || [];
+    const summary = isCurrentMonth ? (calendarSummaries.get(monthKey(date)) || {})[dateString] : null;
     
-    if (dayTodos.length > 0) {
+    if (summary) {
         const todosContainer = document.createElement('div');
         todosContainer.className = 'day-todos';
         
         // 最大3個のTODOを表示
-        const displayTodos = dayTodos.slice(0, 3);
-        displayTodos.forEach(todo => {
+        summary.preview.forEach(todo => {
             const todoItem = document.createElement('div');
             todoItem.className = `day-todo-item ${todo.completed ? 'completed' : ''}`;
             todoItem.textContent = todo.title;
@@ -147,10 +263,10 @@ function createDayElement(date, currentMonth, today) {
         dayDiv.appendChild(todosContainer);
         
         // TODOが3個以上ある場合は数を表示
-        if (dayTodos.length > 3) {
+        if (summary.count > 3) {
             const countBadge = document.createElement('div');
             countBadge.className = 'todo-count';
-            countBadge.textContent = dayTodos.length;
+            countBadge.textContent = summary.count;
             dayDiv.appendChild(countBadge);
         }
     }
@@ -164,14 +280,34 @@ function createDayElement(date, currentMonth, today) {
 // 日付選択
 function selectDate(date) {
     selectedDate = new Date(date);
+    selectedTodos = [];
     renderCalendar(); // カレンダーを再描画して選択状態を更新
-    showSelectedDateTodos(date);
+    loadSelectedDateTodos();
+}
+
+// 選択された日のTODOを全項目で取得して表示（カレンダーには概要しか持たない）
+async function loadSelectedDateTodos() {
+    const dateString = formatDateString(selectedDate);
+    try {
+        const response = await fetchJsonWithEtag(`/api/todos?date=${dateString}`);
+        // 取得中に別の日を選んだ場合は捨てる
+        if (!selectedDate || formatDateString(selectedDate) !== dateString) return;
+        if (response.ok) {
+            // キャッシュした結果を画面側の変更で書き換えないようにコピーして使う
+            selectedTodos = structuredClone(response.data);
+        } else {
+            showNotification('TODOの読み込みに失敗しました', 'error');
+        }
+        showSelectedDateTodos(selectedDate);
+    } catch (error) {
+        console.error('Error loading todos:', error);
+        showNotification('TODOの読み込み中にエラーが発生しました', 'error');
+    }
 }
 
 // 選択された日付のTODO表示
 function showSelectedDateTodos(date) {
-    const dateString = formatDateString(date);
-    const dayTodos = calendarTodos[dateString] || [];
+    const dayTodos = selectedTodos;
     
     // タイトル更新
     const title = document.getElementById('selected-date-title');
@@ -263,16 +399,11 @@ async function addQuickTodo() {
         
         if (response.ok) {
             const newTodo = await response.json();
-            
-            // カレンダーデータを更新
-            if (!calendarTodos[dateString]) {
-                calendarTodos[dateString] = [];
-            }
-            calendarTodos[dateString].push(newTodo);
+            selectedTodos.push(newTodo);
             
             titleInput.value = '';
-            renderCalendar();
             showSelectedDateTodos(selectedDate);
+            loadCalendarData();
             showNotification('TODOを追加しました');
         } else {
             const error = await response.json();
@@ -287,16 +418,7 @@ async function addQuickTodo() {
 // TODOの完了状態を切り替え
 async function toggleTodo(todoId) {
     try {
-        // 現在のTODOを見つける
-        let currentTodo = null;
-        for (const dateKey in calendarTodos) {
-            const todo = calendarTodos[dateKey].find(t => t.id === todoId);
-            if (todo) {
-                currentTodo = todo;
-                break;
-            }
-        }
-        
+        const currentTodo = selectedTodos.find(t => t.id === todoId);
         if (!currentTodo) return;
         
         const response = await fetch(`/api/todos/${todoId}`, {
@@ -311,20 +433,12 @@ async function toggleTodo(todoId) {
         
         if (response.ok) {
             const updatedTodo = await response.json();
+            selectedTodos = selectedTodos.map(t => t.id === todoId ? updatedTodo : t);
             
-            // カレンダーデータを更新
-            for (const dateKey in calendarTodos) {
-                const index = calendarTodos[dateKey].findIndex(t => t.id === todoId);
-                if (index !== -1) {
-                    calendarTodos[dateKey][index] = updatedTodo;
-                    break;
-                }
-            }
-            
-            renderCalendar();
             if (selectedDate) {
                 showSelectedDateTodos(selectedDate);
             }
+            loadCalendarData();
             
             const message = updatedTodo.completed ? 'TODOを完了しました' : 'TODOを未完了にしました';
             showNotification(message);
@@ -339,16 +453,7 @@ async function toggleTodo(todoId) {
 
 // TODOを削除
 async function deleteTodo(todoId) {
-    // 現在のTODOを見つける
-    let currentTodo = null;
-    for (const dateKey in calendarTodos) {
-        const todo = calendarTodos[dateKey].find(t => t.id === todoId);
-        if (todo) {
-            currentTodo = todo;
-            break;
-        }
-    }
-    
+    const currentTodo = selectedTodos.find(t => t.id === todoId);
     if (!currentTodo) return;
     
     if (!confirm(`「${currentTodo.title}」を削除しますか？`)) {
@@ -361,22 +466,12 @@ async function deleteTodo(todoId) {
         });
         
         if (response.ok) {
-            // カレンダーデータから削除
-            for (const dateKey in calendarTodos) {
-                const index = calendarTodos[dateKey].findIndex(t => t.id === todoId);
-                if (index !== -1) {
-                    calendarTodos[dateKey].splice(index, 1);
-                    if (calendarTodos[dateKey].length === 0) {
-                        delete calendarTodos[dateKey];
-                    }
-                    break;
-                }
-            }
+            selectedTodos = selectedTodos.filter(t => t.id !== todoId);
             
-            renderCalendar();
             if (selectedDate) {
                 showSelectedDateTodos(selectedDate);
             }
+            loadCalendarData();
             showNotification('TODOを削除しました');
         } else {
             showNotification('TODOの削除に失敗しました', 'error');
@@ -389,16 +484,7 @@ async function deleteTodo(todoId) {
 
 // 編集モーダルを開く
 function openEditModal(todoId) {
-    // 現在のTODOを見つける
-    let currentTodo = null;
-    for (const dateKey in calendarTodos) {
-        const todo = calendarTodos[dateKey].find(t => t.id === todoId);
-        if (todo) {
-            currentTodo = todo;
-            break;
-        }
-    }
-    
+    const currentTodo = selectedTodos.find(t => t.id === todoId);
     if (!currentTodo) return;
     
     editingTodoId = todoId;
@@ -444,31 +530,15 @@ async function saveEdit() {
         if (response.ok) {
             const updatedTodo = await response.json();
             
-            // 古い日付から削除
-            for (const dateKey in calendarTodos) {
-                const index = calendarTodos[dateKey].findIndex(t => t.id === editingTodoId);
-                if (index !== -1) {
-                    calendarTodos[dateKey].splice(index, 1);
-                    if (calendarTodos[dateKey].length === 0) {
-                        delete calendarTodos[dateKey];
-                    }
-                    break;
-                }
-            }
-            
-            // 新しい日付に追加
-            if (updatedTodo.due_date) {
-                if (!calendarTodos[updatedTodo.due_date]) {
-                    calendarTodos[updatedTodo.due_date] = [];
-                }
-                calendarTodos[updatedTodo.due_date].push(updatedTodo);
-            }
+            // 期限日が選択中の日から変わった場合は一覧から外す
+            const stillSelected = selectedDate && updatedTodo.due_date === formatDateString(selectedDate);
+            selectedTodos = selectedTodos.flatMap(t => t.id !== updatedTodo.id ? [t] : stillSelected ? [updatedTodo] : []);
             
             closeEditModal();
-            renderCalendar();
             if (selectedDate) {
                 showSelectedDateTodos(selectedDate);
             }
+            loadCalendarData();
             showNotification('TODOを更新しました');
         } else {
             const error = await response.json();
@@ -4,9 +4,36 @@ TODOアプリのテストスクリプト
 基本機能の動作確認を行います
 """
 
+import asyncio
 import os
 import json
-from todo import TodoManager, Todo
+import multiprocessing
+import random
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+import bench_suite
+import codec
+import main
+from archive import TodoArchive
+from cache import ResponseCache
+from events import EventBroadcaster, event_stream
+from lists import ListRegistry, valid_list_id
+from metrics import Registry, StoreMetrics
+from search import SearchIndex, query_terms, tokenize
+from todo import DueScheduler, TodoColumns, TodoManager, Todo, WriteBehind, current_timestamp, encode_cursor
+from sqlite_store import SqliteTodoManager, migrate_json_to_sqlite
+
+
+def remove_data_files(data_file):
+    """データファイルと付随ファイル（ジャーナル・ロック・一時ファイル・SQLiteのWAL・アーカイブ）を削除"""
+    for suffix in ("", ".log", ".lock", ".tmp", "-wal", "-shm"):
+        if os.path.exists(data_file + suffix):
+            os.remove(data_file + suffix)
+    shutil.rmtree(data_file + ".archive", ignore_errors=True)
 
 
 def test_todo_manager():
@@ -17,8 +44,7 @@ def test_todo_manager():
     test_file = "test_todos.json"
     
     # 既存のテストファイルを削除
-    if os.path.exists(test_file):
-        os.remove(test_file)
+    remove_data_files(test_file)
     
     # TodoManagerのインスタンスを作成
     manager = TodoManager(test_file)
@@ -110,9 +136,8 @@ def test_todo_manager():
     print("\n✅ すべてのテストが完了しました！")
     
     # テストファイルを削除
-    if os.path.exists(test_file):
-        os.remove(test_file)
-        print(f"🧹 テストファイル（{test_file}）を削除しました")
+    remove_data_files(test_file)
+    print(f"🧹 テストファイル（{test_file}）を削除しました")
 
 
 def test_todo_class():
@@ -137,6 +162,1719 @@ def test_todo_class():
     print("✅ Todoクラステスト完了")
 
 
+def test_journal_mode():
+    """ジャーナルモード（追記ログ＋スナップショット）の動作をテスト"""
+    print("\n🧪 ジャーナルモードのテスト")
+    print("-" * 30)
+    
+    test_file = "test_journal_todos.json"
+    remove_data_files(test_file)
+    
+    manager = TodoManager(test_file, journal=True, compact_threshold=5)
+    manager.add_todo("ログ1")
+    manager.add_todo("ログ2", due_date="2025-01-10")
+    manager.complete_todo(1)
+    manager.update_todo(2, description="更新済み")
+    print(f"📜 ログ件数: {manager.journal.entries}")
+    assert manager.journal.entries == 4
+    manager.close()
+    
+    # スナップショットなしでもログの再生で復元できる
+    manager2 = TodoManager(test_file, journal=True, compact_threshold=5)
+    assert [t.title for t in manager2.get_todos()] == ["ログ1", "ログ2"]
+    assert manager2.get_todo_by_id(1).completed
+    assert manager2.get_todo_by_id(2).description == "更新済み"
+    
+    # しきい値に達するとスナップショットに圧縮される
+    manager2.delete_todo(1)
+    print(f"📜 圧縮後のログ件数: {manager2.journal.entries}")
+    assert manager2.journal.entries == 0
+    manager2.add_todo("ログ3")
+    manager2.close()
+    
+    # スナップショットは従来のJSON形式のまま読める
+    with open(test_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    assert [t["title"] for t in data["todos"]] == ["ログ2"]
+    
+    manager3 = TodoManager(test_file, journal=True)
+    assert [t.title for t in manager3.get_todos()] == ["ログ2", "ログ3"]
+    assert manager3.next_id == 4
+    manager3.close()
+
+    # 書き込み途中でクラッシュした末尾の行は、次の追記の前に切り詰められる
+    remove_data_files(test_file)
+    manager = TodoManager(test_file, journal=True)
+    manager.add_todo("a")
+    manager.add_todo("b")
+    manager.close()
+    with open(test_file + ".log", 'ab') as f:
+        f.write(b'{"op":"add","todo":{"id":3,"ti')
+    manager = TodoManager(test_file, journal=True)
+    manager.add_todo("c")
+    manager.add_todo("d")
+    manager.close()
+    assert [t.title for t in TodoManager(test_file, journal=True).get_todos()] == ["a", "b", "c", "d"]
+
+    # スナップショットを置き換えてからログを空にするまでの間に止まっても、ログを二重に適用しない
+    remove_data_files(test_file)
+    manager = TodoManager(test_file, journal=True)
+    manager.add_todo("a")
+    manager.add_todo("b")
+    manager.compact()
+    manager.complete_todo(1)
+    manager.clear_completed()
+    manager.complete_todo(2)
+
+    def crash(seq=0):
+        raise OSError("ログを空にする前に停止")
+
+    manager.journal.truncate = crash
+    try:
+        manager.compact()
+        assert False, "OSErrorが送出されるべき"
+    except OSError:
+        pass
+    manager.journal.close()
+    reopened = TodoManager(test_file, journal=True)
+    assert [(t.id, t.completed) for t in reopened.get_todos()] == [(2, True)]
+    assert reopened.journal.entries == 0
+    reopened.add_todo("e")
+    reopened.close()
+    assert [t.title for t in TodoManager(test_file, journal=True).get_todos()] == ["b", "e"]
+
+    print("✅ ジャーナルモードテスト完了")
+    
+    remove_data_files(test_file)
+
+
+def test_id_index():
+    """IDインデックスが追加・削除・一括削除の後も一貫していることをテスト"""
+    print("\n🧪 IDインデックスのテスト")
+    print("-" * 30)
+    
+    test_file = "test_index_todos.json"
+    remove_data_files(test_file)
+    
+    manager = TodoManager(test_file)
+    for i in range(5):
+        manager.add_todo(f"TODO {i + 1}")
+    manager.delete_todo(2)
+    manager.complete_todo(4)
+    manager.clear_completed()
+    
+    ids = [todo.id for todo in manager.get_todos()]
+    print(f"📊 残ったID: {ids}")
+    assert ids == [1, 3, 5]
+    assert manager.get_todo_by_id(2) is None
+    assert manager.get_todo_by_id(4) is None
+    assert manager.get_todo_by_id(5).title == "TODO 5"
+    
+    # 読み込み後も順序とインデックスが保たれる
+    manager2 = TodoManager(test_file)
+    assert [todo.id for todo in manager2.get_todos()] == ids
+    assert manager2.get_todo_by_id(3).title == "TODO 3"
+    
+    print("✅ IDインデックステスト完了")
+    
+    remove_data_files(test_file)
+
+
+def test_due_date_index():
+    """期限日インデックスによる日付・月・期間検索をテスト"""
+    print("\n🧪 期限日インデックスのテスト")
+    print("-" * 30)
+    
+    test_file = "test_due_todos.json"
+    remove_data_files(test_file)
+    
+    manager = TodoManager(test_file)
+    manager.add_todo("1月末", due_date="2025-01-31")
+    manager.add_todo("2月頭", due_date="2025-02-01")
+    manager.add_todo("期限なし")
+    manager.add_todo("期限なしその2")
+    manager.add_todo("2月頭その2", due_date="2025-02-01")
+    manager.add_todo("12月", due_date="2025-12-24")
+    
+    february = manager.get_todos_by_month(2025, 2)
+    print(f"📅 2025年2月: {list(february.keys())}")
+    assert [t.title for t in february["2025-02-01"]] == ["2月頭", "2月頭その2"]
+    assert list(manager.get_todos_by_month(2025, 12).keys()) == ["2025-12-24"]
+    assert manager.get_todos_by_month(2025, 13) == {}
+    assert manager.get_todos_by_month(0, 5) == {} and manager.get_todos_by_month(10000, 1) == {}
+    manager.add_todo("最後の日", due_date="9999-12-31")
+    assert list(manager.get_todos_by_month(9999, 12).keys()) == ["9999-12-31"]
+    
+    assert [t.id for t in manager.get_todos_by_date("2025-01-31")] == [1]
+    assert manager.get_todos_by_date("not-a-date") == []
+    
+    # 期限日の変更・完了・削除がインデックスに反映される
+    manager.update_todo(1, due_date="2025-02-01")
+    manager.complete_todo(2)
+    manager.delete_todo(5)
+    assert [t.id for t in manager.get_todos_by_date("2025-02-01")] == [1, 2]
+    assert [t.id for t in manager.get_todos_by_date("2025-02-01", show_completed=False)] == [1]
+    assert manager.get_todos_by_month(2025, 1) == {}
+    
+    in_range = manager.get_todos_by_range("2025-01-01", "2025-12-24")
+    assert [t.id for t in in_range] == [1, 2, 6]
+    
+    # 読み込み時にもインデックスが構築される
+    manager2 = TodoManager(test_file)
+    assert [t.id for t in manager2.get_todos_by_range("2025-02-01", "2025-02-28")] == [1, 2]
+    
+    print("✅ 期限日インデックステスト完了")
+    
+    remove_data_files(test_file)
+
+
+def test_stats_counters():
+    """統計カウンタが各変更で正しく増減することをテスト"""
+    print("\n🧪 統計カウンタのテスト")
+    print("-" * 30)
+    
+    test_file = "test_stats_todos.json"
+    remove_data_files(test_file)
+    
+    today = date.today()
+    yesterday = (today - timedelta(days=1)).isoformat()
+    tomorrow = (today + timedelta(days=1)).isoformat()
+    
+    # debug=True では get_stats のたびに全件の数え直しと照合される
+    manager = TodoManager(test_file, debug=True)
+    manager.add_todo("期限切れ", due_date=yesterday)
+    manager.add_todo("今日まで", due_date=today.isoformat())
+    manager.add_todo("明日まで", due_date=tomorrow)
+    manager.add_todo("期限なし")
+    stats = manager.get_stats()
+    print(f"📊 統計: {stats}")
+    assert stats == {"total": 4, "completed": 0, "pending": 4, "overdue": 1, "due_today": 1}
+    
+    manager.complete_todo(1)
+    manager.update_todo(3, due_date=yesterday)
+    manager.delete_todo(2)
+    assert manager.get_stats() == {"total": 3, "completed": 1, "pending": 2, "overdue": 1, "due_today": 0}
+    
+    manager.uncomplete_todo(1)
+    manager.complete_todo(4)
+    manager.clear_completed()
+    assert manager.get_stats() == {"total": 2, "completed": 0, "pending": 2, "overdue": 2, "due_today": 0}
+    
+    manager2 = TodoManager(test_file, debug=True)
+    assert manager2.get_stats() == manager.get_stats()
+    
+    print("✅ 統計カウンタテスト完了")
+    
+    remove_data_files(test_file)
+
+
+def test_sqlite_backend():
+    """SQLiteバックエンドとJSONからの移行をテスト"""
+    print("\n🧪 SQLiteバックエンドのテスト")
+    print("-" * 30)
+    
+    json_file = "test_sqlite_todos.json"
+    db_file = "test_sqlite_todos.db"
+    
+    def cleanup():
+        remove_data_files(json_file)
+        remove_data_files(db_file)
+    
+    cleanup()
+    
+    json_manager = TodoManager(json_file)
+    json_manager.add_todo("移行1", due_date="2025-03-01")
+    json_manager.add_todo("移行2", "説明", due_date="2025-03-15")
+    json_manager.add_todo("削除される")
+    json_manager.delete_todo(3)
+    json_manager.complete_todo(1)
+    
+    count = migrate_json_to_sqlite(json_file, db_file)
+    print(f"💾 移行件数: {count}")
+    assert count == 2
+    
+    manager = SqliteTodoManager(db_file)
+    assert [t.to_dict() for t in manager.get_todos()] == [t.to_dict() for t in json_manager.get_todos()]
+    assert [t.id for t in manager.get_todos(show_completed=False)] == [2]
+    assert list(manager.get_todos_by_month(2025, 3).keys()) == ["2025-03-01", "2025-03-15"]
+    assert manager.get_todos_by_month(2025, 3, show_completed=False)["2025-03-15"][0].title == "移行2"
+    assert manager.get_todos_by_month(0, 5) == {} and manager.get_todos_by_month(9999, 12) == {}
+    
+    # 削除済みのIDは再利用されない
+    todo = manager.add_todo("新規", due_date="2025-03-15")
+    assert todo.id == 4
+    assert [t.id for t in manager.get_todos_by_date("2025-03-15")] == [2, 4]
+    
+    assert manager.update_todo(4, title="変更後", due_date="2025-04-01")
+    assert manager.get_todo_by_id(4).title == "変更後"
+    assert [t.id for t in manager.get_todos_by_range("2025-03-01", "2025-04-30")] == [1, 2, 4]
+    assert manager.uncomplete_todo(1)
+    assert manager.complete_todo(2)
+    assert manager.get_stats()["completed"] == 1
+    assert manager.clear_completed() == 1
+    assert not manager.delete_todo(2)
+    assert manager.get_stats()["total"] == 2
+    
+    results = manager.apply_batch([{"op": "create", "title": "一括"}, {"op": "complete", "id": 999}])
+    assert [r["ok"] for r in results] == [True, False]
+    assert manager.get_stats()["total"] == 3
+    manager.close()
+    
+    # TODOのあるデータベースには、overwrite を指定したときだけ移行する
+    try:
+        migrate_json_to_sqlite(json_file, db_file)
+        assert False, "ValueError が発生するはず"
+    except ValueError as e:
+        print(f"🚫 拒否: {e}")
+    manager = SqliteTodoManager(db_file)
+    assert manager.get_stats()["total"] == 3
+    manager.close()
+    # 移行元が見つからなければ、overwrite を指定していても何も変更しない
+    try:
+        migrate_json_to_sqlite("test_missing_todos.json", db_file, overwrite=True)
+        assert False, "FileNotFoundError が発生するはず"
+    except FileNotFoundError:
+        pass
+    assert not os.path.exists("test_missing_todos.json.lock")
+    manager = SqliteTodoManager(db_file)
+    assert manager.get_stats()["total"] == 3
+    manager.close()
+    assert migrate_json_to_sqlite(json_file, db_file, overwrite=True) == 2
+    manager = SqliteTodoManager(db_file)
+    assert [t.title for t in manager.get_todos()] == ["移行1", "移行2"]
+    manager.close()
+    
+    print("✅ SQLiteバックエンドテスト完了")
+    cleanup()
+
+
+def test_apply_batch():
+    """バッチ操作がまとめて適用・永続化されることをテスト"""
+    print("\n🧪 バッチ操作のテスト")
+    print("-" * 30)
+    
+    test_file = "test_batch_todos.json"
+    remove_data_files(test_file)
+    
+    manager = TodoManager(test_file, journal=True)
+    manager.add_todo("既存")
+    results = manager.apply_batch([
+        {"op": "create", "title": " 一括1 ", "due_date": "2025-05-01"},
+        {"op": "create", "title": "一括2", "description": "説明"},
+        {"op": "complete", "id": 1},
+        {"op": "update", "id": 2, "title": "一括1（変更）"},
+        {"op": "delete", "id": 3},
+        {"op": "delete", "id": 99},
+    ])
+    print(f"📦 結果: {[r['ok'] for r in results]}")
+    assert [r["ok"] for r in results] == [True, True, True, True, True, False]
+    assert results[0]["todo"]["title"] == "一括1"
+    assert results[3]["todo"]["title"] == "一括1（変更）"
+    # 6件の操作でもジャーナルへの追記は1回（圧縮の判定には操作の件数を数える）
+    with open(manager.journal.path, 'rb') as f:
+        assert len(f.readlines()) == 2
+    assert manager.journal.entries == 6
+    
+    # 不正な操作が含まれる場合は何も適用されない
+    for ops in ([{"op": "create", "title": "OK"}, {"op": "create", "title": ""}],
+                [{"op": "complete", "id": "1"}],
+                [{"op": "unknown"}]):
+        try:
+            manager.apply_batch(ops)
+            assert False, "ValueError が発生するはず"
+        except ValueError as e:
+            print(f"🚫 拒否: {e}")
+    assert [t.title for t in manager.get_todos()] == ["既存", "一括1（変更）"]
+    manager.close()
+    
+    manager2 = TodoManager(test_file, journal=True)
+    assert [t.to_dict() for t in manager2.get_todos()] == [t.to_dict() for t in manager.get_todos()]
+    assert manager2.get_todo_by_id(1).completed
+    manager2.close()
+    
+    # しきい値を超える大きなバッチはスナップショットに直接書き出される
+    manager3 = TodoManager(test_file, journal=True, compact_threshold=100)
+    manager3.apply_batch([{"op": "create", "title": f"大量{i}"} for i in range(150)])
+    assert manager3.journal.entries == 0
+    assert len(TodoManager(test_file).get_todos()) == 152
+    
+    # しきい値より小さいバッチも、ログに溜まった操作の件数がしきい値に達したら圧縮する
+    for i in range(3):
+        manager3.apply_batch([{"op": "create", "title": f"小分け{i}-{j}"} for j in range(40)])
+        assert manager3.journal.entries == [40, 80, 0][i]
+    assert len(TodoManager(test_file).get_todos()) == 272
+    manager3.close()
+    
+    print("✅ バッチ操作テスト完了")
+    remove_data_files(test_file)
+
+
+def test_query_todos():
+    """カーソルによるページ分割と並び替えをテスト"""
+    print("\n🧪 ページ分割・並び替えのテスト")
+    print("-" * 30)
+    
+    test_file = "test_query_todos.json"
+    db_file = "test_query_todos.db"
+    remove_data_files(test_file)
+    remove_data_files(db_file)
+    
+    def collect(manager, sort, limit, show_completed=True):
+        ids, cursor = [], None
+        while True:
+            page, cursor = manager.query_todos(limit, cursor, sort, show_completed)
+            assert len(page) <= limit
+            ids.extend(todo.id for todo in page)
+            if cursor is None:
+                return ids
+    
+    ops = [{"op": "create", "title": f"TODO {i}", "due_date": f"2025-06-{(i * 7) % 28 + 1:02d}" if i % 3 else None}
+           for i in range(20)]
+    ops += [{"op": "complete", "id": i} for i in range(1, 21, 4)]
+    for manager in (TodoManager(test_file), SqliteTodoManager(db_file)):
+        manager.apply_batch(ops)
+        todos = manager.get_todos()
+        
+        assert collect(manager, "id", 3) == [t.id for t in todos]
+        assert collect(manager, "-id", 7) == [t.id for t in reversed(todos)]
+        assert collect(manager, "id", 4, show_completed=False) == [t.id for t in todos if not t.completed]
+        
+        by_due = sorted(todos, key=lambda t: (t.due_date is None, t.due_date or "", t.id))
+        assert collect(manager, "due_date", 5) == [t.id for t in by_due]
+        assert collect(manager, "-due_date", 6) == [t.id for t in reversed(by_due)]
+        
+        # ページの途中で変更されても、カーソルの位置から続きを読める
+        page, cursor = manager.query_todos(5, None, "due_date")
+        manager.delete_todo(by_due[6].id)
+        manager.update_todo(by_due[0].id, due_date="2099-12-31")
+        rest = []
+        while cursor:
+            page, cursor = manager.query_todos(5, cursor, "due_date")
+            rest.extend(todo.id for todo in page)
+        assert by_due[6].id not in rest
+        assert rest[:4] == [by_due[5].id] + [t.id for t in by_due[7:10]]
+        # 後ろに移動したTODOは、期限日のある最後の位置に現れる
+        dated = [t.id for t in by_due if t.due_date]
+        assert rest.index(by_due[0].id) == len(dated) - 6
+        
+        assert manager.query_todos(None)[1] is None
+        forged = [{"cursor": encode_cursor("id", "abc", 1)}, {"cursor": encode_cursor("id", True, 1)},
+                  {"cursor": encode_cursor("due_date", [1], 1), "sort": "due_date"},
+                  {"cursor": encode_cursor("-created_at", 5, 1), "sort": "-created_at"}]
+        for bad in [{"sort": "title"}, {"limit": 0}, {"cursor": "壊れたカーソル"}] + forged:
+            try:
+                manager.query_todos(**bad)
+                assert False, "ValueError が発生するはず"
+            except ValueError:
+                pass
+        manager.close()
+    
+    print("✅ ページ分割・並び替えテスト完了")
+    remove_data_files(test_file)
+    remove_data_files(db_file)
+
+
+def test_versions():
+    """変更のたびにバージョン（ETag用）が進み、影響を受けた月だけが更新されることをテスト"""
+    print("\n🧪 バージョン管理のテスト")
+    print("-" * 30)
+    
+    test_file = "test_version_todos.json"
+    db_file = "test_version_todos.db"
+    remove_data_files(test_file)
+    remove_data_files(db_file)
+    
+    for manager, other in ((TodoManager(test_file), lambda: TodoManager(test_file)),
+                           (SqliteTodoManager(db_file), lambda: SqliteTodoManager(db_file))):
+        version = manager.version
+        manager.add_todo("3月", due_date="2025-03-10")
+        manager.add_todo("期限なし")
+        assert manager.version == version + 2
+        march = manager.get_month_version(2025, 3)
+        assert march > 0 and manager.get_month_version(2025, 4) == 0
+        
+        manager.update_todo(2, title="期限なし（変更）")
+        assert manager.get_month_version(2025, 3) == march
+        
+        # タイトルだけの変更でも、そのTODOの期限日の月は更新される
+        manager.update_todo(1, title="3月（変更）")
+        assert manager.get_month_version(2025, 3) > march
+        march = manager.get_month_version(2025, 3)
+        
+        # 3月から4月へ移動すると両方の月が更新される
+        manager.update_todo(1, due_date="2025-04-01")
+        assert manager.get_month_version(2025, 3) > march
+        assert manager.get_month_version(2025, 4) == manager.get_month_version(2025, 3)
+        
+        manager.complete_todo(1)
+        april = manager.get_month_version(2025, 4)
+        assert manager.clear_completed() == 1
+        assert manager.get_month_version(2025, 4) > april
+        
+        # 他のプロセス（別インスタンス）による変更を取り込むと epoch が変わる
+        epoch = manager.epoch
+        assert not manager.refresh()
+        writer = other()
+        writer.add_todo("別ワーカー")
+        writer.close()
+        assert manager.refresh()
+        assert manager.epoch != epoch
+        print(f"🔖 {type(manager).__name__}: version={manager.version}, epoch={manager.epoch}")
+        manager.close()
+    
+    print("✅ バージョン管理テスト完了")
+    remove_data_files(test_file)
+    remove_data_files(db_file)
+
+
+def test_change_feed():
+    """変更履歴から since より後の差分だけを取得でき、範囲外なら再同期になることをテスト"""
+    print("\n🧪 差分同期のテスト")
+    print("-" * 30)
+    
+    test_file = "test_changes_todos.json"
+    db_file = "test_changes_todos.db"
+    remove_data_files(test_file)
+    remove_data_files(db_file)
+    
+    for manager in (TodoManager(test_file, journal=True, change_feed_size=5),
+                    SqliteTodoManager(db_file, change_feed_size=5)):
+        first = manager.add_todo("最初")
+        since, epoch = manager.version, manager.epoch
+        second = manager.add_todo("作成後に更新")
+        manager.update_todo(second.id, title="更新済み")
+        manager.complete_todo(first.id)
+        
+        changes = manager.get_changes(since, epoch)
+        assert not changes["resync"] and changes["version"] == manager.version
+        assert [todo["title"] for todo in changes["created"]] == ["更新済み"]
+        assert [todo["id"] for todo in changes["updated"]] == [first.id]
+        assert changes["updated"][0]["completed"] and changes["deleted"] == []
+        
+        since_update = manager.version
+        manager.update_todo(first.id, description="説明だけ変更")
+        assert [todo["id"] for todo in manager.get_changes(since_update, epoch)["updated"]] == [first.id]
+        
+        # 作成して削除したものは削除として返す
+        manager.clear_completed()
+        changes = manager.get_changes(since, epoch)
+        assert [todo["id"] for todo in changes["created"]] == [second.id]
+        assert changes["updated"] == [] and changes["deleted"] == [first.id]
+        assert manager.get_changes(manager.version, epoch)["created"] == []
+        
+        # タイトル・説明だけの変更も更新として返す
+        since_edit = manager.version
+        manager.update_todo(second.id, description="説明だけ変更")
+        changes = manager.get_changes(since_edit, epoch)
+        assert [todo["description"] for todo in changes["updated"]] == ["説明だけ変更"]
+        
+        # 履歴からあふれたバージョンや別の epoch は再同期
+        for i in range(5):
+            manager.add_todo(f"追加{i}")
+        assert manager.get_changes(since, epoch)["resync"]
+        assert manager.get_changes(manager.version, "other")["resync"]
+        assert manager.get_changes(manager.version + 1, epoch)["resync"]
+        print(f"🔄 {type(manager).__name__}: version={manager.version}")
+        manager.close()
+    
+    # ジャーナルの追記分だけを取り込んだ場合は epoch を変えずに差分を返す
+    remove_data_files(test_file)
+    manager = TodoManager(test_file, journal=True)
+    manager.add_todo("既存")
+    since, epoch = manager.version, manager.epoch
+    writer = TodoManager(test_file, journal=True)
+    added = writer.add_todo("別ワーカー")
+    writer.delete_todo(1)
+    writer.close()
+    changes = manager.get_changes(since, epoch)
+    assert not changes["resync"] and manager.epoch == epoch
+    assert [todo["id"] for todo in changes["created"]] == [added.id] and changes["deleted"] == [1]
+    manager.close()
+    
+    print("✅ 差分同期テスト完了")
+    remove_data_files(test_file)
+    remove_data_files(db_file)
+
+
+def test_events():
+    """変更イベントの通知・購読者ごとのキューのあふれ・1000接続の待機中のメモリをテスト"""
+    print("\n🧪 変更通知のテスト")
+    print("-" * 30)
+    
+    test_file = "test_events_todos.json"
+    remove_data_files(test_file)
+    
+    manager = TodoManager(test_file, journal=True)
+    events = []
+    manager.add_listener(events.append)
+    todo = manager.add_todo("通知")
+    manager.complete_todo(todo.id)
+    manager.delete_todo(todo.id)
+    assert [event.get("created") or event.get("updated") or event.get("deleted") for event in events] == [[1]] * 3
+    assert [event["version"] for event in events] == [manager.version - 2, manager.version - 1, manager.version]
+    
+    # apply_batch は1つのイベントにまとめる
+    events.clear()
+    manager.apply_batch([{"op": "create", "title": f"一括{i}"} for i in range(3)] + [{"op": "complete", "id": 2}])
+    assert len(events) == 1 and events[0]["created"] == [2, 3, 4] and events[0]["updated"] == [2]
+    assert events[0]["version"] == manager.version
+    
+    # 受信が追いつかない購読者にはキューを捨てて resync を1つだけ返す
+    broadcaster = EventBroadcaster(maxsize=2)
+    slow = broadcaster.subscribe()
+    for version in range(5):
+        broadcaster.publish({"type": "change", "version": version})
+    assert slow.get(0) == {"type": "resync"} and slow.get(0) is None
+    broadcaster.unsubscribe(slow)
+    
+    # 他のプロセスの変更はハートビートで取り込んで配信する
+    def hello():
+        return {"type": "hello", "epoch": manager.epoch, "version": manager.version}
+    
+    manager.add_listener(broadcaster.publish)
+    stream = event_stream(broadcaster, hello, heartbeat=0.01, on_idle=manager.refresh)
+    assert next(stream).startswith("retry: 3000\nevent: hello\n")
+    writer = TodoManager(test_file, journal=True)
+    writer.add_todo("別プロセス")
+    writer.close()
+    assert next(stream).startswith('event: change\ndata: {"epoch"')
+    stream.close()
+    assert len(broadcaster) == 0
+    
+    # 1000件の待機中の接続で、1接続あたりのメモリを計測
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    streams = [event_stream(broadcaster, hello, heartbeat=60) for _ in range(1000)]
+    for stream in streams:
+        next(stream)
+    per_connection = (tracemalloc.get_traced_memory()[0] - before) / len(streams)
+    tracemalloc.stop()
+    print(f"📡 待機中の接続 {len(broadcaster)}件: 1接続あたり約{per_connection:.0f}バイト")
+    assert len(broadcaster) == 1000 and per_connection < 4096
+    
+    manager.add_todo("全員に通知")
+    assert all(next(stream).startswith("event: change") for stream in streams)
+    for stream in streams:
+        stream.close()
+    assert len(broadcaster) == 0
+    manager.close()
+    
+    print("✅ 変更通知テスト完了")
+    remove_data_files(test_file)
+
+
+def test_columnar_store():
+    """__slots__ の Todo と列ストア（columnar=True）が辞書のストアと同じ結果を返すことをテスト"""
+    print("\n🧪 列ストアのテスト")
+    print("-" * 30)
+    
+    todo = Todo(1, "スロット")
+    assert not hasattr(todo, "__dict__")
+    # 同じ秒に作成したTODOは作成日時の文字列を共有する（秒をまたいだらやり直す）
+    for _ in range(3):
+        now = int(time.time())
+        first, second = Todo(2, "同じ秒1"), Todo(3, "同じ秒2")
+        if int(time.time()) == now:
+            assert first.created_at is second.created_at
+            break
+    else:
+        assert False, "同じ秒の間にTODOを作成できませんでした"
+    assert len(todo.created_at) == len("2025-01-01 00:00:00")
+    
+    files = {False: "test_rows_todos.json", True: "test_columns_todos.json"}
+    managers = {}
+    for columnar, test_file in files.items():
+        remove_data_files(test_file)
+        manager = TodoManager(test_file, journal=True, columnar=columnar)
+        for i in range(30):
+            manager.add_todo(f"TODO {i}", "説明" if i % 4 else "", f"2025-03-{i % 28 + 1:02d}" if i % 3 else None)
+        for todo_id in range(1, 31, 2):
+            manager.complete_todo(todo_id)
+        manager.update_todo(2, title="変更", due_date="2025-04-01")
+        manager.uncomplete_todo(3)
+        for todo_id in range(4, 20, 3):
+            manager.delete_todo(todo_id)
+        managers[columnar] = manager
+    
+    rows, columns = managers[False], managers[True]
+    assert isinstance(columns._todos, TodoColumns) and len(columns._todos) == len(rows._todos)
+    assert [t.to_dict() for t in columns.get_todos()] == [t.to_dict() for t in rows.get_todos()]
+    assert columns.recount_stats() == rows.recount_stats() == columns.get_stats()
+    assert ({day: [t.id for t in todos] for day, todos in columns.get_todos_by_month(2025, 3).items()} ==
+            {day: [t.id for t in todos] for day, todos in rows.get_todos_by_month(2025, 3).items()})
+    assert columns.clear_completed() == rows.clear_completed()
+    assert [t.to_dict() for t in columns.get_todos()] == [t.to_dict() for t in rows.get_todos()]
+    # 削除済みの行は半分を超えると詰め直される
+    assert len(columns._todos._ids) < 30
+    
+    # ジャーナルの再生とスナップショットからの読み込みでも同じ内容になる
+    expected = [t.to_dict() for t in rows.get_todos()]
+    columns.close()
+    reopened = TodoManager(files[True], journal=True, columnar=True)
+    assert [t.to_dict() for t in reopened.get_todos()] == expected
+    reopened.compact()
+    reopened.close()
+    reopened = TodoManager(files[True], columnar=True)
+    assert [t.to_dict() for t in reopened.get_todos()] == expected
+    print(f"🧱 列ストア: {len(reopened.get_todos())}件、文字列プール {len(reopened._todos._pool)}種類")
+    reopened.close()
+    rows.close()
+    
+    print("✅ 列ストアテスト完了")
+    for test_file in files.values():
+        remove_data_files(test_file)
+
+
+def test_codec():
+    """JSONコーデック（orjson・標準ライブラリ）とTODOごとのエンコード結果のキャッシュをテスト"""
+    print("\n🧪 JSONコーデックのテスト")
+    print("-" * 30)
+    
+    test_file = "test_codec_todos.json"
+    remove_data_files(test_file)
+    
+    value = {"title": "日本語 \"引用\"", "ids": [1, 2], "done": False, "due": None}
+    fast = codec.orjson
+    try:
+        for module in (fast, None):
+            codec.orjson = module
+            assert codec.loads(codec.dumps(value)) == value
+            assert b" " not in codec.dumps({"a": [1, 2]})
+            chunks = list(codec.iter_array((codec.dumps(i) for i in range(1000)), chunk_size=100))
+            assert len(chunks) > 1 and codec.loads(b"".join(chunks)) == list(range(1000))
+            assert codec.loads(b"".join(codec.iter_array([]))) == []
+    finally:
+        codec.orjson = fast
+    print(f"⚡ orjson: {'あり' if fast else 'なし（標準の json を使用）'}")
+    
+    manager = TodoManager(test_file)
+    todo = manager.add_todo("キャッシュ", due_date="2025-05-01")
+    encoded = todo.to_json()
+    assert todo.to_json() is encoded and codec.loads(encoded) == todo.to_dict()
+    assert codec.loads(todo.to_json(["id", "title"])) == {"id": todo.id, "title": "キャッシュ"}
+    
+    # 変更するとキャッシュは作り直される
+    manager.update_todo(todo.id, title="変更済み")
+    assert codec.loads(todo.to_json())["title"] == "変更済み"
+    manager.complete_todo(todo.id)
+    assert codec.loads(todo.to_json())["completed"] is True
+    
+    # エンコード中に変更されたら、古い結果をキャッシュしない
+    dumps = codec.dumps
+    def racing_dumps(value):
+        codec.dumps = dumps
+        encoded = dumps(value)
+        manager.update_todo(todo.id, title="エンコード中に変更")
+        return encoded
+    todo.invalidate()
+    codec.dumps = racing_dumps
+    try:
+        stale = todo.to_json()
+    finally:
+        codec.dumps = dumps
+    assert codec.loads(stale)["title"] == "変更済み"
+    assert codec.loads(todo.to_json())["title"] == "エンコード中に変更"
+    
+    # 保存するファイルは整形なしのJSON
+    with open(test_file, 'rb') as f:
+        saved = f.read()
+    assert b"\n" not in saved and codec.loads(saved)["todos"] == [todo.to_dict()]
+    assert TodoManager(test_file).get_todo_by_id(todo.id).to_dict() == todo.to_dict()
+    manager.close()
+    
+    print("✅ JSONコーデックテスト完了")
+    remove_data_files(test_file)
+
+
+def test_streaming_load():
+    """ファイルを少しずつ読み込むローダーと、バックグラウンドでの読み込み中の応答をテスト"""
+    print("\n🧪 ストリーミング読み込みのテスト")
+    print("-" * 30)
+    
+    test_file = "test_stream_todos.json"
+    remove_data_files(test_file)
+    
+    # 以前の形式（indent=2）のファイルも読み込める
+    todos = [Todo(i, f"読み込み{i}", "説明" * (i % 3), i % 2 == 0, "2025-01-01 00:00:00",
+                  f"2025-02-{i % 28 + 1:02d}" if i % 4 else None).to_dict() for i in range(1, 101)]
+    with open(test_file, 'w', encoding='utf-8') as f:
+        json.dump({"todos": todos, "next_id": 150}, f, ensure_ascii=False, indent=2)
+    manager = TodoManager(test_file)
+    assert [todo.to_dict() for todo in manager.get_todos()] == todos and manager.next_id == 150
+    assert manager.get_stats() == manager.recount_stats()
+    assert len(manager.get_todos_by_range("2025-02-01", "2025-02-28")) == 75
+    manager.close()
+    
+    # 読み込みを途中で止め、読み込み済みの範囲だけで応答できることを確かめる
+    gate = threading.Event()
+    
+    class PausedLoader(TodoManager):
+        LOAD_BATCH = 10
+        
+        def _load_batch(self, batch, progress):
+            super()._load_batch(batch, progress)
+            if progress is not None and batch:
+                gate.wait()
+    
+    manager = PausedLoader(test_file, background_load=True)
+    page, cursor = manager.query_todos(5)
+    assert [todo.id for todo in page] == [1, 2, 3, 4, 5] and cursor
+    assert manager.get_todo_by_id(7).title == "読み込み7"
+    assert manager._loading is not None
+    
+    # 全件が必要な操作は読み込みが終わるまで待つ
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(manager.get_stats()))
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive() and not results
+    gate.set()
+    waiter.join()
+    assert results[0]["total"] == 100 and manager._loading is None
+    assert manager.query_todos(5, sort="-id")[0][0].id == 100
+    added = manager.add_todo("読み込み後に追加")
+    assert added.id == 150
+    manager.close()
+    
+    # 読み込みに失敗したら、途中までのTODOで応答も保存もせず、次の操作で読み直す
+    with open(test_file, 'rb') as f:
+        saved = f.read()
+    with open(test_file, 'w', encoding='utf-8') as f:
+        f.write('{"todos": [{"id": 1, "title": "読み込み1"}, {"id": 2}], "next_id": 3}')
+    broken = open(test_file, 'rb').read()
+    manager = TodoManager(test_file, background_load=True)
+    manager.wait_loaded()
+    for operation in (manager.get_todos, lambda: manager.get_todo_by_id(1), lambda: manager.add_todo("失敗後に追加")):
+        try:
+            operation()
+            assert False, "読み込みの失敗が無視されました"
+        except KeyError:
+            pass
+    assert open(test_file, 'rb').read() == broken
+    with open(test_file, 'wb') as f:
+        f.write(saved)
+    assert len(manager.get_todos()) == 101
+    manager.close()
+    
+    # ジャーナルモードでも、スナップショットより後の更新・完了をバックグラウンドで再生できる
+    journal_file = "test_streaming_journal_todos.json"
+    remove_data_files(journal_file)
+    manager = TodoManager(journal_file, journal=True)
+    for title in ("a", "b", "c"):
+        manager.add_todo(title)
+    manager.compact()
+    manager.add_todo("d")
+    manager.update_todo(4, title="D")
+    manager.complete_todo(4)
+    manager.complete_todo(2)
+    manager.close()
+    manager = TodoManager(journal_file, journal=True, background_load=True)
+    assert [(t.title, t.completed) for t in manager.get_todos()] == [("a", False), ("b", True), ("c", False), ("D", True)]
+    assert manager._load_error is None
+    manager.close()
+    remove_data_files(journal_file)
+    
+    # 壊れたファイルは空として扱う
+    with open(test_file, 'w', encoding='utf-8') as f:
+        f.write('{"todos": [{"id": 1, "title": "途中')
+    assert TodoManager(test_file).get_todos() == []
+    
+    print("✅ ストリーミング読み込みテスト完了")
+    remove_data_files(test_file)
+
+
+def test_search():
+    """全文検索（日本語の2-gram・英単語・前方一致・関連度順）とインデックスの更新をテスト"""
+    print("\n🧪 全文検索のテスト")
+    print("-" * 30)
+    
+    assert tokenize("会議の資料 Buy ＭＩＬＫ") == {"会議", "議の", "の資", "資料", "料", "buy", "milk"}
+    assert query_terms("会議 mil") == [("会議", False), ("mil", True)]
+    assert query_terms("milk ") == [("milk", False)]
+    
+    files = {"json": "test_search_todos.json", "columnar": "test_search_columns.json",
+             "sqlite": "test_search_todos.db"}
+    for kind, test_file in files.items():
+        remove_data_files(test_file)
+        if kind == "sqlite":
+            manager = SqliteTodoManager(test_file)
+        else:
+            manager = TodoManager(test_file, journal=True, columnar=(kind == "columnar"))
+        meeting = manager.add_todo("会議の資料を準備", "月曜の定例")
+        milk = manager.add_todo("牛乳を買う", "Buy milk")
+        shake = manager.add_todo("Milkshake recipe")
+        manager.add_todo("定例会議の議事録", "")
+        
+        def titles(query, **kwargs):
+            return [todo.title for todo in manager.search(query, **kwargs)]
+        
+        assert titles("資料") == ["会議の資料を準備"]
+        assert titles("xyz") == [] and titles("") == []
+        assert set(titles("milk")) == {"牛乳を買う", "Milkshake recipe"}
+        assert titles("recipe mil") == ["Milkshake recipe"]
+        # タイトルに一致したものが説明だけに一致したものより上位になる
+        assert titles("定例") == ["定例会議の議事録", "会議の資料を準備"]
+        assert titles("会議", limit=1) == ["定例会議の議事録"]
+        
+        # 完了・変更・削除がすぐに検索結果に反映される
+        manager.complete_todo(milk.id)
+        assert titles("milk", show_completed=False) == ["Milkshake recipe"]
+        manager.update_todo(meeting.id, title="打ち合わせの準備")
+        assert titles("資料") == [] and titles("打ち合わせ") == ["打ち合わせの準備"]
+        manager.delete_todo(shake.id)
+        assert titles("recipe") == []
+        manager.clear_completed()
+        assert titles("milk") == []
+        manager.add_todo("Milk tea")
+        assert titles("milk") == ["Milk tea"]
+        manager.close()
+        print(f"🔍 {kind}: OK")
+    
+    # 日本語の1文字・入力途中の英単語は前方一致で探す（メモリ上のインデックス）
+    manager = TodoManager(files["json"], journal=True)
+    assert [t.title for t in manager.search("議")] == ["定例会議の議事録"]
+    assert [t.title for t in manager.search("mil")] == ["Milk tea"]
+    manager.close()
+    
+    # 候補が多いときの打ち切り（スコアの高い組み合わせから新しい順）は全件のスコア計算と同じ結果になる
+    index = SearchIndex()
+    index.build((i, f"report {'budget' if i % 3 else 'review'} #{i}", "budget" if i % 5 == 0 else "")
+                for i in range(1, 5001))
+    for query in ["budget", "report bud", "review", "report budget"]:
+        assert index.search(query, limit=20) == index.search(query, limit=None)[:20], query
+        even = lambda todo_id: todo_id % 2 == 0
+        assert index.search(query, 20, even) == index.search(query, None, even)[:20], query
+    
+    print("✅ 全文検索テスト完了")
+    for test_file in files.values():
+        remove_data_files(test_file)
+
+
+def test_response_cache():
+    """レスポンスキャッシュ（バイト数によるLRU・バージョンとタグによる無効化）と、変更イベントの月をテスト"""
+    print("\n🧪 レスポンスキャッシュのテスト")
+    print("-" * 30)
+    
+    cache = ResponseCache(max_bytes=10)
+    cache.put("a", 1, b"aaaa", tag="2025-03")
+    cache.put("b", 1, b"bbbb", tag="2025-04")
+    assert cache.get("a", 1) == b"aaaa"
+    # 上限を超えると最も使われていない b が追い出される
+    cache.put("c", 1, b"cccc", tag="2025-03")
+    assert cache.get("b", 1) is None and len(cache) == 2
+    # 上限より大きい本文は保持しない
+    cache.put("d", 1, b"d" * 11)
+    assert cache.get("d", 1) is None
+    # バージョンが変わったエントリは古いものとして捨てる
+    assert cache.get("a", 2) is None and cache.get("a", 1) is None
+    cache.put("a", 2, b"aa", tag="2025-03")
+    cache.invalidate("2025-03")
+    assert len(cache) == 0
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["invalidations"]) == (1, 4, 1, 3)
+    assert stats["bytes"] == 0 and stats["max_bytes"] == 10
+    
+    # 変更イベントには変更前・変更後の期限日の月が含まれる（バッチはまとめて1回）
+    test_file = "test_cache_todos.json"
+    remove_data_files(test_file)
+    manager = TodoManager(test_file, journal=True)
+    events = []
+    manager.add_listener(events.append)
+    todo = manager.add_todo("月をまたぐ", due_date="2025-03-31")
+    manager.update_todo(todo.id, due_date="2025-04-01")
+    manager.update_todo(todo.id, title="期限日は変えない")
+    manager.apply_batch([{"op": "create", "title": "一括", "due_date": "2025-06-01"},
+                         {"op": "update", "id": todo.id, "due_date": "2025-05-01"}])
+    assert [event.get("months") for event in events] == [
+        ["2025-03"], ["2025-03", "2025-04"], ["2025-04"], ["2025-04", "2025-05", "2025-06"]]
+    manager.close()
+    
+    print("✅ レスポンスキャッシュテスト完了")
+    remove_data_files(test_file)
+
+
+def test_month_summary():
+    """カレンダー用の月の概要（日ごとの件数と先頭のTODO）をテスト"""
+    print("\n🧪 月の概要のテスト")
+    print("-" * 30)
+    
+    files = ["test_summary_todos.json", "test_summary_todos.db"]
+    for test_file in files:
+        remove_data_files(test_file)
+        manager = SqliteTodoManager(test_file) if test_file.endswith(".db") else TodoManager(test_file)
+        for i in range(5):
+            manager.add_todo(f"5日 {i}", "説明", "2025-03-05")
+        manager.add_todo("20日", "", "2025-03-20")
+        manager.add_todo("翌月", "", "2025-04-01")
+        manager.complete_todo(2)
+        
+        summary = manager.get_month_summary(2025, 3)
+        assert set(summary) == {"2025-03-05", "2025-03-20"}
+        day = summary["2025-03-05"]
+        assert day["count"] == 5 and day["completed"] == 1
+        assert day["preview"] == [{"id": 1, "title": "5日 0", "completed": False},
+                                  {"id": 2, "title": "5日 1", "completed": True},
+                                  {"id": 3, "title": "5日 2", "completed": False}]
+        assert manager.get_month_summary(2025, 3, show_completed=False)["2025-03-05"]["count"] == 4
+        assert manager.get_month_summary(2025, 5) == {}
+        manager.close()
+        print(f"📅 {type(manager).__name__}: OK")
+    
+    print("✅ 月の概要テスト完了")
+    for test_file in files:
+        remove_data_files(test_file)
+
+
+def test_metrics():
+    """メトリクス（ヒストグラム・テキスト形式の出力・no-op モード）と TodoManager の計測をテスト"""
+    print("\n🧪 メトリクスのテスト")
+    print("-" * 30)
+    
+    registry = Registry()
+    latency = registry.histogram("test_seconds", "テスト", ["route"], buckets=(0.1, 1.0))
+    latency.observe(0.05, "/a")
+    latency.observe(0.5, "/a")
+    latency.observe(5.0, "/a")
+    registry.callback("test_items", "件数", lambda: {('x "y"',): 3}, ["name"])
+    lines = registry.render().splitlines()
+    assert "# TYPE test_seconds histogram" in lines
+    assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{route="/a"} 5.55' in lines
+    assert 'test_seconds_count{route="/a"} 3' in lines
+    # ラベルの値の引用符はエスケープする
+    assert 'test_items{name="x \\"y\\""} 3' in lines
+    
+    # no-op モードでは何も登録・記録しない
+    disabled = Registry(enabled=False)
+    disabled.histogram("test_seconds", "テスト").observe(1.0)
+    assert disabled.render() == ""
+    
+    test_file = "test_metrics_todos.json"
+    remove_data_files(test_file)
+    for journal in (False, True):
+        registry = Registry()
+        manager = TodoManager(test_file, journal=journal)
+        manager.metrics = StoreMetrics(registry)
+        todo = manager.add_todo("計測")
+        manager.complete_todo(todo.id)
+        manager.get_todos()
+        text = registry.render()
+        for operation in ("add_todo", "complete_todo", "get_todos"):
+            assert f'todo_operation_seconds_count{{operation="{operation}"}} 1' in text
+        assert 'todo_lock_wait_seconds_count{mode="write"} 2' in text
+        kind = "journal" if journal else "snapshot"
+        assert f'todo_write_bytes_count{{kind="{kind}"}} 2' in text
+        manager.close()
+        remove_data_files(test_file)
+    
+    print("✅ メトリクステスト完了")
+
+
+def test_bench_suite():
+    """ベンチマークスイート（合成データ・全メソッドの計測・基準との比較）をテスト"""
+    print("\n🧪 ベンチマークスイートのテスト")
+    print("-" * 30)
+    
+    test_file = "test_bench_todos.json"
+    remove_data_files(test_file)
+    today = date(2026, 1, 15)
+    bench_suite.write_dataset(test_file, 400, today)
+    with open(test_file, 'rb') as f:
+        todos = codec.loads(f.read())["todos"]
+    assert [todo["id"] for todo in todos] == list(range(1, 401))
+    # 期限日は今日の前後に集中し、期限なしのTODOも含まれる
+    offsets = [(date.fromisoformat(todo["due_date"]) - today).days for todo in todos if todo["due_date"]]
+    assert 0 < len(offsets) < 400 and min(offsets) < 0 and sum(1 for offset in offsets if abs(offset) <= 30) > 200
+    
+    manager = TodoManager(test_file, journal=True)
+    cases = bench_suite.manager_cases(manager, 400, today)
+    # リスナーの登録などを除く TodoManager の公開メソッドをすべて計測する
+    methods = {name for name in dir(TodoManager) if not name.startswith("_") and callable(getattr(TodoManager, name))}
+    results = bench_suite.run_cases(cases, 400, budget=0, verbose=False)
+    manager.close()
+    manager = TodoManager(test_file, write_behind=3600)
+    cases += bench_suite.write_behind_cases(manager, today)
+    measured = {name.split(".")[1].split("[")[0] for name, _, _ in cases}
+    assert measured == methods - bench_suite.EXCLUDED_METHODS
+    results += bench_suite.run_cases(cases[-2:], 400, budget=0, verbose=False)
+    manager.close()
+    assert all(result["runs"] >= 1 and result["median_us"] > 0 for result in results)
+    
+    # 基準と比較し、割合と差の下限の両方を超えたものだけを遅くなったとみなす
+    baseline = {"results": [{"size": 400, "name": "a", "median_us": 100.0},
+                            {"size": 400, "name": "b", "median_us": 1.0}]}
+    current = {"results": [{"size": 400, "name": "a", "median_us": 150.0},
+                           {"size": 400, "name": "b", "median_us": 3.0},
+                           {"size": 400, "name": "c", "median_us": 999.0}]}
+    regressions = bench_suite.compare(current, baseline, threshold=0.25, min_delta_us=10)
+    assert [(regression["name"], regression["ratio"]) for regression in regressions] == [("a", 1.5)]
+    assert bench_suite.compare(current, baseline, threshold=0.6, min_delta_us=10) == []
+    
+    print("✅ ベンチマークスイートテスト完了")
+    remove_data_files(test_file)
+
+
+def test_write_behind():
+    """write_behind（変更をまとめてバックグラウンドで保存）と、保存の原子性をテスト"""
+    print("\n🧪 write_behindのテスト")
+    print("-" * 30)
+    
+    test_file = "test_write_behind_todos.json"
+    remove_data_files(test_file)
+    try:
+        TodoManager(test_file, journal=True, write_behind=1.0)
+        assert False, "ジャーナルモードとは同時に指定できない"
+    except ValueError:
+        pass
+    
+    registry = Registry()
+    manager = TodoManager(test_file, write_behind=3600)
+    manager.metrics = StoreMetrics(registry)
+    for i in range(20):
+        manager.add_todo(f"遅延 {i}")
+    # 待ち時間の間はファイルに書き込まない
+    assert not os.path.exists(test_file)
+    assert manager.get_stats()["total"] == 20
+    manager.flush()
+    assert 'todo_write_bytes_count{kind="snapshot"} 1' in registry.render()
+    # バッチは失敗時に読み直せるよう、それより前の変更を先に保存してから適用する
+    manager.update_todo(3, title="バッチの前")
+    manager.apply_batch([{"op": "complete", "id": 1}])
+    assert TodoManager(test_file).get_todo_by_id(3).title == "バッチの前"
+    manager.flush()
+    assert TodoManager(test_file).get_stats() == manager.get_stats()
+    # 保存していない変更は終了時に書き出す
+    manager.delete_todo(2)
+    manager.close()
+    assert len(TodoManager(test_file).get_todos()) == 19
+    
+    # 短い待ち時間では、続けて行った変更をまとめて保存する
+    registry = Registry()
+    manager = TodoManager(test_file, write_behind=0.2)
+    manager.metrics = StoreMetrics(registry)
+    for i in range(30):
+        manager.add_todo(f"まとめて {i}")
+    for _ in range(100):
+        if 'todo_write_bytes_count{kind="snapshot"}' in registry.render():
+            break
+        threading.Event().wait(0.05)
+    assert 'todo_write_bytes_count{kind="snapshot"} 1' in registry.render()
+    assert len(TodoManager(test_file).get_todos()) == 49
+    manager.close()
+    
+    # 書き込みの途中で失敗しても、元のファイルは壊れない
+    class FailingManager(TodoManager):
+        def _write_snapshot(self, f):
+            f.write(b'{"todos":[')
+            raise OSError("ディスクがいっぱいです")
+    
+    failing = FailingManager(test_file)
+    try:
+        failing.add_todo("保存できない")
+        assert False, "保存の失敗は呼び出し側に伝わる"
+    except OSError:
+        pass
+    failing.close()
+    assert len(TodoManager(test_file).get_todos()) == 49
+    
+    # 想定外の例外で保存に失敗しても、保存のスレッドは止まらずにやり直す
+    attempts = []
+    saved = threading.Event()
+    def flaky_save():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("想定外のエラー")
+        saved.set()
+    writer = WriteBehind(flaky_save, 0.05)
+    writer.notify()
+    assert saved.wait(5) and len(attempts) == 2 and writer._thread.is_alive()
+    writer.close()
+    
+    print("✅ write_behindテスト完了")
+    remove_data_files(test_file)
+
+
+def test_list_registry():
+    """複数リストのレジストリ（必要なときに開く・推定メモリによるLRU・使用中のリストは閉じない）をテスト"""
+    print("\n🧪 複数リストのテスト")
+    print("-" * 30)
+    
+    assert valid_list_id("work-2025_a") and not valid_list_id("../todos") and not valid_list_id("a.b")
+    assert not valid_list_id("") and not valid_list_id("x" * 65)
+    
+    paths = [f"test_list_{name}.json" for name in ("a", "b", "c")]
+    for path in paths:
+        remove_data_files(path)
+    opened = []
+    
+    def open_list(list_id):
+        opened.append(list_id)
+        return TodoManager(f"test_list_{list_id}.json", write_behind=3600)
+    
+    # 1リストあたり 100 + 件数 × 10 バイトと見積もり、上限は250バイト
+    lists = ListRegistry(open_list, max_bytes=250, bytes_per_todo=10, base_bytes=100)
+    with lists.using("a") as manager:
+        manager.add_todo("Aのタスク")
+    with lists.using("b") as manager:
+        manager.add_todo("Bのタスク")
+    assert opened == ["a", "b"] and len(lists) == 2 and lists.stats()["bytes"] == 220
+    # 開いているリストはそのまま使う
+    with lists.using("a") as manager:
+        assert [todo.title for todo in manager.get_todos()] == ["Aのタスク"]
+    assert opened == ["a", "b"]
+    
+    # 上限を超えると使われていない b を閉じる（保存を遅らせていた変更も書き出す）
+    manager_a = lists.acquire("a")
+    with lists.using("c") as manager:
+        manager.add_todo("Cのタスク")
+    assert "b" not in lists and "a" in lists and lists.stats()["evictions"] == 1
+    assert [todo.title for todo in TodoManager(paths[1]).get_todos()] == ["Bのタスク"]
+    # 使用中の a は上限を超えていても閉じない
+    with lists.using("b") as manager:
+        assert [todo.title for todo in manager.get_todos()] == ["Bのタスク"]
+    assert "a" in lists and "c" not in lists
+    lists.release("a")
+    assert manager_a.get_stats()["total"] == 1
+    
+    # 開くのに失敗したリストは残さない
+    failing = ListRegistry(lambda list_id: 1 / 0, max_bytes=250)
+    try:
+        failing.acquire("x")
+        assert False, "開くときの例外は呼び出し側に伝わる"
+    except ZeroDivisionError:
+        pass
+    assert len(failing) == 0
+    
+    lists.close()
+    assert len(lists) == 0
+    print("✅ 複数リストテスト完了")
+    for path in paths:
+        remove_data_files(path)
+
+
+def test_archive():
+    """完了済みTODOのアーカイブ（圧縮セグメントへの移動・索引での取得・取り出し）をテスト"""
+    print("\n🧪 アーカイブのテスト")
+    print("-" * 30)
+    
+    test_file = "test_archive_todos.json"
+    remove_data_files(test_file)
+    # 完了日時のない古いTODOは作成日時で判断する
+    todos = [
+        {"id": 1, "title": "古い会議の資料", "completed": True, "created_at": "2025-01-10 09:00:00",
+         "due_date": "2025-01-12"},
+        {"id": 2, "title": "古い買い物", "completed": True, "created_at": "2025-01-20 09:00:00",
+         "completed_at": "2025-02-03 10:00:00"},
+        {"id": 3, "title": "未完了の会議", "completed": False, "created_at": "2025-01-10 09:00:00"},
+        {"id": 4, "title": "最近完了した会議", "completed": True, "created_at": "2025-01-10 09:00:00",
+         "completed_at": current_timestamp()},
+    ]
+    with open(test_file, 'w', encoding='utf-8') as f:
+        json.dump({"todos": todos, "next_id": 5}, f, ensure_ascii=False)
+    
+    for columnar in (False, True):
+        remove_data_files(test_file + ".log")
+        shutil.rmtree(test_file + ".archive", ignore_errors=True)
+        manager = TodoManager(test_file, journal=True, columnar=columnar)
+        events = []
+        manager.add_listener(events.append)
+        try:
+            manager.archive_completed(-1)
+            assert False, "負の日数はエラー"
+        except ValueError:
+            pass
+        assert manager.archive_completed(30) == 2
+        assert [todo.id for todo in manager.get_todos()] == [3, 4]
+        assert manager.get_stats()["completed"] == 1
+        assert events[-1]["deleted"] == [1, 2] and "2025-01" in events[-1]["months"]
+        assert manager.search("会議") and 1 not in [todo.id for todo in manager.search("会議")]
+        print(f"🗄️  アーカイブ（columnar={columnar}）: {manager.get_archive_stats()}")
+        # 完了月ごとのセグメントに分かれる
+        assert manager.get_archive_stats()["segments"] == 2
+        assert sorted(os.listdir(test_file + ".archive")) == ["2025-01.ndjson.gz", "2025-02.ndjson.gz",
+                                                              "index.ndjson"]
+        assert manager.get_archived(1).title == "古い会議の資料" and manager.get_archived(3) is None
+        assert [todo.id for todo in manager.iter_archived()] == [1, 2]
+        assert [todo.id for todo in manager.search_archived("会議")] == [1]
+        assert [todo.id for todo in manager.search_archived("買")] == [2]
+        
+        # 読み直してもアーカイブしたTODOはメモリに戻らない（ジャーナルの再生）
+        reopened = TodoManager(test_file, journal=True, columnar=columnar)
+        assert [todo.id for todo in reopened.get_todos()] == [3, 4]
+        # 別のインスタンスで戻すと、索引の追記分を読み足す
+        restored = reopened.unarchive(2)
+        assert restored.completed_at == "2025-02-03 10:00:00" and reopened.unarchive(2) is None
+        reopened.close()
+        assert manager.get_archived(2) is None and [todo.id for todo in manager.iter_archived()] == [1]
+        assert sorted(todo.id for todo in manager.get_todos()) == [2, 3, 4]
+        # 戻したTODOを再びアーカイブしても、古いメンバーの内容は重複しない
+        assert manager.archive_completed(30) == 1
+        assert [todo.id for todo in manager.iter_archived()] == [1, 2] and len(manager.archive) == 2
+        manager.close()
+    
+    # 取り消しの多い索引は書き直す（読み込み側は書き直しを検知して読み直す）
+    archive = TodoArchive(test_file + ".archive")
+    reader = TodoArchive(test_file + ".archive")
+    assert len(reader) == 2
+    ids = range(100, 1300)
+    archive.append({"id": todo_id, "title": f"一括 {todo_id}", "completed": True,
+                    "created_at": "2025-03-01 00:00:00"} for todo_id in ids)
+    assert len(reader) == 1202
+    archive.remove(ids)
+    with open(archive.index_path, 'rb') as f:
+        assert len(f.read().splitlines()) == 2
+    assert len(reader) == 2 and reader.get(1)["title"] == "古い会議の資料" and reader.get(100) is None
+    
+    # 完了日時は完了・未完了の切り替えで記録・消去される（SQLiteも同じ）
+    sqlite_file = "test_archive_todos.db"
+    remove_data_files(sqlite_file)
+    for store in (TodoManager(test_file), SqliteTodoManager(sqlite_file)):
+        todo = store.add_todo("完了日時")
+        store.complete_todo(todo.id)
+        assert store.get_todo_by_id(todo.id).completed_at
+        store.uncomplete_todo(todo.id)
+        assert store.get_todo_by_id(todo.id).completed_at is None
+        store.close()
+    # SQLiteバックエンドはアーカイブに対応しない
+    store = SqliteTodoManager(sqlite_file)
+    try:
+        store.archive_completed(0)
+        assert False, "SQLiteではアーカイブできない"
+    except ValueError:
+        pass
+    assert store.get_archived(1) is None and store.search_archived("完了") == []
+    store.close()
+    
+    print("✅ アーカイブテスト完了")
+    remove_data_files(test_file)
+    remove_data_files(sqlite_file)
+
+
+def run_cli(*argv):
+    """main.py のサブコマンドを実行して終了コードを返す"""
+    try:
+        main.main(list(argv))
+    except SystemExit as e:
+        return e.code
+    assert False, "サブコマンドは sys.exit で終了する"
+
+
+def test_cli():
+    """コマンドラインのサブコマンド（追加・完了・削除・取り込み・書き出し）をテスト"""
+    print("\n🧪 コマンドラインのテスト")
+    print("-" * 30)
+
+    test_file = "test_cli_todos.json"
+    export_file = "test_cli_export"
+    remove_data_files(test_file)
+    assert run_cli("-f", test_file, "add", "牛乳を買う", "--due", "2025-07-01") == 0
+    assert run_cli("-f", test_file, "add", "報告書", "-d", "月次") == 0
+    assert run_cli("-f", test_file, "add", "  ") == 1
+    assert run_cli("-f", test_file, "complete", "1") == 0
+    # 見つからないIDがあれば終了コード1（見つかったIDは処理する）
+    assert run_cli("-f", test_file, "delete", "2", "99") == 1
+    manager = TodoManager(test_file)
+    assert [(todo.id, todo.completed) for todo in manager.get_todos()] == [(1, True)]
+
+    # NDJSON と CSV で書き出して取り込み直すと、IDを含めて同じ内容になる
+    for todo_id in range(2, 5):
+        manager.add_todo(f"カンマ, \"引用符\" {todo_id}", "改行\nを含む説明", "2025-07-0" + str(todo_id))
+    manager.close()
+    expected = [todo.to_dict() for todo in TodoManager(test_file).get_todos()]
+    for fmt in ("ndjson", "csv"):
+        assert run_cli("-f", test_file, "export", "--format", fmt, "-o", export_file) == 0
+        copy_file = f"test_cli_copy_{fmt}.json"
+        remove_data_files(copy_file)
+        assert run_cli("-f", copy_file, "import", export_file, "--format", fmt, "--keep-ids") == 0
+        assert [todo.to_dict() for todo in TodoManager(copy_file).get_todos()] == expected
+        # IDを振り直して追加で取り込む
+        assert run_cli("-f", copy_file, "import", export_file, "--format", fmt) == 0
+        copied = TodoManager(copy_file)
+        assert copied.get_stats()["total"] == 8 and copied.next_id == 10
+        assert copied.get_todo_by_id(9).title == expected[-1]["title"]
+        remove_data_files(copy_file)
+    with open(export_file, 'rb') as f:
+        assert f.readline().decode().strip() == ",".join(main.CSV_FIELDS)
+
+    # 不正なTODOが1件でもあれば何も取り込まない
+    with open(export_file, 'w', encoding='utf-8') as f:
+        f.write('{"title": "正しいTODO"}\n\n{"title": ""}\n')
+    assert run_cli("-f", test_file, "import", export_file) == 1
+    with open(export_file, 'w', encoding='utf-8') as f:
+        f.write('{"title": "正しいTODO"}\n{"title": \n')
+    assert run_cli("-f", test_file, "import", export_file) == 1
+    assert TodoManager(test_file).get_stats()["total"] == 4
+
+    print("✅ コマンドラインテスト完了")
+    remove_data_files(test_file)
+    remove_data_files(export_file)
+
+
+def test_due_scheduler():
+    """期限日のヒープによる期限切れ・期限の近いTODOの検索、期限の通知、期限日の検証をテスト"""
+    print("\n🧪 期限スケジューラーのテスト")
+    print("-" * 30)
+
+    test_file = "test_due_scheduler_todos.json"
+    db_file = "test_due_scheduler.db"
+    remove_data_files(test_file)
+    remove_data_files(db_file)
+    base = date.today()
+    now = datetime.combine(base, datetime.min.time()) + timedelta(hours=20)
+    day = lambda offset: (base + timedelta(days=offset)).isoformat()
+
+    # 解釈できない期限日は取り込まない（形式の違う日付はYYYY-MM-DDにそろえる）
+    manager = TodoManager(test_file)
+    sqlite = SqliteTodoManager(db_file)
+    for store in (manager, sqlite):
+        for bad in ("not-a-date", "2025-02-30"):
+            try:
+                store.add_todo("不正な日付", due_date=bad)
+                assert False, "ValueErrorが送出されるべき"
+            except ValueError as e:
+                assert "期限日" in str(e)
+        assert store.add_todo("形式の違う日付", due_date="2025-2-1").due_date == "2025-02-01"
+        # 文字列でないタイトル・説明は何も変更せずに ValueError
+        for update in (lambda: store.update_todo(1, title=5), lambda: store.update_todo(1, "正しい", ["説明"]),
+                       lambda: store.add_todo(5)):
+            try:
+                update()
+                assert False, "ValueErrorが送出されるべき"
+            except ValueError as e:
+                assert "文字列" in str(e)
+        assert store.get_todo_by_id(1).title == "形式の違う日付" and len(store.get_todos()) == 1
+        store.delete_todo(1)
+    for ops, message in (([{"op": "create", "title": "a", "due_date": "2025/02/01"}], "0番目の操作"),
+                         ([{"op": "update", "id": 1}, {"op": "update", "id": 1, "due_date": "x"}], "1番目の操作")):
+        try:
+            manager.apply_batch(ops)
+            assert False, "ValueErrorが送出されるべき"
+        except ValueError as e:
+            assert str(e).startswith(message)
+    try:
+        manager.import_todos([{"title": "正しいTODO"}, {"title": "不正な日付", "due_date": "明日"}])
+        assert False, "ValueErrorが送出されるべき"
+    except ValueError as e:
+        assert str(e).startswith("2件目")
+    assert manager.get_stats()["total"] == 0
+
+    # 期限切れ（期限日が今日より前）と、期限の近い順（期限は期限日の終わり）
+    for store in (manager, sqlite):
+        store.add_todo("期限切れ", due_date=day(-5))
+        store.add_todo("昨日まで", due_date=day(-1))
+        store.add_todo("今日まで", due_date=day(0))
+        store.add_todo("明日まで", due_date=day(1))
+        store.add_todo("来週", due_date=day(5))
+        store.add_todo("期限なし")
+        store.add_todo("完了済み", due_date=day(-3))
+        store.complete_todo(store.get_todos()[-1].id)
+    titles = lambda todos: [todo.title for todo in todos]
+    for store in (manager, sqlite):
+        assert titles(store.get_overdue(now)) == ["期限切れ", "昨日まで"]
+        assert titles(store.next_due(10, now=now)) == ["今日まで", "明日まで", "来週"]
+        assert titles(store.next_due(2, now=now)) == ["今日まで", "明日まで"]
+        # 20時から4時間以内に期限が来るのは今日までのものだけ、28時間以内なら明日までのものも
+        assert titles(store.next_due(None, 4, now)) == ["今日まで"]
+        assert titles(store.next_due(None, 28, now)) == ["今日まで", "明日まで"]
+        assert titles(store.next_due(None, 3, now)) == []
+        for bad in ({"limit": 0}, {"hours": -1}):
+            try:
+                store.next_due(**bad)
+                assert False, "ValueErrorが送出されるべき"
+            except ValueError:
+                pass
+
+    # 完了・期限日の変更・削除・未完了に戻すとヒープに反映される
+    for store in (manager, sqlite):
+        by_title = {todo.title: todo.id for todo in store.get_todos()}
+        store.complete_todo(by_title["今日まで"])
+        store.update_todo(by_title["来週"], due_date=day(-10))
+        store.delete_todo(by_title["期限切れ"])
+        store.uncomplete_todo(by_title["完了済み"])
+        assert titles(store.get_overdue(now)) == ["来週", "完了済み", "昨日まで"]
+        assert titles(store.get_overdue(now, limit=1)) == ["来週"]
+        assert titles(store.next_due(10, now=now)) == ["明日まで"]
+        # 過去の時点を指定した場合
+        assert titles(store.get_overdue(now - timedelta(days=2))) == ["来週", "完了済み"]
+    sqlite.close()
+    assert titles(TodoManager(test_file).get_overdue(now)) == ["来週", "完了済み", "昨日まで"]
+
+    # 日付が変わったときに、期限が過ぎたTODOをコールバックに渡す（前回の確認より前のものは通知しない）
+    received = []
+    manager.add_due_listener(received.append)
+    assert manager.check_due(now) == []
+    tomorrow = now + timedelta(days=1)
+    assert titles(manager.check_due(tomorrow)) == []
+    manager.uncomplete_todo(manager.get_todos_by_date(day(0))[0].id)
+    assert titles(manager.check_due(tomorrow + timedelta(days=1))) == ["明日まで"]
+    assert [titles(todos) for todos in received] == [["明日まで"]]
+    assert titles(manager.get_overdue(tomorrow + timedelta(days=1))) == ["来週", "完了済み", "昨日まで", "今日まで",
+                                                                      "明日まで"]
+    assert titles(manager.next_due(10, now=now)) == ["今日まで", "明日まで"]
+    manager.remove_due_listener(received.append)
+    manager.close()
+
+    # 遅延削除: 無効なエントリが増えたら作り直し、順序は全件を並べ替えた結果と同じ
+    rng = random.Random(25)
+    scheduler = DueScheduler(today=1000)
+    expected = {}
+    for i in range(5000):
+        todo_id = rng.randrange(3000)
+        if rng.random() < 0.4:
+            scheduler.discard(todo_id)
+            expected.pop(todo_id, None)
+        else:
+            ordinal = rng.randrange(900, 1100)
+            scheduler.push(todo_id, ordinal)
+            expected[todo_id] = ordinal
+    ordered = sorted((ordinal, todo_id) for todo_id, ordinal in expected.items())
+    assert len(scheduler) == len(expected)
+    assert scheduler.overdue(1000) == [entry for entry in ordered if entry[0] < 1000]
+    assert scheduler.next_due(1000, 20) == [entry for entry in ordered if entry[0] >= 1000][:20]
+    assert scheduler.advance(1050) == [todo_id for ordinal, todo_id in ordered if 1000 <= ordinal < 1050]
+    assert scheduler.overdue(1050) == [entry for entry in ordered if entry[0] < 1050]
+    assert scheduler.next_due(1020, None, 1060) == [entry for entry in ordered if 1020 <= entry[0] < 1060]
+    print(f"📊 ヒープ: 有効 {len(scheduler)}件, 無効 {scheduler._stale}件")
+    assert scheduler._stale <= max(DueScheduler.COMPACT_MIN, len(scheduler))
+
+    print("✅ 期限スケジューラーテスト完了")
+
+    remove_data_files(test_file)
+    remove_data_files(db_file)
+
+
+async def _asgi_request(app, method, url, body=b"", headers=()):
+    """ASGI アプリを直接呼び、(ステータス, ヘッダー, 本文) を返す"""
+    path, _, query = url.partition("?")
+    scope = {"type": "http", "method": method, "path": path, "query_string": query.encode(),
+             "headers": [(name.lower().encode(), value.encode()) for name, value in headers],
+             "http_version": "1.1", "scheme": "http", "server": ("localhost", 80), "client": ("127.0.0.1", 1)}
+    received = []
+    messages = []
+
+    async def receive():
+        if not received:
+            received.append(True)
+            return {"type": "http.request", "body": body}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    headers = {name.decode(): value.decode() for name, value in messages[0]["headers"]}
+    return messages[0]["status"], headers, b"".join(message.get("body", b"") for message in messages[1:])
+
+
+async def _asgi_checks(asgi):
+    """ASGI 版のレスポンスが Flask 版と同じかを確かめ、組み込みサーバーで接続を確かめる"""
+    client = asgi.web.app.test_client()
+
+    async def same(method, url, body=None, status=200):
+        data = codec.dumps(body) if body is not None else b""
+        got_status, got_headers, got_body = await _asgi_request(asgi.app, method, url, data)
+        assert got_status == status, (url, got_status)
+        if method == "GET":
+            expected = client.get(url)
+            assert expected.status_code == status and codec.loads(got_body) == expected.get_json(), url
+            assert got_headers.get("etag") == expected.headers.get("ETag"), url
+        return got_headers, codec.loads(got_body)
+
+    _, todo = await same("POST", "/api/todos", {"title": "牛乳を買う", "due_date": "2025-07-01"}, 201)
+    assert todo["id"] == 1
+    await same("POST", "/api/todos", {"title": "  "}, status=400)
+    await same("POST", "/api/todos", {"title": "報告書", "description": "月次"}, 201)
+    # 解釈できない期限日は保存しない（完了状態も変えない）
+    await same("POST", "/api/todos", {"title": "不正な日付", "due_date": "2025-13-01"}, status=400)
+    await same("PUT", "/api/todos/1", {"completed": True, "due_date": "あした"}, status=400)
+    await same("PUT", "/api/todos/1", {"completed": True, "title": 5}, status=400)
+    await same("POST", "/api/todos", {"title": 5}, status=400)
+    await same("POST", "/api/todos", {"title": "説明が数値", "description": 1}, status=400)
+    _, todo = await same("POST", "/api/todos", {"title": "説明なし", "description": None, "due_date": None}, 201)
+    assert todo["description"] == "" and todo["due_date"] is None
+    await same("DELETE", f"/api/todos/{todo['id']}")
+    for url in ("/api/todos", "/api/todos?limit=1", "/api/todos?date=2025-07-01", "/api/todos?sort=-created_at",
+                "/api/todos?fields=id,title", "/api/todos?include_archived=true", "/api/stats",
+                "/api/calendar/2025/7", "/api/calendar/range?start=2025-06&months=2", "/api/search?q=牛乳",
+                "/api/todos/due", "/api/todos/due?hours=24&limit=5", "/api/calendar/9999/12", "/api/calendar/0/5"):
+        await same("GET", url)
+    for url in ("/api/todos?limit=0", "/api/todos?fields=secret", "/api/calendar/range?start=2025",
+                "/api/todos/due?hours=-1", "/api/todos?limit=5&cursor=" + encode_cursor("id", "abc", 1)):
+        await same("GET", url, status=400)
+    await same("GET", "/api/nothing", status=404)
+    # 条件付きGET
+    headers, _ = await same("GET", "/api/stats")
+    status, _, body = await _asgi_request(asgi.app, "GET", "/api/stats", headers=[("If-None-Match", headers["etag"])])
+    assert status == 304 and body == b""
+    _, todo = await same("PUT", "/api/todos/1", {"completed": True})
+    assert todo["completed"] and todo["completed_at"]
+    await same("PUT", "/api/todos/99", {"completed": True}, status=404)
+    await same("DELETE", "/api/todos/2")
+    await same("DELETE", "/api/todos/2", status=404)
+    # リストごとのルート（Flask 版と同じファイルに保存される）
+    await same("POST", "/api/lists/work/todos", {"title": "リストのTODO"}, 201)
+    _, todos = await same("GET", "/api/lists/work/todos")
+    assert [todo["title"] for todo in todos] == ["リストのTODO"]
+    await same("GET", "/api/lists/a.b/todos", status=400)
+
+    # 組み込みサーバー: keep-alive の接続と、/api/events の購読・切断
+    server = await asyncio.start_server(lambda r, w: asgi.handle_connection(r, w, asgi.app), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    events_reader, events_writer = await asyncio.open_connection("127.0.0.1", port)
+    events_writer.write(b"GET /api/events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    head = await events_reader.readuntil(b"\r\n\r\n")
+    assert b"text/event-stream" in head and b"chunked" in head
+    assert b"event: hello" in await events_reader.readuntil(b"\n\n")
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for title in ("1件目", "2件目"):
+        body = codec.dumps({"title": title})
+        writer.write(b"POST /api/todos HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+        head = await reader.readuntil(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.1 201 Created")
+        length = int(head.split(b"content-length: ")[1].split(b"\r\n")[0])
+        assert codec.loads(await reader.readexactly(length))["title"] == title
+    assert b"event: change" in await events_reader.readuntil(b"event: change")
+    assert len(asgi.web.broadcasters[None]) == 1
+    events_writer.close()
+    for _ in range(100):
+        if not len(asgi.web.broadcasters[None]):
+            break
+        await asyncio.sleep(0.02)
+    assert len(asgi.web.broadcasters[None]) == 0, "切断した購読者は取り除く"
+    writer.close()
+    server.close()
+
+
+def _asgi_child(directory):
+    """別プロセスで空のディレクトリに移動して asgi.py を読み込み、確認を実行する"""
+    os.chdir(directory)
+    import asgi
+    try:
+        asyncio.run(asyncio.wait_for(_asgi_checks(asgi), 30))
+    finally:
+        asgi.shutdown()
+
+
+def test_asgi():
+    """ASGI 版（asgi.py）が Flask 版と同じレスポンスを返すことをテスト"""
+    print("\n🧪 ASGI版のテスト")
+    print("-" * 30)
+
+    with tempfile.TemporaryDirectory() as directory:
+        process = multiprocessing.get_context("spawn").Process(target=_asgi_child, args=(directory,))
+        process.start()
+        process.join(60)
+        assert process.exitcode == 0, "ASGI版の確認に失敗しました"
+        # 保存を遅らせた変更も終了時に書き出される
+        with open(os.path.join(directory, "todos.json"), 'rb') as f:
+            assert [todo["title"] for todo in codec.loads(f.read())["todos"]] == ["牛乳を買う", "1件目", "2件目"]
+
+    print("✅ ASGI版テスト完了")
+
+
+def _concurrent_worker(data_file, journal, worker, count):
+    """別プロセスから同じファイルにTODOを追加・完了する（並行アクセステスト用）"""
+    manager = TodoManager(data_file, journal=journal)
+    for i in range(count):
+        todo = manager.add_todo(f"ワーカー{worker}-{i}")
+        if i % 2:
+            manager.complete_todo(todo.id)
+    manager.close()
+
+
+def test_concurrent_access():
+    """複数スレッド・複数プロセスからの同時更新で変更が失われないことをテスト"""
+    print("\n🧪 並行アクセスのテスト")
+    print("-" * 30)
+    
+    test_file = "test_concurrent_todos.json"
+    remove_data_files(test_file)
+    
+    # スレッド: 書き込みと読み込みを同時に行う
+    manager = TodoManager(test_file, journal=True, debug=True)
+    stop = threading.Event()
+    
+    def writer(worker):
+        for i in range(50):
+            todo = manager.add_todo(f"スレッド{worker}-{i}")
+            if i % 2:
+                manager.complete_todo(todo.id)
+    
+    def reader():
+        while not stop.is_set():
+            manager.get_stats()
+            manager.get_todos(show_completed=False)
+    
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    writers = [threading.Thread(target=writer, args=(w,)) for w in range(16)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    for thread in readers:
+        thread.join()
+    
+    ids = [todo.id for todo in manager.get_todos()]
+    print(f"🧵 スレッドから追加: {len(ids)}件")
+    assert len(ids) == 800 and len(set(ids)) == 800
+    assert manager.get_stats()["completed"] == 400
+    manager.close()
+    remove_data_files(test_file)
+    
+    # プロセス: 各ワーカーが自分の TodoManager で同じファイルを更新する
+    for journal in (False, True):
+        observer = TodoManager(test_file, journal=journal)
+        processes = [
+            multiprocessing.Process(target=_concurrent_worker, args=(test_file, journal, w, 25))
+            for w in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+        
+        # 既存のインスタンスもファイルの変更を検知して読み直す
+        todos = observer.get_todos()
+        ids = [todo.id for todo in todos]
+        print(f"🔀 プロセスから追加（journal={journal}）: {len(ids)}件")
+        assert len(ids) == 100 and len(set(ids)) == 100
+        assert sum(1 for todo in todos if todo.completed) == 48
+        assert TodoManager(test_file, journal=journal).get_stats() == observer.get_stats()
+        observer.close()
+        remove_data_files(test_file)
+    
+    print("✅ 並行アクセステスト完了")
+
+
 if __name__ == "__main__":
     test_todo_class()
     test_todo_manager()
+    test_journal_mode()
+    test_id_index()
+    test_due_date_index()
+    test_stats_counters()
+    test_sqlite_backend()
+    test_apply_batch()
+    test_query_todos()
+    test_versions()
+    test_change_feed()
+    test_events()
+    test_columnar_store()
+    test_codec()
+    test_streaming_load()
+    test_search()
+    test_response_cache()
+    test_month_summary()
+    test_metrics()
+    test_bench_suite()
+    test_write_behind()
+    test_list_registry()
+    test_archive()
+    test_cli()
+    test_due_scheduler()
+    test_asgi()
+    test_concurrent_access()
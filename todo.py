@@ -1,31 +1,107 @@
+import atexit
+import base64
+import array
+import bisect
+import functools
+import heapq
+import itertools
 import json
 import os
-from datetime import datetime
-from typing import List, Dict, Optional
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Any, Callable, Deque, Iterable, Iterator, List, Dict, Optional, Tuple
+import codec
+from archive import TodoArchive
+from locks import FileLock, ReadWriteLock
+from metrics import StoreMetrics
+
+if TYPE_CHECKING:
+    from search import SearchIndex
+
+
+_timestamp: Tuple[int, str] = (-1, "")
+
+
+def current_timestamp() -> str:
+    """現在時刻の文字列（同じ秒の間は作成済みの文字列を使い回す）"""
+    global _timestamp
+    now = int(time.time())
+    if _timestamp[0] != now:
+        _timestamp = (now, datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S"))
+    return _timestamp[1]
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """同じ値が多い文字列（作成日時・期限日）を1つのオブジェクトにまとめる"""
+    return sys.intern(value) if type(value) is str else value
+
+
+# to_json のキャッシュの保存と invalidate を入れ替わらないようにするロック
+_encode_lock = threading.Lock()
 
 
 class Todo:
     """個別のTODOアイテムを表すクラス"""
     
-    def __init__(self, id: int, title: str, description: str = "", completed: bool = False, created_at: str = None, due_date: str = None):
+    FIELDS = ("id", "title", "description", "completed", "created_at", "due_date", "completed_at")
+    # 1件あたりのメモリを減らすため __dict__ を持たない（_encoded は to_json の結果のキャッシュ）
+    __slots__ = FIELDS + ("_encoded",)
+    
+    def __init__(self, id: int, title: str, description: str = "", completed: bool = False, created_at: str = None, due_date: str = None,
+                 completed_at: str = None):
         self.id = id
         self.title = title
         self.description = description
         self.completed = completed
-        self.created_at = created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.created_at = created_at or current_timestamp()
         self.due_date = due_date
+        # 完了日時（未完了のときと、完了日時を記録する前に完了したTODOは None）
+        self.completed_at = completed_at
+        self._encoded: Any = None
     
-    def to_dict(self) -> Dict:
-        """TODOオブジェクトを辞書に変換"""
+    def to_dict(self, fields: List[str] = None) -> Dict:
+        """TODOオブジェクトを辞書に変換（fields を指定するとその項目だけを含める）"""
+        if fields is not None:
+            return {field: getattr(self, field) for field in fields}
         return {
             "id": self.id,
             "title": self.title,
             "description": self.description,
             "completed": self.completed,
             "created_at": self.created_at,
-            "due_date": self.due_date
+            "due_date": self.due_date,
+            "completed_at": self.completed_at
         }
     
+    def to_json(self, fields: List[str] = None) -> bytes:
+        """TODOをJSONにエンコード（全項目の結果は invalidate されるまで使い回す）
+        
+        レスポンスの送信中などロックの外からも呼ばれるため、エンコード中に invalidate されたら結果を保存しない。
+        """
+        if fields is not None:
+            return codec.dumps(self.to_dict(fields))
+        encoded = self._encoded
+        if type(encoded) is bytes:
+            return encoded
+        # エンコード中の印を置き、invalidate で消されていなければ結果と差し替える
+        marker = object()
+        self._encoded = marker
+        encoded = codec.dumps(self.to_dict())
+        with _encode_lock:
+            if self._encoded is marker:
+                self._encoded = encoded
+        return encoded
+    
+    def invalidate(self) -> None:
+        """項目を変更したときに、エンコード済みのJSONを捨てる"""
+        with _encode_lock:
+            self._encoded = None
+    
     @classmethod
     def from_dict(cls, data: Dict) -> 'Todo':
         """辞書からTODOオブジェクトを作成"""
@@ -34,8 +110,9 @@ class Todo:
             title=data["title"],
             description=data.get("description", ""),
             completed=data.get("completed", False),
-            created_at=data.get("created_at"),
-            due_date=data.get("due_date")
+            created_at=_intern(data.get("created_at")),
+            due_date=_intern(data.get("due_date")),
+            completed_at=data.get("completed_at")
         )
     
     def __str__(self) -> str:
@@ -43,126 +120,1955 @@ class Todo:
         return f"[{status}] {self.id}: {self.title}"
 
 
-class TodoManager:
-    """TODOアプリのメイン管理クラス"""
+def parse_due_date(value: Optional[str]) -> Optional[int]:
+    """期限日の文字列を日付の通し番号（date.toordinal）に変換（解釈できない場合はNone）"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value).toordinal()
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def check_text_fields(**fields: Any) -> None:
+    """タイトル・説明などの項目が文字列（または None）であることを確かめる（違えば ValueError）"""
+    for key, value in fields.items():
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{key}は文字列で指定してください")
+
+
+def normalize_due_date(value: Optional[str]) -> Optional[str]:
+    """取り込む期限日を検証してYYYY-MM-DD形式にそろえる（空ならそのまま返し、解釈できなければ ValueError）"""
+    if not value:
+        return value
+    ordinal = parse_due_date(value)
+    if ordinal is None:
+        raise ValueError("期限日はYYYY-MM-DD形式で指定してください")
+    return date.fromordinal(ordinal).isoformat()
+
+
+def month_ordinals(year: int, month: int) -> Optional[Tuple[int, int]]:
+    """その月の初日と翌月の初日の通し番号を返す（date で扱えない年月なら None）"""
+    if not 1 <= month <= 12 or not 1 <= year <= 9999:
+        return None
+    start = date(year, month, 1).toordinal()
+    if year == 9999 and month == 12:
+        return start, date.max.toordinal() + 1
+    return start, date(year + month // 12, month % 12 + 1, 1).toordinal()
+
+
+# 並び替えに使える項目と、期限日なしのTODOを最後に並べるためのキー
+SORT_FIELDS = ("id", "created_at", "due_date")
+NO_DUE_DAY = 10 ** 7
+
+
+def parse_sort(sort: str) -> Tuple[str, bool]:
+    """並び順の指定（"due_date" や降順の "-created_at"）を (項目, 降順かどうか) に変換"""
+    field = sort.lstrip("-")
+    if field not in SORT_FIELDS:
+        raise ValueError(f"sortは {', '.join(SORT_FIELDS)} のいずれかで指定してください")
+    return field, sort.startswith("-")
+
+
+def encode_cursor(sort: str, key: Any, todo_id: int) -> str:
+    """ページの最後の要素の位置をカーソル文字列に変換"""
+    raw = json.dumps([sort, key, todo_id], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """カーソル文字列を (キー, ID) に戻す（並び順が一致しない・壊れている場合は ValueError）"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, key, todo_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("cursorが不正です")
+    # キーの型が並び替えの項目と違うと、インデックスとの比較で TypeError になる
+    key_type = str if parse_sort(sort)[0] == "created_at" else int
+    if cursor_sort != sort or type(key) is not key_type or type(todo_id) is not int:
+        raise ValueError("cursorが不正です")
+    return key, todo_id
+
+
+class SortedIndex:
+    """(キー, ID) の組をソート済みで保持し、二分探索で範囲検索するインデックス"""
+    
+    def __init__(self, entries: List[Tuple[Any, int]] = None):
+        self._entries: List[Tuple[Any, int]] = sorted(entries or [])
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def add(self, key: Any, todo_id: int) -> None:
+        """エントリを追加"""
+        entry = (key, todo_id)
+        # 新しいTODOや読み込み中のTODOは末尾に追加されることが多いので、二分探索を省く
+        if not self._entries or self._entries[-1] < entry:
+            self._entries.append(entry)
+        else:
+            bisect.insort(self._entries, entry)
+    
+    def remove(self, key: Any, todo_id: int) -> None:
+        """エントリを削除（存在しない場合は何もしない）"""
+        entry = (key, todo_id)
+        i = bisect.bisect_left(self._entries, entry)
+        if i < len(self._entries) and self._entries[i] == entry:
+            del self._entries[i]
+    
+    def range(self, start: Any, stop: Any) -> Iterator[Tuple[Any, int]]:
+        """start <= キー < stop のエントリをキー順に返す"""
+        i = bisect.bisect_left(self._entries, (start,))
+        j = bisect.bisect_left(self._entries, (stop,))
+        for k in range(i, j):
+            yield self._entries[k]
+    
+    def iter_after(self, after: Optional[Tuple[Any, int]] = None, reverse: bool = False) -> Iterator[Tuple[Any, int]]:
+        """after の次のエントリから順に返す（reverse=True では逆順）"""
+        if not reverse:
+            start = 0 if after is None else bisect.bisect_right(self._entries, after)
+            for k in range(start, len(self._entries)):
+                yield self._entries[k]
+        else:
+            start = len(self._entries) if after is None else bisect.bisect_left(self._entries, after)
+            for k in range(start - 1, -1, -1):
+                yield self._entries[k]
+
+
+class StringPool:
+    """同じ文字列を1つだけ保持し、番号（0 は None）で参照する文字列プール"""
+    
+    def __init__(self):
+        self._strings: List[Optional[str]] = [None]
+        self._numbers: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self._strings) - 1
+    
+    def add(self, value: Optional[str]) -> int:
+        """文字列を登録して番号を返す"""
+        if value is None:
+            return 0
+        number = self._numbers.get(value)
+        if number is None:
+            number = self._numbers[value] = len(self._strings)
+            self._strings.append(value)
+        return number
+    
+    def get(self, number: int) -> Optional[str]:
+        """番号から文字列を取得"""
+        return self._strings[number]
+
+
+# 1970-01-01 からの日数（エポック日）の基準と、期限日なしを表す値
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+NO_EPOCH_DAY = -2 ** 31
+
+
+# TodoColumns のフラグ（bytes.translate 用）: フラグが 0 の行は 1、それ以外は 0
+_PENDING_MASK = bytes([1] + [0] * 255)
+
+
+class TodoColumns:
+    """TODOを項目ごとの配列（列）で保持する、辞書と同じ使い方ができるストア
+
+    ID・完了フラグ・期限日（エポック日）は array / bytearray に詰めて持ち、説明・作成日時・期限日・完了日時の
+    文字列は StringPool で共有する。行はID順に並べ、IDは二分探索で引く。
+    削除した行は印を付けるだけにし、削除済みの行が半分を超えたら詰め直す。
+    取り出すたびに Todo を作るので、変更した Todo は必ず todos[id] = todo で書き戻すこと。
+    """
+    
+    COMPLETED = 1
+    DELETED = 2
+    
+    def __init__(self, todos: Iterable[Todo] = ()):
+        self._ids = array.array("q")
+        self._flags = bytearray()
+        self._due_days = array.array("i")
+        self._titles: List[str] = []
+        self._descriptions = array.array("I")
+        self._created_at = array.array("I")
+        self._due_dates = array.array("I")
+        self._completed_at = array.array("I")
+        self._pool = StringPool()
+        self._deleted = 0
+        for todo in sorted(todos, key=lambda todo: todo.id):
+            self[todo.id] = todo
+    
+    def __len__(self) -> int:
+        return len(self._ids) - self._deleted
+    
+    def _row(self, todo_id: int) -> int:
+        """IDの行番号（なければ -1）"""
+        i = bisect.bisect_left(self._ids, todo_id)
+        if i < len(self._ids) and self._ids[i] == todo_id and not self._flags[i] & self.DELETED:
+            return i
+        return -1
+    
+    def __contains__(self, todo_id: int) -> bool:
+        return self._row(todo_id) >= 0
+    
+    def _todo(self, row: int) -> Todo:
+        """行から Todo を作成"""
+        pool = self._pool
+        return Todo(self._ids[row], self._titles[row], pool.get(self._descriptions[row]),
+                    bool(self._flags[row] & self.COMPLETED), pool.get(self._created_at[row]),
+                    pool.get(self._due_dates[row]), pool.get(self._completed_at[row]))
+    
+    def __getitem__(self, todo_id: int) -> Todo:
+        row = self._row(todo_id)
+        if row < 0:
+            raise KeyError(todo_id)
+        return self._todo(row)
+    
+    def get(self, todo_id: int, default: Todo = None) -> Optional[Todo]:
+        row = self._row(todo_id)
+        return self._todo(row) if row >= 0 else default
+    
+    def __setitem__(self, todo_id: int, todo: Todo) -> None:
+        pool = self._pool
+        ordinal = parse_due_date(todo.due_date)
+        values = (int(bool(todo.completed)), NO_EPOCH_DAY if ordinal is None else ordinal - EPOCH_ORDINAL,
+                  todo.title, pool.add(todo.description), pool.add(todo.created_at), pool.add(todo.due_date),
+                  pool.add(todo.completed_at))
+        columns = (self._flags, self._due_days, self._titles, self._descriptions, self._created_at,
+                   self._due_dates, self._completed_at)
+        i = bisect.bisect_left(self._ids, todo_id)
+        if i < len(self._ids) and self._ids[i] == todo_id:
+            if self._flags[i] & self.DELETED:
+                self._deleted -= 1
+            for column, value in zip(columns, values):
+                column[i] = value
+        elif i == len(self._ids):
+            self._ids.append(todo_id)
+            for column, value in zip(columns, values):
+                column.append(value)
+        else:
+            self._ids.insert(i, todo_id)
+            for column, value in zip(columns, values):
+                column.insert(i, value)
+    
+    def __delitem__(self, todo_id: int) -> None:
+        self.pop(todo_id)
+    
+    def pop(self, todo_id: int, *default) -> Todo:
+        row = self._row(todo_id)
+        if row < 0:
+            if default:
+                return default[0]
+            raise KeyError(todo_id)
+        todo = self._todo(row)
+        self._flags[row] |= self.DELETED
+        self._deleted += 1
+        if self._deleted * 2 > len(self._ids):
+            self._compact()
+        return todo
+    
+    def _compact(self) -> None:
+        """削除済みの行を取り除き、使われなくなった文字列をプールから外す"""
+        todos = list(self.values())
+        self.__init__()
+        for todo in todos:
+            self[todo.id] = todo
+    
+    def __iter__(self) -> Iterator[int]:
+        flags = self._flags
+        return (todo_id for i, todo_id in enumerate(self._ids) if not flags[i] & self.DELETED)
+    
+    def keys(self) -> Iterator[int]:
+        return iter(self)
+    
+    def values(self) -> Iterator[Todo]:
+        flags = self._flags
+        return (self._todo(i) for i in range(len(self._ids)) if not flags[i] & self.DELETED)
+    
+    def items(self) -> Iterator[Tuple[int, Todo]]:
+        return ((todo.id, todo) for todo in self.values())
+    
+    def count_completed(self) -> int:
+        """完了済みの件数を Todo を作らずに数える"""
+        return self._flags.count(self.COMPLETED)
+    
+    def pending_due_counts(self) -> Dict[int, int]:
+        """未完了のTODOの期限日（日付の通し番号）ごとの件数を Todo を作らずに数える"""
+        # フラグが 0（未完了・未削除）の行だけを残し、期限日ごとに数える（どちらもC実装で走査する）
+        pending = self._flags.translate(_PENDING_MASK)
+        counts = Counter(itertools.compress(self._due_days, pending))
+        counts.pop(NO_EPOCH_DAY, None)
+        return {day + EPOCH_ORDINAL: count for day, count in counts.items()}
+
+
+class TodoJournal:
+    """TODOの変更を追記専用ログに記録するクラス
+
+    1行1レコードのJSON（NDJSON）で変更を追記し、fsyncは一定件数・一定時間ごとにまとめて行う。
+    offset は読み込み・追記済みの位置（バイト単位）で、他のプロセスが追記した分だけを再生するのに使う。
+    entries は圧縮の判定に使う変更の件数で、バッチのレコードは中の操作をすべて数える。
+    seq は先頭の {"op": "seq"} レコードに書く圧縮の通し番号で、どのスナップショットに続くログかを表す。
+    """
+    
+    def __init__(self, path: str, fsync_every: int = 32, fsync_interval: float = 1.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.entries = 0
+        self.offset = 0
+        self.seq = 0
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        # 読めない行（書き込み途中でクラッシュした末尾の行）が offset の後に残っている
+        self._torn = False
+    
+    def replay(self, offset: int = 0) -> List[Dict]:
+        """ログに記録された変更を offset の位置から順番に読み込み"""
+        records = []
+        if offset == 0:
+            self.entries = 0
+            self.seq = 0
+        self.offset = offset
+        self._torn = False
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # 書き込み途中でクラッシュした末尾の行は破棄し、次の追記の前に切り詰める
+                    self._torn = True
+                    break
+                try:
+                    record = codec.loads(line) if line.strip() else None
+                except (codec.JSONDecodeError, UnicodeDecodeError):
+                    self._torn = True
+                    break
+                self.offset += len(line)
+                if isinstance(record, dict) and record.get("op") == "seq":
+                    self.seq = record["seq"]
+                elif record is not None:
+                    records.append(record)
+        self.entries += sum(self._operations(record) for record in records)
+        return records
+    
+    @staticmethod
+    def _operations(record: Dict) -> int:
+        """レコードに含まれる変更の件数"""
+        if isinstance(record, dict) and record.get("op") == "batch":
+            return len(record["records"])
+        return 1
+    
+    def append(self, record: Dict) -> int:
+        """変更を1件追記（書き込んだバイト数を返す）"""
+        if self._torn:
+            # 読めない行の後ろに追記すると、その行とつながって追記した変更も読めなくなる
+            os.truncate(self.path, self.offset)
+            self._torn = False
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        line = codec.dumps(record) + b"\n"
+        self._file.write(line)
+        self._file.flush()
+        self.offset = self._file.tell()
+        self.entries += self._operations(record)
+        self._unsynced += 1
+        if (self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.sync()
+        return len(line)
+    
+    def sync(self) -> None:
+        """未同期の変更をディスクに書き出し"""
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+    
+    def truncate(self, seq: int = 0) -> None:
+        """スナップショット作成後にログを空にし、先頭に圧縮の通し番号 seq を書く"""
+        self.close()
+        with open(self.path, 'wb') as f:
+            if seq:
+                f.write(codec.dumps({"op": "seq", "seq": seq}) + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+            self.offset = f.tell()
+        self.entries = 0
+        self.seq = seq
+        self._torn = False
+    
+    def close(self) -> None:
+        """ログファイルを閉じる"""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+class WriteBehind:
+    """変更の通知を受け、バックグラウンドのスレッドで delay 秒分の変更をまとめて1回で保存する
+
+    最初の通知から delay 秒待ち、その間の通知は同じ保存にまとめる。保存に失敗した場合は（例外の種類によらず）
+    スレッドを止めずに delay 秒後にやり直す。
+    """
+    
+    def __init__(self, save: Callable[[], None], delay: float):
+        self.delay = delay
+        self._save = save
+        self._cond = threading.Condition()
+        self._pending = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="todo-writer", daemon=True)
+        self._thread.start()
+    
+    def notify(self) -> None:
+        """保存が必要な変更があったことを通知"""
+        with self._cond:
+            if not self._pending:
+                self._pending = True
+                self._cond.notify_all()
+    
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if self._closed:
+                    return
+                self._cond.wait_for(lambda: self._closed, self.delay)
+                self._pending = False
+            try:
+                self._save()
+            except Exception as e:
+                print(f"⚠️ TODOの保存に失敗しました（{self.delay}秒後に再試行します）: {e!r}", file=sys.stderr)
+                self.notify()
+    
+    def close(self) -> None:
+        """スレッドを止める（残っている変更の保存は呼び出し側で行う）"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+
+class DueScheduler:
+    """未完了で期限日のあるTODOを期限の近い順に取り出す最小ヒープ（期限切れの確認・リマインダー用）
+    
+    期限は期限日の終わり（翌日の0時）とする。(期限日の通し番号, ID, 登録番号) を、期限が来ていないものと
+    advance() で期限が過ぎたものに移したものの2つのヒープに持つ。完了・削除・期限日の変更ではヒープから
+    取り除かず、IDの有効な登録番号を外すだけにし（遅延削除）、無効なエントリが増えたらまとめて捨てる。
+    ヒープは読み込みロック下の advance() でも変わるので、自身のロックで守る。
+    """
+    
+    # 無効なエントリがこの件数を超え、有効なエントリより多くなったらヒープを作り直す
+    COMPACT_MIN = 1024
+    
+    def __init__(self, today: int = None):
+        self._lock = threading.Lock()
+        self._upcoming: List[Tuple[int, int, int]] = []
+        self._passed: List[Tuple[int, int, int]] = []
+        # ID → 有効なエントリの登録番号
+        self._live: Dict[int, int] = {}
+        self._seq = itertools.count()
+        self._stale = 0
+        # advance() で確認済みの日付（これより前の期限日のエントリは _passed にある）
+        self.day = date.today().toordinal() if today is None else today
+    
+    def __len__(self) -> int:
+        return len(self._live)
+    
+    def clear(self) -> None:
+        """すべてのエントリを取り除く"""
+        with self._lock:
+            self._upcoming = []
+            self._passed = []
+            self._live = {}
+            self._stale = 0
+    
+    def push(self, todo_id: int, ordinal: int) -> None:
+        """TODOを期限日の通し番号で登録（登録済みなら前のエントリを無効にする）"""
+        with self._lock:
+            if todo_id in self._live:
+                self._stale += 1
+            seq = next(self._seq)
+            self._live[todo_id] = seq
+            heapq.heappush(self._passed if ordinal < self.day else self._upcoming, (ordinal, todo_id, seq))
+    
+    def discard(self, todo_id: int) -> None:
+        """TODOのエントリを無効にする（登録されていなければ何もしない）"""
+        with self._lock:
+            if self._live.pop(todo_id, None) is None:
+                return
+            self._stale += 1
+            if self._stale > self.COMPACT_MIN and self._stale > len(self._live):
+                live = self._live
+                self._upcoming = [entry for entry in self._upcoming if live.get(entry[1]) == entry[2]]
+                self._passed = [entry for entry in self._passed if live.get(entry[1]) == entry[2]]
+                heapq.heapify(self._upcoming)
+                heapq.heapify(self._passed)
+                self._stale = 0
+    
+    def advance(self, today: int) -> List[int]:
+        """期限日が today より前になったエントリを移し、前回の確認から期限が過ぎたTODOのIDを期限日順に返す"""
+        passed = []
+        with self._lock:
+            if today <= self.day:
+                return passed
+            self.day = today
+            while self._upcoming and self._upcoming[0][0] < today:
+                entry = heapq.heappop(self._upcoming)
+                if self._live.get(entry[1]) == entry[2]:
+                    heapq.heappush(self._passed, entry)
+                    passed.append(entry[1])
+                else:
+                    self._stale -= 1
+        return passed
+    
+    def _iter_heap(self, heap: List[Tuple[int, int, int]], stop: int) -> Iterator[Tuple[int, int, int]]:
+        """ヒープの中で期限日が stop より前の有効なエントリを、ヒープを崩さずに期限日順に返す
+    
+        親は子以下なので、根から候補を小さいヒープに入れて取り出すたびに子を加える（k 件で O(k log k)）。
+        期限日が stop 以上の要素より下はたどらない。
+        """
+        live = self._live
+        candidates = [(heap[0], 0)] if heap and heap[0][0] < stop else []
+        while candidates:
+            entry, i = heapq.heappop(candidates)
+            if live.get(entry[1]) == entry[2]:
+                yield entry
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap) and heap[child][0] < stop:
+                    heapq.heappush(candidates, (heap[child], child))
+    
+    def overdue(self, today: int, limit: int = None) -> List[Tuple[int, int]]:
+        """期限日が today より前の (期限日の通し番号, ID) を期限日順に最大 limit 件返す"""
+        with self._lock:
+            entries = heapq.merge(self._iter_heap(self._passed, today), self._iter_heap(self._upcoming, today))
+            return [(ordinal, todo_id) for ordinal, todo_id, _ in itertools.islice(entries, limit)]
+    
+    def next_due(self, today: int, limit: int = None, stop: int = NO_DUE_DAY) -> List[Tuple[int, int]]:
+        """期限日が today 以上 stop 未満の (期限日の通し番号, ID) を期限日順に最大 limit 件返す"""
+        with self._lock:
+            entries = self._iter_heap(self._upcoming, stop)
+            if today < self.day:
+                # 確認済みの日付より前を指定された場合は、期限が過ぎたとして移したものからも探す
+                entries = heapq.merge(self._iter_heap(self._passed, stop), entries)
+            entries = (entry for entry in entries if entry[0] >= today)
+            return [(ordinal, todo_id) for ordinal, todo_id, _ in itertools.islice(entries, limit)]
+
+
+class DueWatcher:
+    """日付が変わるたびに（期限日の終わりごとに）バックグラウンドのスレッドで check を呼ぶ"""
+    
+    def __init__(self, check: Callable[[], Any]):
+        self._check = check
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="todo-due-watcher", daemon=True)
+        self._thread.start()
+    
+    def _run(self) -> None:
+        while True:
+            tomorrow = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+            with self._cond:
+                # 時計のずれで0時より少し前に起きても、次の周で改めて待つ
+                self._cond.wait_for(lambda: self._closed, (tomorrow - datetime.now()).total_seconds() + 1)
+                if self._closed:
+                    return
+            try:
+                self._check()
+            except Exception as e:
+                print(f"⚠️ 期限の確認に失敗しました: {e}", file=sys.stderr)
+    
+    def close(self) -> None:
+        """スレッドを止める"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+
+class TodoRepository(ABC):
+    """TODOの保存先（ストレージバックエンド）に依存しない共通インターフェース
+
+    app.py や main.py はこのインターフェースだけを使う。
+    JSONファイルを使う TodoManager が標準で、SQLiteを使う実装は sqlite_store.py にある。
+    
+    version は変更のたびに増えるデータのバージョン、epoch はデータを丸ごと読み直すたびに変わる識別子で、
+    両者を組み合わせてETag（条件付きGET）に使う。月ごとのバージョンはカレンダーの月単位のETagに使う。
+    """
+    
+    def __init__(self, change_feed_size: int = 1000):
+        self.version = 0
+        self.epoch = ""
+        self._month_versions: Dict[Tuple[int, int], int] = {}
+        # 直近の変更履歴 (バージョン, 種類, ID)。古いものから捨てる
+        self._changes: Deque[Tuple[int, str, int]] = deque(maxlen=change_feed_size)
+        # 変更履歴から差分を返せる最も古いバージョン
+        self._changes_since = 0
+        # 変更のたびに呼ぶコールバック（apply_batch 中はイベントをまとめて最後に1回だけ呼ぶ）
+        self._listeners: List[Callable[[Dict], None]] = []
+        self._pending_event: Optional[Dict] = None
+        # 期限が過ぎたときに呼ぶコールバックと、日付が変わるたびに期限を確認するスレッド（最初の登録で起動する）
+        self._due_listeners: List[Callable[[List[Todo]], None]] = []
+        self._due_watcher: Optional[DueWatcher] = None
+        # check_due() で確認済みの日付（これより前に期限が過ぎたものは通知済み）
+        self._due_checked = date.today().toordinal()
+        # 計測項目（既定では何もしない。app.py が有効な Registry のものに差し替える）
+        self.metrics = StoreMetrics()
+        self._reset_versions()
+    
+    def add_listener(self, callback: Callable[[Dict], None]) -> None:
+        """変更イベントを受け取るコールバックを登録
+
+        イベントは {"type": "change", "epoch", "version", "created"/"updated"/"deleted": [ID, ...],
+        "months": ["YYYY-MM", ...]}（空の項目は省略。months は変更前・変更後の期限日の月）か、
+        データを丸ごと読み直したときの {"type": "resync", "epoch", "version"}。
+        コールバックはロック内で呼ばれるので、すぐに戻ること。
+        """
+        self._listeners.append(callback)
+    
+    def remove_listener(self, callback: Callable[[Dict], None]) -> None:
+        """コールバックの登録を解除"""
+        self._listeners.remove(callback)
+    
+    def _publish(self, event: Dict) -> None:
+        """登録されたコールバックに変更イベントを通知"""
+        pending = self._pending_event
+        if pending is not None and event["type"] == "change":
+            pending["version"] = event["version"]
+            for kind in ("created", "updated", "deleted"):
+                if kind in event:
+                    pending.setdefault(kind, []).extend(event[kind])
+            if "months" in event:
+                pending["months"] = sorted(set(pending.get("months", [])).union(event["months"]))
+            return
+        for listener in list(self._listeners):
+            listener(event)
+    
+    def _reset_versions(self) -> None:
+        """データを丸ごと読み直したときに、それまでのバージョンをすべて無効にする"""
+        self.epoch = os.urandom(4).hex()
+        self._month_versions = {}
+        self._changes.clear()
+        self._changes_since = self.version
+        if self._listeners:
+            self._publish({"type": "resync", "epoch": self.epoch, "version": self.version})
+    
+    def _bump_version(self, due_ordinals: Iterable[int] = (),
+                      changes: Iterable[Tuple[int, str]] = ()) -> None:
+        """変更を記録してバージョンを進める
+
+        due_ordinals は影響を受けた期限日の通し番号、changes は (ID, 種類) の組。
+        種類は "created" / "updated" / "deleted" のいずれか。
+        """
+        self.version += 1
+        months = set()
+        for ordinal in due_ordinals:
+            day = date.fromordinal(ordinal)
+            months.add((day.year, day.month))
+        for month in months:
+            self._month_versions[month] = self.version
+        event = {"type": "change", "epoch": self.epoch, "version": self.version}
+        if months:
+            event["months"] = [f"{year:04d}-{month:02d}" for year, month in sorted(months)]
+        for todo_id, kind in changes:
+            if len(self._changes) == self._changes.maxlen:
+                self._changes_since = self._changes[0][0]
+            self._changes.append((self.version, kind, todo_id))
+            event.setdefault(kind, []).append(todo_id)
+        if self._listeners:
+            self._publish(event)
+    
+    def get_changes(self, since: int, epoch: str = None) -> Dict[str, Any]:
+        """since より後の変更を返す
+
+        変更履歴の範囲外（古すぎる・別のエポック）の場合は resync を True にして差分を返さない。
+        created / updated には現在のTODO、deleted にはIDだけを入れる。
+        """
+        result = {"epoch": self.epoch, "version": self.version, "resync": False,
+                  "created": [], "updated": [], "deleted": []}
+        if (epoch is not None and epoch != self.epoch) or not self._changes_since <= since <= self.version:
+            result["resync"] = True
+            return result
+        # IDごとに最後の変更だけを残し、作成後に更新されたものは作成として扱う
+        latest: Dict[int, str] = {}
+        for version, kind, todo_id in self._changes:
+            if version <= since:
+                continue
+            if kind == "updated" and latest.get(todo_id) == "created":
+                continue
+            latest[todo_id] = kind
+        for todo_id, kind in latest.items():
+            todo = None if kind == "deleted" else self.get_todo_by_id(todo_id)
+            if todo is None:
+                result["deleted"].append(todo_id)
+            else:
+                result[kind].append(todo.to_dict())
+        return result
+    
+    def get_month_version(self, year: int, month: int) -> int:
+        """指定された月のTODOが最後に変更されたときのバージョン"""
+        return self._month_versions.get((year, month), 0)
+    
+    @property
+    def todos(self) -> List[Todo]:
+        """全TODOのリスト（登録順）"""
+        return self.get_todos()
+    
+    @abstractmethod
+    def add_todo(self, title: str, description: str = "", due_date: str = None) -> Todo:
+        """新しいTODOを追加"""
+    
+    @abstractmethod
+    def get_todos(self, show_completed: bool = True) -> List[Todo]:
+        """TODOリストを取得"""
+    
+    @abstractmethod
+    def query_todos(self, limit: Optional[int] = 100, cursor: str = None, sort: str = "id",
+                    show_completed: bool = True) -> Tuple[List[Todo], Optional[str]]:
+        """並び順を指定してTODOを1ページ分取得し、(TODOのリスト, 次のページのカーソル) を返す
+
+        sort は id / created_at / due_date（先頭に "-" で降順）。limit=None で残りすべてを返す。
+        """
+    
+    @abstractmethod
+    def get_todos_by_date(self, date: str, show_completed: bool = True) -> List[Todo]:
+        """指定された日付のTODOリストを取得"""
+    
+    @abstractmethod
+    def get_todos_by_range(self, start_date: str, end_date: str, show_completed: bool = True) -> List[Todo]:
+        """期限日が start_date 以上 end_date 以下のTODOを期限日順に取得"""
+    
+    @abstractmethod
+    def get_todos_by_month(self, year: int, month: int, show_completed: bool = True) -> Dict[str, List[Todo]]:
+        """指定された月のTODOを日付ごとにグループ化して取得"""
+    
+    # 月の概要に含める各日のTODOの件数と項目
+    SUMMARY_PREVIEW = 3
+    SUMMARY_FIELDS = ["id", "title", "completed"]
+    
+    def get_month_summary(self, year: int, month: int, show_completed: bool = True) -> Dict[str, Dict[str, Any]]:
+        """指定された月の日ごとの件数（全体・完了済み）と、先頭 SUMMARY_PREVIEW 件のTODOの概要を取得
+
+        {"YYYY-MM-DD": {"count": 件数, "completed": 完了済みの件数, "preview": [{"id", "title", "completed"}, ...]}}
+        """
+        summary = {}
+        for date_key, todos in self.get_todos_by_month(year, month, show_completed).items():
+            summary[date_key] = {
+                "count": len(todos),
+                "completed": sum(1 for todo in todos if todo.completed),
+                "preview": [todo.to_dict(self.SUMMARY_FIELDS) for todo in todos[:self.SUMMARY_PREVIEW]]
+            }
+        return summary
+    
+    @abstractmethod
+    def search(self, query: str, limit: Optional[int] = 20, show_completed: bool = True) -> List[Todo]:
+        """タイトル・説明に検索語（空白区切り）をすべて含むTODOを関連度の高い順に最大 limit 件取得"""
+    
+    @abstractmethod
+    def get_todo_by_id(self, todo_id: int) -> Optional[Todo]:
+        """IDでTODOを検索"""
+    
+    @abstractmethod
+    def complete_todo(self, todo_id: int) -> bool:
+        """TODOを完了状態にする"""
+    
+    @abstractmethod
+    def uncomplete_todo(self, todo_id: int) -> bool:
+        """TODOを未完了状態にする"""
+    
+    @abstractmethod
+    def delete_todo(self, todo_id: int) -> bool:
+        """TODOを削除"""
+    
+    @abstractmethod
+    def update_todo(self, todo_id: int, title: str = None, description: str = None, due_date: str = None) -> bool:
+        """TODOを更新"""
+    
+    @abstractmethod
+    def clear_completed(self) -> int:
+        """完了済みのTODOをすべて削除"""
+    
+    @abstractmethod
+    def get_stats(self) -> Dict[str, int]:
+        """統計情報（件数・完了・未完了・期限切れ・今日が期限）を取得"""
+    
+    @staticmethod
+    def _due_window(limit: Optional[int], hours: Optional[float], now: Optional[datetime]) -> Tuple[int, int]:
+        """期限の検索範囲 (今日の通し番号, 期限日の上限（この日を含まない）) を求める"""
+        if limit is not None and limit < 1:
+            raise ValueError("limitは1以上で指定してください")
+        if hours is not None and not hours >= 0:
+            raise ValueError("hoursは0以上で指定してください")
+        now = now or datetime.now()
+        # 期限（期限日の翌日0時）が now + hours 以前になるのは、期限日が now + hours の日付より前のもの
+        stop = NO_DUE_DAY
+        if hours is not None:
+            try:
+                stop = (now + timedelta(hours=hours)).date().toordinal()
+            except OverflowError:
+                pass
+        return now.date().toordinal(), stop
+    
+    def next_due(self, limit: Optional[int] = 10, hours: float = None, now: datetime = None) -> List[Todo]:
+        """期限がまだ過ぎていない未完了のTODOを期限の近い順に最大 limit 件取得
+
+        期限は期限日の終わり（翌日の0時）とする。hours を指定すると now から hours 時間以内に期限が来るものに絞る。
+        """
+        today, stop = self._due_window(limit, hours, now)
+        todos = [(parse_due_date(todo.due_date), todo.id, todo) for todo in self.get_todos(False)]
+        todos = sorted(entry for entry in todos if entry[0] is not None and today <= entry[0] < stop)
+        return [todo for _, _, todo in todos[:limit]]
+    
+    def get_overdue(self, now: datetime = None, limit: Optional[int] = None) -> List[Todo]:
+        """期限が過ぎた（期限日が now の日付より前の）未完了のTODOを期限日順に取得"""
+        today, _ = self._due_window(limit, None, now)
+        todos = [(parse_due_date(todo.due_date), todo.id, todo) for todo in self.get_todos(False)]
+        todos = sorted(entry for entry in todos if entry[0] is not None and entry[0] < today)
+        return [todo for _, _, todo in todos[:limit]]
+    
+    def add_due_listener(self, callback: Callable[[List[Todo]], None]) -> None:
+        """TODOの期限が過ぎたときに呼ぶコールバックを登録
+
+        コールバックには check_due() が返す、期限が過ぎたTODOのリストを渡す。最初の登録で、日付が変わるたびに
+        check_due() を呼ぶスレッドを起動する。ストレージを開く前から期限が過ぎていたものは通知しない。
+        """
+        self._due_listeners.append(callback)
+        if self._due_watcher is None:
+            self._due_watcher = DueWatcher(self.check_due)
+    
+    def remove_due_listener(self, callback: Callable[[List[Todo]], None]) -> None:
+        """コールバックの登録を解除"""
+        self._due_listeners.remove(callback)
+    
+    def check_due(self, now: datetime = None) -> List[Todo]:
+        """前回の確認から期限が過ぎた未完了のTODOを期限日順に返し、登録されたコールバックに渡す"""
+        todos = self._advance_due((now or datetime.now()).date().toordinal())
+        if todos:
+            for listener in list(self._due_listeners):
+                listener(todos)
+        return todos
+    
+    def _advance_due(self, today: int) -> List[Todo]:
+        """確認済みの日付を today まで進め、その間に期限が過ぎたTODOを返す（実装ごとに上書きできる）"""
+        checked = self._due_checked
+        if today <= checked:
+            return []
+        self._due_checked = today
+        return [todo for todo in self.get_overdue(datetime.fromordinal(today))
+                if parse_due_date(todo.due_date) >= checked]
+    
+    def _close_due_watcher(self) -> None:
+        """期限を確認するスレッドを止める"""
+        if self._due_watcher is not None:
+            self._due_watcher.close()
+            self._due_watcher = None
+    
+    def archive_completed(self, older_than_days: int) -> int:
+        """完了してから older_than_days 日以上たったTODOをアーカイブに移し、移した件数を返す"""
+        raise ValueError("このストレージはアーカイブに対応していません")
+    
+    def unarchive(self, todo_id: int) -> Optional[Todo]:
+        """アーカイブからTODOを取り出して戻す（アーカイブになければ None）"""
+        raise ValueError("このストレージはアーカイブに対応していません")
+    
+    def get_archived(self, todo_id: int) -> Optional[Todo]:
+        """アーカイブされたTODOを取得（なければ None）"""
+        return None
+    
+    def iter_archived(self) -> Iterator[Todo]:
+        """アーカイブされたTODOを古いものから順に返す"""
+        return iter(())
+    
+    def search_archived(self, query: str, limit: Optional[int] = 20) -> List[Todo]:
+        """アーカイブされたTODOから、タイトル・説明に検索語をすべて含むものを新しい順に取得"""
+        return []
+    
+    def get_archive_stats(self) -> Dict[str, int]:
+        """アーカイブの件数・セグメント数・合計バイト数"""
+        return {"count": 0, "segments": 0, "bytes": 0}
+    
+    def refresh(self) -> bool:
+        """他のプロセスによる変更を取り込む（変更があった場合はTrue）"""
+        return False
+    
+    def flush(self) -> None:
+        """保存を遅らせている変更があれば、すぐに保存する"""
+    
+    def close(self) -> None:
+        """ストレージを閉じる"""
+        self._close_due_watcher()
+    
+    BATCH_OPS = ("create", "update", "complete", "uncomplete", "delete")
     
-    def __init__(self, data_file: str = "todos.json"):
+    def apply_batch(self, ops: List[Dict]) -> List[Dict]:
+        """複数の操作（create/update/complete/uncomplete/delete）をまとめて適用し、操作ごとの結果を返す
+
+        すべての操作を先に検証し、不正な操作が1つでもあれば何も変更せずに ValueError を送出する。
+        変更は1回の保存（トランザクション）でまとめて永続化する。
+        """
+        ops = [self._validate_batch_op(i, op) for i, op in enumerate(ops)]
+        version = self.version
+        self._pending_event = {"type": "change", "epoch": self.epoch, "version": version}
+        try:
+            with self._transaction():
+                results = [self._apply_batch_op(op) for op in ops]
+        finally:
+            event, self._pending_event = self._pending_event, None
+        if event["version"] != version:
+            self._publish(event)
+        return results
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """apply_batch の変更をまとめて永続化する範囲（実装ごとに上書きする）"""
+        yield
+    
+    def _validate_batch_op(self, index: int, op: Dict) -> Dict:
+        """バッチ操作を検証し、正規化した操作を返す"""
+        if not isinstance(op, dict) or op.get("op") not in self.BATCH_OPS:
+            raise ValueError(f"{index}番目の操作: opは {', '.join(self.BATCH_OPS)} のいずれかです")
+        fields = {}
+        for key in ("title", "description", "due_date"):
+            value = op.get(key)
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"{index}番目の操作: {key}は文字列で指定してください")
+            fields[key] = value.strip() if value is not None else None
+        try:
+            fields["due_date"] = normalize_due_date(fields["due_date"])
+        except ValueError as e:
+            raise ValueError(f"{index}番目の操作: {e}") from None
+        if op["op"] == "create":
+            if not fields["title"]:
+                raise ValueError(f"{index}番目の操作: タイトルは必須です")
+            return {"op": "create", "title": fields["title"],
+                    "description": fields["description"] or "", "due_date": fields["due_date"] or None}
+        todo_id = op.get("id")
+        if not isinstance(todo_id, int) or isinstance(todo_id, bool):
+            raise ValueError(f"{index}番目の操作: idは整数で指定してください")
+        if op["op"] == "update" and fields["title"] is not None and not fields["title"]:
+            raise ValueError(f"{index}番目の操作: タイトルは空にできません")
+        return dict(fields, op=op["op"], id=todo_id)
+    
+    def _apply_batch_op(self, op: Dict) -> Dict:
+        """検証済みのバッチ操作を1件適用"""
+        kind = op["op"]
+        if kind == "create":
+            todo = self.add_todo(op["title"], op["description"], op["due_date"])
+            return {"ok": True, "todo": todo.to_dict()}
+        todo_id = op["id"]
+        if kind == "complete":
+            success = self.complete_todo(todo_id)
+        elif kind == "uncomplete":
+            success = self.uncomplete_todo(todo_id)
+        elif kind == "delete":
+            success = self.delete_todo(todo_id)
+            if success:
+                return {"ok": True, "id": todo_id}
+        else:
+            success = self.update_todo(todo_id, op["title"], op["description"], op["due_date"])
+        if not success:
+            return {"ok": False, "id": todo_id, "error": "TODOが見つかりません"}
+        return {"ok": True, "todo": self.get_todo_by_id(todo_id).to_dict()}
+
+
+class LoadProgress:
+    """バックグラウンドでの読み込みの進み具合（読み込み済みの最大ID）"""
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.last_id = 0
+        # ファイルのTODOがID順に並んでいる間は「last_id 以下はすべて読み込み済み」とみなせる
+        self.ordered = True
+        self.done = False
+    
+    def advance(self, todos: List[Todo]) -> None:
+        """TODOを取り込んだことを記録"""
+        with self._cond:
+            for todo in todos:
+                if todo.id <= self.last_id:
+                    self.ordered = False
+                self.last_id = max(self.last_id, todo.id)
+            self._cond.notify_all()
+    
+    def finish(self) -> None:
+        """読み込みの完了を記録"""
+        with self._cond:
+            self.done = True
+            self._cond.notify_all()
+    
+    def wait(self, last_id: int = None) -> None:
+        """last_id より先まで読み込まれるか、読み込みが終わるまで待つ（None なら終わるまで）"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.done or (last_id is not None and self.last_id > last_id))
+
+
+class _NotLoaded(Exception):
+    """読み込み中で、必要なTODOがまだ読み込まれていない"""
+    
+    def __init__(self, last_id: int):
+        super().__init__(last_id)
+        self.last_id = last_id
+
+
+def _reading(method: Callable = None, partial: bool = False) -> Callable:
+    """読み込み操作: 他のプロセスによる変更があれば読み直してから読み込みロック下で実行
+
+    バックグラウンドで読み込み中は、読み込みが終わるまで待ってから実行する。
+    partial=True の操作は読み込み済みの範囲で実行し、足りなければ（_NotLoaded）読み込みが進むのを待って再実行する。
+    """
+    if method is None:
+        return functools.partial(_reading, partial=partial)
+    name = method.__name__
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._lock.held():
+            return method(self, *args, **kwargs)
+        metrics = self.metrics
+        start = time.perf_counter()
+        try:
+            progress = self._loading
+            if progress is not None and not partial:
+                progress.wait()
+            self._reload_after_failed_load()
+            self.refresh()
+            while True:
+                waited = time.perf_counter()
+                with self._lock.read():
+                    metrics.lock_wait_seconds.observe(time.perf_counter() - waited, "read")
+                    try:
+                        return method(self, *args, **kwargs)
+                    except _NotLoaded as e:
+                        last_id = e.last_id
+                if progress is not None:
+                    progress.wait(last_id)
+                self._reload_after_failed_load()
+        finally:
+            metrics.operation_seconds.observe(time.perf_counter() - start, name)
+    return wrapper
+
+
+def _writing(method: Callable) -> Callable:
+    """書き込み操作: 書き込みロックとファイルの排他ロックを取り、最新の状態に追従してから実行"""
+    name = method.__name__
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._lock.held():
+            return method(self, *args, **kwargs)
+        metrics = self.metrics
+        start = time.perf_counter()
+        try:
+            if self._loading is not None:
+                self._loading.wait()
+            self._reload_after_failed_load()
+            waited = time.perf_counter()
+            with self._lock.write(), self._file_lock.exclusive():
+                metrics.lock_wait_seconds.observe(time.perf_counter() - waited, "write")
+                self._reload_if_changed()
+                try:
+                    return method(self, *args, **kwargs)
+                finally:
+                    self._disk_state = self._read_disk_state()
+        finally:
+            metrics.operation_seconds.observe(time.perf_counter() - start, name)
+    return wrapper
+
+
+class TodoManager(TodoRepository):
+    """TODOアプリのメイン管理クラス（JSONファイルに保存する標準の実装）"""
+    
+    def __init__(self, data_file: str = "todos.json", journal: bool = False,
+                 compact_threshold: int = 10000, fsync_every: int = 32, debug: bool = False,
+                 change_feed_size: int = 1000, columnar: bool = False, background_load: bool = False,
+                 write_behind: float = None):
+        super().__init__(change_feed_size)
+        if write_behind is not None and journal:
+            raise ValueError("write_behind はジャーナルモードと同時に指定できません")
         self.data_file = data_file
-        self.todos: List[Todo] = []
+        self.debug = debug
+        # columnar=True ではTODOを列ごとの配列（TodoColumns）に詰めて持ち、件数が多いときのメモリを減らす
+        self.columnar = columnar
+        # IDをキーにした挿入順の辞書（リストの順序を保ったままO(1)で検索・削除できる）
+        self._todos: Dict[int, Todo] = self._new_store()
+        # 期限日のインデックス（期限日はTODOの取り込み時に一度だけ解釈する）
+        self._due_index = SortedIndex()
+        self._due_ordinals: Dict[int, int] = {}
+        # 未完了で期限日のあるTODOの最小ヒープ（期限切れ・期限の近いTODOの検索と期限の通知に使う）
+        self._scheduler = DueScheduler()
+        # 並び替え用のインデックス（最初に使われたときに作成し、以降は変更のたびに更新する）
+        self._sort_indexes: Dict[str, SortedIndex] = {}
+        # タイトル・説明の全文検索インデックス（並び替え用と同じく最初の検索で作成する）
+        self._search_index: Optional["SearchIndex"] = None
+        # 統計情報のカウンタ（各変更で増減させ、get_statsをO(1)にする）
+        self._completed_count = 0
+        self._pending_due_counts: Dict[int, int] = {}
+        self._overdue_cache: Tuple[int, int] = (-1, 0)
+        # 次のバージョンで変更があった期限日（月ごとのバージョンの更新に使う）
+        self._dirty_ordinals = set()
+        # 次のバージョンで変更があったTODO（ID → "created" / "updated" / "deleted"）
+        self._dirty_changes: Dict[int, str] = {}
         self.next_id = 1
-        self.load_todos()
+        self.compact_threshold = compact_threshold
+        self.journal = TodoJournal(data_file + ".log", fsync_every=fsync_every) if journal else None
+        # スナップショットに書く圧縮の通し番号（ログの先頭の番号がこれより小さければ反映済みのログ）
+        self._journal_seq = 0
+        # apply_batch 中は変更をここに溜めて最後に1回だけ永続化する
+        self._batch_records: Optional[List[Dict]] = None
+        # スレッド間は読み書きロック、プロセス間（複数ワーカー）はロックファイルで排他する
+        self._lock = ReadWriteLock()
+        self._file_lock = FileLock(data_file + ".lock")
+        self._disk_state = None
+        # write_behind 秒を指定すると、変更はメモリに反映して印を付けるだけにし、
+        # バックグラウンドのスレッドがその間の変更をまとめて1回で保存する（保存していない変更があれば True）
+        self._unsaved = False
+        self._flush_lock = threading.Lock()
+        self._writer: Optional[WriteBehind] = None
+        if write_behind is not None:
+            self._writer = WriteBehind(self.flush, write_behind)
+            # 終了時に保存していない変更を書き出す
+            atexit.register(self.flush)
+        # 完了してから時間がたったTODOの移動先（メモリには索引だけを持つ。最初に移すときにディレクトリを作る）
+        self.archive = TodoArchive(data_file + ".archive")
+        # バックグラウンドで読み込み中の進み具合（読み込んでいないときは None）
+        self._loading: Optional[LoadProgress] = None
+        # バックグラウンドでの読み込みが失敗したときの例外（読み直せるまでは途中までのTODOで応答も保存もしない）
+        self._load_error: Optional[BaseException] = None
+        if background_load:
+            # 読み込みを待たずに起動し、読み込み済みの範囲への読み込み操作から先に応答する
+            self._loading = LoadProgress()
+            threading.Thread(target=self._load_in_background, name="todo-loader", daemon=True).start()
+            return
+        with self._lock.write(), self._file_lock.shared():
+            self.load_todos()
+            self._disk_state = self._read_disk_state()
     
-    def load_todos(self) -> None:
-        """JSONファイルからTODOデータを読み込み"""
-        if os.path.exists(self.data_file):
+    def _load_in_background(self) -> None:
+        """バックグラウンドでファイルを読み込む"""
+        progress = self._loading
+        try:
+            with self._file_lock.shared():
+                self.load_todos(progress)
+                self._disk_state = self._read_disk_state()
+        except Exception as e:
+            self._load_error = e
+            print(f"⚠️ TODOの読み込みに失敗しました（次の操作で読み直します）: {e!r}", file=sys.stderr)
+        finally:
+            self._loading = None
+            progress.finish()
+    
+    def _reload_after_failed_load(self) -> None:
+        """バックグラウンドでの読み込みが失敗していれば、読み直す（また失敗したらその例外を送出）"""
+        if self._load_error is None:
+            return
+        with self._lock.write(), self._file_lock.shared():
+            if self._load_error is None:
+                return
+            # 書き込みロック下で読み直すので、読み直し中は失敗の印を外しておく
+            self._load_error = None
             try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.todos = [Todo.from_dict(todo_data) for todo_data in data.get("todos", [])]
-                    self.next_id = data.get("next_id", 1)
-            except (json.JSONDecodeError, FileNotFoundError):
-                self.todos = []
-                self.next_id = 1
+                self.load_todos()
+            except Exception as e:
+                self._load_error = e
+                raise
+            self._disk_state = self._read_disk_state()
     
-    def save_todos(self) -> None:
-        """TODOデータをJSONファイルに保存"""
-        data = {
-            "todos": [todo.to_dict() for todo in self.todos],
-            "next_id": self.next_id
+    def wait_loaded(self) -> None:
+        """バックグラウンドでの読み込みが終わるまで待つ"""
+        progress = self._loading
+        if progress is not None:
+            progress.wait()
+    
+    def _require_loaded(self, todo_id: int = None) -> None:
+        """読み込み中に、todo_id（None なら全件）まで読み込まれていなければ _NotLoaded を送出"""
+        if self._load_error is not None:
+            raise _NotLoaded(0)
+        progress = self._loading
+        if progress is None or progress.done:
+            return
+        if todo_id is None or not progress.ordered or todo_id > progress.last_id:
+            raise _NotLoaded(progress.last_id)
+    
+    @property
+    def todos(self) -> List[Todo]:
+        """全TODOのリスト（登録順）"""
+        return self.get_todos()
+    
+    def _read_disk_state(self) -> Tuple:
+        """データファイルとジャーナルの状態（inode・サイズ・更新時刻）を取得"""
+        state = []
+        for path in (self.data_file, self.journal.path if self.journal else None):
+            try:
+                st = os.stat(path) if path else None
+            except FileNotFoundError:
+                st = None
+            state.append((st.st_ino, st.st_size, st.st_mtime_ns) if st else None)
+        return tuple(state)
+    
+    def refresh(self) -> bool:
+        """他のプロセスがファイルを変更していれば読み直す（読み直した場合はTrue）"""
+        if self._loading is not None or self._unsaved or self._read_disk_state() == self._disk_state:
+            return False
+        with self._lock.write(), self._file_lock.shared():
+            return self._reload_if_changed()
+    
+    def _reload_if_changed(self) -> bool:
+        """ロック取得済みの状態で、ファイルが変わっていれば読み直す
+
+        write_behind で保存していない変更があるときは読み直さない（このプロセスだけが書き込む前提）。
+        """
+        state = self._read_disk_state()
+        if state == self._disk_state or self._unsaved:
+            return False
+        snapshot, log = state
+        if (self.journal and self._disk_state and snapshot == self._disk_state[0]
+                and log and log[1] >= self.journal.offset):
+            # スナップショットが同じならジャーナルの追記分だけを再生する
+            for record in self.journal.replay(self.journal.offset):
+                self._apply_record(record)
+            self._bump_pending_version()
+        else:
+            self.load_todos()
+        self._disk_state = state
+        return True
+    
+    def load_todos(self, progress: LoadProgress = None) -> None:
+        """JSONファイルからTODOデータを読み込み（ジャーナルモードではログも再生）
+
+        ファイル全体を一度に読み込まず、先頭から1件ずつ解釈して LOAD_BATCH 件ごとに取り込む。
+        progress を渡すと（バックグラウンドでの読み込み）取り込むたびに書き込みロックを手放し、
+        読み込み済みの範囲への読み込み操作を先に実行させる。
+        """
+        start = time.perf_counter()
+        with self._lock.write():
+            self._reset_versions()
+            self._todos = self._new_store()
+            self.next_id = 1
+            self._rebuild_indexes()
+        rest = {}
+        try:
+            with open(self.data_file, 'rb') as f:
+                batch = []
+                for todo_data in codec.iter_object_array(f, "todos", rest):
+                    batch.append(Todo.from_dict(todo_data))
+                    if len(batch) >= self.LOAD_BATCH:
+                        self._load_batch(batch, progress)
+                        batch = []
+                self._load_batch(batch, progress)
+        except FileNotFoundError:
+            pass
+        except codec.JSONDecodeError:
+            rest = {}
+            with self._lock.write():
+                self._todos = self._new_store()
+                self._rebuild_indexes()
+        with self._lock.write():
+            self.next_id = rest.get("next_id", 1)
+            self._journal_seq = rest.get("journal_seq", 0)
+            self._due_index = SortedIndex([(ordinal, todo_id) for todo_id, ordinal in self._due_ordinals.items()])
+            if self.journal:
+                records = self.journal.replay()
+                if self.journal.seq < self._journal_seq:
+                    # スナップショットを置き換えてからログを空にするまでの間に止まった（ログは反映済み）
+                    self.journal.truncate(self._journal_seq)
+                    records = []
+                for record in records:
+                    self._apply_record(record)
+            self._dirty_ordinals.clear()
+            self._dirty_changes.clear()
+        self.metrics.operation_seconds.observe(time.perf_counter() - start, "load_todos")
+    
+    # 読み込み時に何件ごとにTODOを取り込むか
+    LOAD_BATCH = 1000
+    
+    def _load_batch(self, todos: List[Todo], progress: Optional[LoadProgress]) -> None:
+        """読み込んだTODOをまとめて取り込む（期限日インデックスは読み込みの最後に作る）"""
+        with self._lock.write():
+            for todo in todos:
+                self._todos[todo.id] = todo
+                self._count_loaded(todo)
+                for field, index in self._sort_indexes.items():
+                    index.add(self._sort_key(field, todo), todo.id)
+                if self._search_index is not None:
+                    self._search_index.add(todo.id, todo.title, todo.description)
+            if progress is not None:
+                progress.advance(todos)
+    
+    def _new_store(self, todos: Iterable[Todo] = ()) -> Dict[int, Todo]:
+        """TODOを保持するストア（通常は辞書、columnar=True では TodoColumns）を作成"""
+        if self.columnar:
+            return TodoColumns(todos)
+        return {todo.id: todo for todo in todos}
+    
+    def _rebuild_indexes(self) -> None:
+        """全TODOからインデックスとカウンタを作り直す"""
+        self._due_ordinals = {}
+        self._scheduler.clear()
+        self._completed_count = 0
+        self._pending_due_counts = {}
+        self._overdue_cache = (-1, 0)
+        self._sort_indexes = {}
+        self._search_index = None
+        for todo in self._todos.values():
+            self._count_loaded(todo)
+        self._due_index = SortedIndex([(ordinal, todo_id) for todo_id, ordinal in self._due_ordinals.items()])
+    
+    def _count_loaded(self, todo: Todo) -> None:
+        """読み込んだTODOの期限日を解釈し、カウンタに数える"""
+        ordinal = parse_due_date(todo.due_date)
+        if ordinal is not None:
+            self._due_ordinals[todo.id] = ordinal
+            if not todo.completed:
+                self._scheduler.push(todo.id, ordinal)
+        self._count_todo(todo, ordinal, 1)
+    
+    def _index_todo(self, todo: Todo) -> None:
+        """TODOをインデックスに登録"""
+        # 登録し直すTODOは項目が変わっているので、エンコード済みのJSONを捨てる
+        todo.invalidate()
+        ordinal = parse_due_date(todo.due_date)
+        if ordinal is not None:
+            self._due_ordinals[todo.id] = ordinal
+            self._due_index.add(ordinal, todo.id)
+            self._dirty_ordinals.add(ordinal)
+            if not todo.completed:
+                self._scheduler.push(todo.id, ordinal)
+        # 同じバージョン内で外してから登録し直したものは更新、新しく登録したものは作成
+        if self._dirty_changes.get(todo.id) != "created":
+            self._dirty_changes[todo.id] = "updated" if todo.id in self._dirty_changes else "created"
+        self._count_todo(todo, ordinal, 1)
+        for field, index in self._sort_indexes.items():
+            index.add(self._sort_key(field, todo), todo.id)
+        if self._search_index is not None:
+            self._search_index.add(todo.id, todo.title, todo.description)
+    
+    def _unindex_todo(self, todo: Todo) -> None:
+        """TODOをインデックスから外す"""
+        for field, index in self._sort_indexes.items():
+            index.remove(self._sort_key(field, todo), todo.id)
+        if self._search_index is not None:
+            self._search_index.remove(todo.id, todo.title, todo.description)
+        ordinal = self._due_ordinals.pop(todo.id, None)
+        if ordinal is not None:
+            self._due_index.remove(ordinal, todo.id)
+            self._dirty_ordinals.add(ordinal)
+            self._scheduler.discard(todo.id)
+        self._mark_deleted(todo.id)
+        self._count_todo(todo, ordinal, -1)
+    
+    def _mark_deleted(self, todo_id: int) -> None:
+        """TODOを削除した（または登録し直すために外した）ことを記録"""
+        if self._dirty_changes.get(todo_id) != "created":
+            self._dirty_changes[todo_id] = "deleted"
+    
+    def _count_todo(self, todo: Todo, ordinal: Optional[int], delta: int) -> None:
+        """統計情報のカウンタを増減"""
+        if todo.completed:
+            self._completed_count += delta
+            return
+        if ordinal is None:
+            return
+        count = self._pending_due_counts.get(ordinal, 0) + delta
+        if count:
+            self._pending_due_counts[ordinal] = count
+        else:
+            del self._pending_due_counts[ordinal]
+        today, overdue = self._overdue_cache
+        if ordinal < today:
+            self._overdue_cache = (today, overdue + delta)
+    
+    @_reading
+    def get_stats(self) -> Dict[str, int]:
+        """統計情報（件数・完了・未完了・期限切れ・今日が期限）を取得"""
+        today = date.today().toordinal()
+        if self._overdue_cache[0] != today:
+            # 日付が変わったときだけ日別カウンタから期限切れ件数を数え直す
+            overdue = sum(count for ordinal, count in self._pending_due_counts.items() if ordinal < today)
+            self._overdue_cache = (today, overdue)
+        total = len(self._todos)
+        stats = {
+            "total": total,
+            "completed": self._completed_count,
+            "pending": total - self._completed_count,
+            "overdue": self._overdue_cache[1],
+            "due_today": self._pending_due_counts.get(today, 0)
         }
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        if self.debug:
+            expected = self.recount_stats()
+            if stats != expected:
+                raise AssertionError(f"統計カウンタが不整合です: {stats} != {expected}")
+        return stats
     
+    @_reading
+    def recount_stats(self) -> Dict[str, int]:
+        """全TODOを走査して統計情報を数え直す（カウンタの検証用）"""
+        today = date.today().toordinal()
+        total = len(self._todos)
+        completed = overdue = due_today = 0
+        if isinstance(self._todos, TodoColumns):
+            # 列ストアでは Todo を作らずに完了フラグと期限日の配列だけを走査する
+            completed = self._todos.count_completed()
+            for ordinal, count in self._todos.pending_due_counts().items():
+                if ordinal < today:
+                    overdue += count
+                elif ordinal == today:
+                    due_today += count
+        else:
+            for todo in self._todos.values():
+                if todo.completed:
+                    completed += 1
+                    continue
+                ordinal = parse_due_date(todo.due_date)
+                if ordinal is None:
+                    continue
+                if ordinal < today:
+                    overdue += 1
+                elif ordinal == today:
+                    due_today += 1
+        return {
+            "total": total,
+            "completed": completed,
+            "pending": total - completed,
+            "overdue": overdue,
+            "due_today": due_today
+        }
+    
+    @_writing
+    def save_todos(self) -> None:
+        """TODOデータをJSONファイルに保存（ジャーナルモードではログを空にする）"""
+        if self.journal is not None:
+            self._compact_journal()
+        else:
+            self._write_atomic()
+    
+    def _compact_journal(self) -> None:
+        """圧縮の通し番号を進めたスナップショットを書いてから、ログを空にして先頭に同じ番号を書く
+
+        置き換えてからログを空にするまでの間に止まっても、番号の古いログは読み込み時に捨てるので、
+        スナップショットに反映済みの変更をもう一度適用することはない。
+        """
+        self._journal_seq += 1
+        try:
+            self._write_atomic()
+        except BaseException:
+            self._journal_seq -= 1
+            raise
+        self.journal.truncate(self._journal_seq)
+    
+    def _write_atomic(self) -> None:
+        """スナップショットを一時ファイルに書いてから置き換える（途中でクラッシュしても元のファイルは壊れない）"""
+        tmp_file = self.data_file + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            self._write_snapshot(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.data_file)
+        self._unsaved = False
+    
+    def flush(self) -> None:
+        """write_behind で保存を遅らせている変更があれば、すぐに保存する
+
+        読み込みロック下で書き出すので、保存中も読み込み操作はそのまま実行できる（変更操作は待つ）。
+        """
+        if self._writer is None:
+            return
+        start = time.perf_counter()
+        with self._flush_lock, self._lock.read(), self._file_lock.exclusive():
+            if not self._unsaved:
+                return
+            self._write_atomic()
+            self._disk_state = self._read_disk_state()
+        self.metrics.operation_seconds.observe(time.perf_counter() - start, "flush")
+    
+    def _write_snapshot(self, f) -> None:
+        """全TODOと next_id をJSONで書き込む（エンコード済みのTODOはそのまま使い回す）"""
+        f.write(b'{"todos":')
+        for chunk in codec.iter_array(todo.to_json() for todo in self._todos.values()):
+            f.write(chunk)
+        f.write(b',"next_id":%d' % self.next_id)
+        if self.journal is not None:
+            f.write(b',"journal_seq":%d' % self._journal_seq)
+        f.write(b'}')
+        self.metrics.write_bytes.observe(f.tell(), "snapshot")
+    
+    @_writing
+    def compact(self) -> None:
+        """ジャーナルの内容をスナップショット（JSONファイル）に反映してログを空にする"""
+        self.save_todos()
+    
+    def close(self) -> None:
+        """保存していない変更と未同期のジャーナルをディスクに書き出して閉じる"""
+        self._close_due_watcher()
+        self.wait_loaded()
+        if self._writer is not None:
+            self._writer.close()
+            self.flush()
+            atexit.unregister(self.flush)
+        with self._lock.write():
+            if self.journal:
+                self.journal.close()
+            self._file_lock.close()
+    
+    def _bump_pending_version(self) -> None:
+        """溜まっている変更（期限日・TODO）を記録してバージョンを進める"""
+        self._bump_version(self._dirty_ordinals, self._dirty_changes.items())
+        self._dirty_ordinals.clear()
+        self._dirty_changes.clear()
+    
+    def _save_snapshot(self) -> None:
+        """スナップショットを保存（write_behind では印を付けてバックグラウンドのスレッドに任せる）"""
+        if self._writer is None:
+            self.save_todos()
+            return
+        self._unsaved = True
+        self._writer.notify()
+    
+    def _persist(self, record: Dict) -> None:
+        """変更を永続化（ジャーナルモードではログに追記し、通常は全体を保存）"""
+        self._bump_pending_version()
+        if self._batch_records is not None:
+            self._batch_records.append(record)
+            return
+        if self.journal is None:
+            self._save_snapshot()
+            return
+        self.metrics.write_bytes.observe(self.journal.append(record), "journal")
+        if self.journal.entries >= self.compact_threshold:
+            self.compact()
+    
+    @_writing
+    def apply_batch(self, ops: List[Dict]) -> List[Dict]:
+        """複数の操作をまとめて適用（ロックの取得と保存は1回だけ）"""
+        return super().apply_batch(ops)
+    
+    @_reading
+    def get_changes(self, since: int, epoch: str = None) -> Dict[str, Any]:
+        """since より後の変更を返す（読み込みロック内で変更履歴とTODOを一貫して読む）"""
+        return super().get_changes(since, epoch)
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """バッチ中の変更を1レコード（またはスナップショット1回）で永続化し、失敗時はファイルから読み直す"""
+        if self._unsaved:
+            # 失敗時に読み直すファイルに、バッチより前の変更を含めておく
+            self._write_atomic()
+        self._batch_records = []
+        try:
+            yield
+            records, self._batch_records = self._batch_records, None
+            if not records:
+                return
+            if self.journal is None:
+                self._save_snapshot()
+            elif len(records) >= self.compact_threshold:
+                self.compact()
+            else:
+                # 1行にまとめることで、途中でクラッシュしてもバッチ全体が適用されないだけで済む
+                size = self.journal.append({"op": "batch", "records": records})
+                self.metrics.write_bytes.observe(size, "journal")
+                self.journal.sync()
+                if self.journal.entries >= self.compact_threshold:
+                    self.compact()
+        except BaseException:
+            self._batch_records = None
+            self.load_todos()
+            raise
+    
+    def _apply_record(self, record: Dict) -> None:
+        """ジャーナルのレコードを1件適用（何度適用しても同じ結果になる）"""
+        op = record.get("op")
+        if op == "batch":
+            for child in record["records"]:
+                self._apply_record(child)
+        elif op == "add":
+            todo = Todo.from_dict(record["todo"])
+            existing = self._todos.get(todo.id)
+            if existing:
+                self._unindex_todo(existing)
+            self._todos[todo.id] = todo
+            self._index_todo(todo)
+            self.next_id = max(self.next_id, todo.id + 1)
+        elif op == "update":
+            todo = self._todos.get(record["id"])
+            if todo:
+                self._unindex_todo(todo)
+                for key, value in record["fields"].items():
+                    setattr(todo, key, value)
+                self._todos[todo.id] = todo
+                self._index_todo(todo)
+        elif op == "delete":
+            todo = self._todos.pop(record["id"], None)
+            if todo:
+                self._unindex_todo(todo)
+        elif op == "clear_completed" and "ids" not in record:
+            # 削除したIDを記録していない以前のレコード
+            self._clear_completed()
+        elif op in ("clear_completed", "archive"):
+            self._remove_todos([self._todos[todo_id] for todo_id in record["ids"] if todo_id in self._todos])
+    
+    @_writing
     def add_todo(self, title: str, description: str = "", due_date: str = None) -> Todo:
-        """新しいTODOを追加"""
-        todo = Todo(self.next_id, title, description, due_date=due_date)
-        self.todos.append(todo)
+        """新しいTODOを追加（期限日が解釈できなければ ValueError）"""
+        check_text_fields(title=title, description=description)
+        todo = Todo(self.next_id, title, description, due_date=normalize_due_date(due_date))
+        self._todos[todo.id] = todo
+        self._index_todo(todo)
         self.next_id += 1
-        self.save_todos()
+        self._persist({"op": "add", "todo": todo.to_dict()})
         return todo
     
+    @_reading
     def get_todos(self, show_completed: bool = True) -> List[Todo]:
         """TODOリストを取得"""
         if show_completed:
-            return self.todos
-        return [todo for todo in self.todos if not todo.completed]
+            return list(self._todos.values())
+        return [todo for todo in self._todos.values() if not todo.completed]
+    
+    def _sort_key(self, field: str, todo: Todo) -> Any:
+        """並び替えインデックスのキー（期限日なしは最後に並ぶ）"""
+        if field == "id":
+            return todo.id
+        if field == "created_at":
+            return todo.created_at or ""
+        return self._due_ordinals.get(todo.id, NO_DUE_DAY)
+    
+    def _sort_index(self, field: str) -> SortedIndex:
+        """並び替えインデックスを取得（未作成なら作成）"""
+        index = self._sort_indexes.get(field)
+        if index is None:
+            index = SortedIndex([(self._sort_key(field, todo), todo.id) for todo in self._todos.values()])
+            self._sort_indexes[field] = index
+        return index
+    
+    @_reading(partial=True)
+    def query_todos(self, limit: Optional[int] = 100, cursor: str = None, sort: str = "id",
+                    show_completed: bool = True) -> Tuple[List[Todo], Optional[str]]:
+        """並び順を指定してTODOを1ページ分取得し、(TODOのリスト, 次のページのカーソル) を返す
+
+        読み込み中でも、ID順（昇順）のページは読み込み済みの範囲に収まっていればすぐに返す。
+        """
+        if limit is not None and limit < 1:
+            raise ValueError("limitは1以上で指定してください")
+        field, reverse = parse_sort(sort)
+        if field != "id" or reverse:
+            self._require_loaded()
+        after = decode_cursor(cursor, sort) if cursor else None
+        page = []
+        last_entry = None
+        for entry in self._sort_index(field).iter_after(after, reverse):
+            todo = self._todos[entry[1]]
+            if not show_completed and todo.completed:
+                continue
+            if limit is not None and len(page) >= limit:
+                # 読み込み中はID順に読み込まれていて、間に未読み込みのTODOがないことを確かめる
+                self._require_loaded(entry[1])
+                # 次の要素が存在するときだけカーソルを返す
+                return page, encode_cursor(sort, *last_entry)
+            page.append(todo)
+            last_entry = entry
+        # 最後のページは、まだ読み込まれていないTODOがないことを確かめてから返す
+        self._require_loaded()
+        return page, None
+    
+    def _iter_due_range(self, start: int, stop: int, show_completed: bool) -> Iterator[Todo]:
+        """期限日の通し番号が start 以上 stop 未満のTODOを期限日順に返す"""
+        for _, todo_id in self._due_index.range(start, stop):
+            todo = self._todos[todo_id]
+            if show_completed or not todo.completed:
+                yield todo
     
+    @_reading
     def get_todos_by_date(self, date: str, show_completed: bool = True) -> List[Todo]:
         """指定された日付のTODOリストを取得"""
-        todos = self.get_todos(show_completed)
-        return [todo for todo in todos if todo.due_date == date]
+        ordinal = parse_due_date(date)
+        if ordinal is None:
+            todos = self.get_todos(show_completed)
+            return [todo for todo in todos if todo.due_date == date]
+        return [todo for todo in self._iter_due_range(ordinal, ordinal + 1, show_completed)
+                if todo.due_date == date]
+    
+    @_reading
+    def get_todos_by_range(self, start_date: str, end_date: str, show_completed: bool = True) -> List[Todo]:
+        """期限日が start_date 以上 end_date 以下のTODOを期限日順に取得"""
+        start = parse_due_date(start_date)
+        end = parse_due_date(end_date)
+        if start is None or end is None:
+            raise ValueError("日付はYYYY-MM-DD形式で指定してください")
+        return list(self._iter_due_range(start, end + 1, show_completed))
     
+    @_reading
     def get_todos_by_month(self, year: int, month: int, show_completed: bool = True) -> Dict[str, List[Todo]]:
         """指定された月のTODOを日付ごとにグループ化して取得"""
-        todos = self.get_todos(show_completed)
+        ordinals = month_ordinals(year, month)
+        if ordinals is None:
+            return {}
+        start, stop = ordinals
         month_todos = {}
         
-        for todo in todos:
-            if todo.due_date:
-                try:
-                    todo_date = datetime.strptime(todo.due_date, "%Y-%m-%d")
-                    if todo_date.year == year and todo_date.month == month:
-                        date_key = todo.due_date
-                        if date_key not in month_todos:
-                            month_todos[date_key] = []
-                        month_todos[date_key].append(todo)
-                except ValueError:
-                    continue
+        for todo in self._iter_due_range(start, stop, show_completed):
+            date_key = todo.due_date
+            if date_key not in month_todos:
+                month_todos[date_key] = []
+            month_todos[date_key].append(todo)
         
         return month_todos
     
+    @_reading
+    def next_due(self, limit: Optional[int] = 10, hours: float = None, now: datetime = None) -> List[Todo]:
+        """期限がまだ過ぎていない未完了のTODOを期限の近い順に最大 limit 件取得（期限日のヒープから k 件だけたどる）
+
+        期限は期限日の終わり（翌日の0時）とする。hours を指定すると now から hours 時間以内に期限が来るものに絞る。
+        """
+        today, stop = self._due_window(limit, hours, now)
+        return [self._todos[todo_id] for _, todo_id in self._scheduler.next_due(today, limit, stop)]
+    
+    @_reading
+    def get_overdue(self, now: datetime = None, limit: Optional[int] = None) -> List[Todo]:
+        """期限が過ぎた（期限日が now の日付より前の）未完了のTODOを期限日順に取得"""
+        today, _ = self._due_window(limit, None, now)
+        return [self._todos[todo_id] for _, todo_id in self._scheduler.overdue(today, limit)]
+    
+    @_reading
+    def _advance_due(self, today: int) -> List[Todo]:
+        """期限日のヒープを today まで進め、その間に期限が過ぎたTODOを返す"""
+        return [self._todos[todo_id] for todo_id in self._scheduler.advance(today)]
+    
+    def _get_search_index(self) -> "SearchIndex":
+        """全文検索インデックスを取得（未作成なら作成）"""
+        if self._search_index is None:
+            # 全文検索のモジュールは読み込みに時間がかかるので、最初の検索まで読み込まない（CLIの起動を速くする）
+            from search import SearchIndex
+            index = SearchIndex()
+            index.build((todo.id, todo.title, todo.description) for todo in self._todos.values())
+            self._search_index = index
+        return self._search_index
+    
+    @_reading
+    def search(self, query: str, limit: Optional[int] = 20, show_completed: bool = True) -> List[Todo]:
+        """タイトル・説明に検索語をすべて含むTODOを関連度の高い順に取得
+
+        日本語は2文字ずつ、英数字は単語ごとに照合し、最後の語は前方一致で探す。
+        タイトルに一致したものを説明に一致したものより上位にし、同じ関連度なら新しいものを先に返す。
+        """
+        if limit is not None and limit < 1:
+            raise ValueError("limitは1以上で指定してください")
+        accept = None if show_completed else (lambda todo_id: not self._todos[todo_id].completed)
+        return [self._todos[todo_id] for todo_id, _ in self._get_search_index().search(query, limit, accept)]
+    
+    @_reading(partial=True)
     def get_todo_by_id(self, todo_id: int) -> Optional[Todo]:
-        """IDでTODOを検索"""
-        for todo in self.todos:
-            if todo.id == todo_id:
-                return todo
-        return None
+        """IDでTODOを検索（読み込み中でも、そのIDまで読み込まれていれば待たない）"""
+        self._require_loaded(todo_id)
+        return self._todos.get(todo_id)
     
+    @_writing
     def complete_todo(self, todo_id: int) -> bool:
         """TODOを完了状態にする"""
         todo = self.get_todo_by_id(todo_id)
         if todo:
-            todo.completed = True
-            self.save_todos()
+            self._unindex_todo(todo)
+            if not todo.completed:
+                todo.completed = True
+                todo.completed_at = current_timestamp()
+            self._todos[todo_id] = todo
+            self._index_todo(todo)
+            self._persist({"op": "update", "id": todo_id,
+                           "fields": {"completed": True, "completed_at": todo.completed_at}})
             return True
         return False
     
+    @_writing
     def uncomplete_todo(self, todo_id: int) -> bool:
         """TODOを未完了状態にする"""
         todo = self.get_todo_by_id(todo_id)
         if todo:
+            self._unindex_todo(todo)
             todo.completed = False
-            self.save_todos()
+            todo.completed_at = None
+            self._todos[todo_id] = todo
+            self._index_todo(todo)
+            self._persist({"op": "update", "id": todo_id, "fields": {"completed": False, "completed_at": None}})
             return True
         return False
     
+    @_writing
     def delete_todo(self, todo_id: int) -> bool:
         """TODOを削除"""
-        todo = self.get_todo_by_id(todo_id)
+        todo = self._todos.pop(todo_id, None)
         if todo:
-            self.todos.remove(todo)
-            self.save_todos()
+            self._unindex_todo(todo)
+            self._persist({"op": "delete", "id": todo_id})
             return True
         return False
     
+    @_writing
     def update_todo(self, todo_id: int, title: str = None, description: str = None, due_date: str = None) -> bool:
-        """TODOを更新"""
+        """TODOを更新（文字列でない項目や解釈できない期限日は何も変更せずに ValueError）"""
+        check_text_fields(title=title, description=description)
+        due_date = normalize_due_date(due_date)
         todo = self.get_todo_by_id(todo_id)
         if todo:
+            fields = {}
+            self._unindex_todo(todo)
             if title is not None:
                 todo.title = title
+                fields["title"] = title
             if description is not None:
                 todo.description = description
+                fields["description"] = description
             if due_date is not None:
                 todo.due_date = due_date
-            self.save_todos()
+                fields["due_date"] = due_date
+            self._todos[todo_id] = todo
+            self._index_todo(todo)
+            self._persist({"op": "update", "id": todo_id, "fields": fields})
             return True
         return False
     
+    def _clear_completed(self) -> int:
+        """完了済みのTODOを取り除いてインデックスを作り直し、取り除いた件数を返す"""
+        completed = [todo for todo in self._todos.values() if todo.completed]
+        self._remove_todos(completed)
+        return len(completed)
+    
+    def _remove_todos(self, todos: List[Todo]) -> None:
+        """TODOをまとめて取り除いてインデックスを作り直す"""
+        # 全文検索インデックスは作り直すと時間がかかるので、取り除くTODOだけを外して使い続ける
+        search_index = self._search_index
+        for todo in todos:
+            del self._todos[todo.id]
+            self._mark_deleted(todo.id)
+            if todo.id in self._due_ordinals:
+                self._dirty_ordinals.add(self._due_ordinals[todo.id])
+            if search_index is not None:
+                search_index.remove(todo.id, todo.title, todo.description)
+        self._rebuild_indexes()
+        self._search_index = search_index
+    
+    @_writing
     def clear_completed(self) -> int:
         """完了済みのTODOをすべて削除"""
-        completed_todos = [todo for todo in self.todos if todo.completed]
-        count = len(completed_todos)
-        self.todos = [todo for todo in self.todos if not todo.completed]
-        self.save_todos()
+        completed = [todo for todo in self._todos.values() if todo.completed]
+        self._remove_todos(completed)
+        # 削除したIDを記録し、後から完了にしたTODOまで再生時に消さないようにする
+        self._persist({"op": "clear_completed", "ids": [todo.id for todo in completed]})
+        return len(completed)
+    
+    @_writing
+    def import_todos(self, records: Iterable[Dict], keep_ids: bool = False) -> int:
+        """TODOの辞書を1件ずつ取り込み、最後に1回だけ保存して取り込んだ件数を返す
+
+        records はファイルから1件ずつ読むイテレータでよい（全件のリストを作らない）。
+        keep_ids=False では新しいIDを振り、True では辞書のIDを使う（同じIDのTODOは置き換える）。
+        不正なTODOがあれば ValueError を送出し、それまでに取り込んだ分も含めて何も変更しない。
+        インデックスは最後にまとめて作り直し、変更の通知は resync の1回だけにする。
+        """
+        if self._unsaved:
+            # 失敗時に読み直すファイルに、取り込みより前の変更を含めておく
+            self._write_atomic()
+        count = 0
+        try:
+            for count, data in enumerate(records, 1):
+                todo = self._import_todo(count, data, keep_ids)
+                self._todos[todo.id] = todo
+                self.next_id = max(self.next_id, todo.id + 1)
+            self._rebuild_indexes()
+            if self.journal is not None:
+                self._compact_journal()
+            else:
+                self._write_atomic()
+        except BaseException:
+            self.load_todos()
+            raise
+        self.version += 1
+        self._reset_versions()
         return count
+    
+    def _import_todo(self, index: int, data: Any, keep_ids: bool) -> Todo:
+        """取り込むTODOの辞書を検証して Todo を作成"""
+        if not isinstance(data, dict) or not isinstance(data.get("title"), str) or not data["title"].strip():
+            raise ValueError(f"{index}件目: タイトルは必須です")
+        for key in ("description", "created_at", "due_date", "completed_at"):
+            value = data.get(key)
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"{index}件目: {key}は文字列で指定してください")
+        if not isinstance(data.get("completed", False), bool):
+            raise ValueError(f"{index}件目: completedは true / false で指定してください")
+        try:
+            due_date = normalize_due_date(data.get("due_date"))
+        except ValueError as e:
+            raise ValueError(f"{index}件目: {e}") from None
+        todo_id = self.next_id
+        if keep_ids:
+            todo_id = data.get("id")
+            if not isinstance(todo_id, int) or isinstance(todo_id, bool) or todo_id < 1:
+                raise ValueError(f"{index}件目: idは1以上の整数で指定してください")
+        return Todo(todo_id, data["title"].strip(), data.get("description") or "", data.get("completed", False),
+                    _intern(data.get("created_at")), _intern(due_date) or None,
+                    data.get("completed_at"))
+    
+    @_writing
+    def archive_completed(self, older_than_days: int) -> int:
+        """完了してから older_than_days 日以上たったTODOをアーカイブに移し、移した件数を返す
+
+        完了日時を記録する前に完了したTODOは作成日時で判断する。アーカイブに書き終えてから
+        メモリ上のTODOを取り除くので、途中で止まってもTODOがなくなることはない（両方に残った場合は
+        次回のアーカイブで同じTODOを書き直す）。
+        """
+        if older_than_days < 0:
+            raise ValueError("older_than_daysは0以上で指定してください")
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+        todos = [todo for todo in self._todos.values()
+                 if todo.completed and (todo.completed_at or todo.created_at) <= cutoff]
+        if not todos:
+            return 0
+        self.archive.append(todo.to_dict() for todo in todos)
+        self._remove_todos(todos)
+        self._persist({"op": "archive", "ids": [todo.id for todo in todos]})
+        return len(todos)
+    
+    @_writing
+    def unarchive(self, todo_id: int) -> Optional[Todo]:
+        """アーカイブからTODOを取り出して戻す（アーカイブになければ None）"""
+        data = self.archive.get(todo_id)
+        if data is None:
+            return None
+        todo = self._todos.get(todo_id)
+        if todo is None:
+            todo = Todo.from_dict(data)
+            self._todos[todo.id] = todo
+            self._index_todo(todo)
+            self._persist({"op": "add", "todo": todo.to_dict()})
+            # 戻したTODOをディスクに書き出してからアーカイブの索引から外す
+            if self.journal is not None:
+                self.journal.sync()
+            elif self._unsaved:
+                self._write_atomic()
+        self.archive.remove([todo_id])
+        return todo
+    
+    def get_archived(self, todo_id: int) -> Optional[Todo]:
+        """アーカイブされたTODOを取得（なければ None。アーカイブはロックなしで読める）"""
+        data = self.archive.get(todo_id)
+        return Todo.from_dict(data) if data is not None else None
+    
+    def iter_archived(self) -> Iterator[Todo]:
+        """アーカイブされたTODOを古いものから順に返す（セグメントを順に展開する）"""
+        return map(Todo.from_dict, self.archive.iter_todos())
+    
+    def search_archived(self, query: str, limit: Optional[int] = 20) -> List[Todo]:
+        """アーカイブされたTODOから、タイトル・説明に検索語をすべて含むものを新しい順に取得
+
+        アーカイブには全文検索インデックスを持たないので、すべてのセグメントを展開して照合する。
+        """
+        if limit is not None and limit < 1:
+            raise ValueError("limitは1以上で指定してください")
+        return [Todo.from_dict(data) for data in self.archive.search(query, limit)]
+    
+    def get_archive_stats(self) -> Dict[str, int]:
+        """アーカイブの件数・セグメント数・合計バイト数"""
+        return self.archive.stats()